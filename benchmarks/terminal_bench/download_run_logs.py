@@ -24,6 +24,12 @@ Usage:
     # Show failures only
     python download_run_logs.py --failures-only
 
+    # Query every cached run at once (served from the trial index)
+    python download_run_logs.py --all-runs --task chess --failures-only
+
+    # Keep artifacts as zips; extract only the trials shown
+    python download_run_logs.py --keep-zips --task chess --extract
+
 Prerequisites:
     - GitHub CLI (gh) installed and authenticated
     - Access to coder/mux repository
@@ -38,35 +44,91 @@ Output structure:
                         agent/           # Agent execution logs
                             command-0/
                                 command.txt
-                                stdout.txt
-                                stderr.txt
+                                stdout.txt.gz   (plain stdout.txt in older runs)
+                                stderr.txt.gz
                         verifier/        # Verifier output
+        <artifact-name>.zip      # Instead of the tree above, with --keep-zips
+    .run_logs/trials.sqlite   # Trial index over every cached run
+
+Each run is indexed (task, model, pass status, exception type, duration,
+tokens) once, and again only when more of it is downloaded. Queries run
+against the index, so filtering dozens of cached nightlies does not re-walk
+and re-parse their result files. Artifacts kept as zips are read in place
+through each archive's central directory.
 """
 
 from __future__ import annotations
 
 import argparse
+import functools
 import json
+import re
+import sqlite3
 import sys
+import zipfile
+from collections.abc import Iterator
+from contextlib import closing
 from pathlib import Path
 
 try:
     from .tbench_utils import (
+        ARTIFACT_DOWNLOAD_WORKERS,
+        ARTIFACT_PREFIX,
+        RUN_COMPLETE_MARKER,
         download_run_artifacts,
         extract_task_id,
         get_passed,
         list_nightly_runs,
+        parse_iso_time,
+        read_agent_log,
+        run_is_complete,
     )
 except ImportError:
     from tbench_utils import (  # type: ignore[import-not-found,no-redef]
+        ARTIFACT_DOWNLOAD_WORKERS,
+        ARTIFACT_PREFIX,
+        RUN_COMPLETE_MARKER,
         download_run_artifacts,
         extract_task_id,
         get_passed,
         list_nightly_runs,
+        parse_iso_time,
+        read_agent_log,
+        run_is_complete,
     )
 
 CACHE_DIR = Path(__file__).parent / ".run_logs"
 
+# SQLite trial index kept next to the cached runs
+TRIAL_INDEX_NAME = "trials.sqlite"
+
+# Job-level folders use timestamp format: YYYY-MM-DD__HH-MM-SS
+_JOB_FOLDER_RE = re.compile(r"^\d{4}-\d{2}-\d{2}__\d{2}-\d{2}-\d{2}$")
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    marker_mtime REAL NOT NULL,
+    n_trials INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trials (
+    run_id INTEGER NOT NULL,
+    artifact TEXT NOT NULL,
+    model TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    trial_name TEXT NOT NULL,
+    passed INTEGER,
+    exception_type TEXT,
+    duration_sec REAL,
+    n_input_tokens INTEGER,
+    n_output_tokens INTEGER,
+    cost_usd REAL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trials_by_run ON trials (run_id, task_name);
+CREATE INDEX IF NOT EXISTS trials_by_task ON trials (task_name);
+"""
+
 
 def find_trial_results(run_dir: Path) -> list[dict]:
     """Find all trial results in a downloaded run directory.
@@ -74,15 +136,70 @@ def find_trial_results(run_dir: Path) -> list[dict]:
     Derives task/trial identifiers from folder structure (like analyze_failure_rates.py)
     rather than requiring them in the JSON, since some results omit these fields.
     """
-    import re
+    return sorted(_iter_trial_results(run_dir), key=lambda x: x["task_name"])
+
+
+@functools.cache
+def open_artifact_zip(zip_path: Path) -> zipfile.ZipFile:
+    """Open a kept artifact zip once per process; members are read lazily."""
+    return zipfile.ZipFile(zip_path)
+
+
+def _iter_result_files(run_dir: Path) -> Iterator[Path | zipfile.Path]:
+    """Every ``result.json`` in a run, in extracted trees and kept zips.
+
+    A tree next to a zip of the same name only holds trials extracted on
+    demand (``--extract``), so it is skipped in favour of the zip. Dot
+    entries are skipped too: ``.<name>.partial`` dirs are downloads that
+    never finished.
+    """
+    zipped = {
+        path.stem: path
+        for path in sorted(run_dir.glob("*.zip"))
+        if not path.name.startswith(".")
+    }
+    for zip_path in zipped.values():
+        archive = open_artifact_zip(zip_path)
+        for member in archive.namelist():
+            if member.rpartition("/")[2] == "result.json":
+                yield zipfile.Path(archive, at=member)
+    for child in sorted(run_dir.iterdir()):
+        if child.name.startswith("."):
+            continue
+        if child.is_dir() and child.name not in zipped:
+            yield from child.rglob("result.json")
+
+
+def _trial_path(run_dir: Path, relative: str) -> Path | zipfile.Path:
+    """Resolve an index path, which may point inside ``<artifact>.zip``."""
+    artifact, _, member = relative.partition("/")
+    if artifact.endswith(".zip"):
+        return zipfile.Path(open_artifact_zip(run_dir / artifact), at=member)
+    return run_dir / relative
+
+
+def extract_trial(result_path: Path | zipfile.Path) -> Path:
+    """Extract the trial folder holding a zip-backed ``result.json``.
+
+    Members go to ``<artifact>/`` next to ``<artifact>.zip``, the same
+    layout as a fully extracted artifact. Returns the trial folder, which
+    for an already extracted trial is just its parent.
+    """
+    if not isinstance(result_path, zipfile.Path):
+        return result_path.parent
+    archive = result_path.root
+    prefix = result_path.parent.at
+    target = Path(archive.filename).with_suffix("")
+    archive.extractall(
+        target, [member for member in archive.namelist() if member.startswith(prefix)]
+    )
+    return target / prefix
 
-    # Job-level folders use timestamp format: YYYY-MM-DD__HH-MM-SS
-    timestamp_pattern = re.compile(r"^\d{4}-\d{2}-\d{2}__\d{2}-\d{2}-\d{2}$")
 
-    results = []
-    for result_file in run_dir.rglob("result.json"):
+def _iter_trial_results(run_dir: Path) -> Iterator[dict]:
+    for result_file in _iter_result_files(run_dir):
         # Skip job-level result.json files (in jobs/<timestamp>/ directly)
-        if timestamp_pattern.match(result_file.parent.name):
+        if _JOB_FOLDER_RE.match(result_file.parent.name):
             continue
         # Skip if parent is 'logs' or 'output'
         if result_file.parent.name in ("logs", "output", "verifier", "agent"):
@@ -97,19 +214,164 @@ def find_trial_results(run_dir: Path) -> list[dict]:
             task_name = data.get("task_name") or extract_task_id(trial_folder)
             trial_name = data.get("trial_name") or trial_folder
 
-            results.append(
-                {
-                    "path": result_file,
-                    "task_name": task_name,
-                    "trial_name": trial_name,
-                    "passed": get_passed(data),
-                    "data": data,
-                }
-            )
         except (json.JSONDecodeError, OSError):
             continue
+        yield {
+            "path": result_file,
+            "task_name": task_name,
+            "trial_name": trial_name,
+            "passed": get_passed(data),
+            "data": data,
+        }
+
+
+def _index_row(run_id: int, run_dir: Path, trial: dict) -> tuple:
+    data = trial["data"]
+    # str() of a zipfile.Path is "<zip path>/<member>"
+    relative = Path(str(trial["path"])).relative_to(run_dir)
+    artifact = relative.parts[0].removesuffix(".zip")
+    exception = data.get("exception_info") or {}
+    started = parse_iso_time(data.get("started_at"))
+    finished = parse_iso_time(data.get("finished_at"))
+    agent_result = data.get("agent_result") or {}
+    return (
+        run_id,
+        artifact,
+        artifact.removeprefix(f"{ARTIFACT_PREFIX}-"),
+        trial["task_name"],
+        trial["trial_name"],
+        trial["passed"],
+        exception.get("exception_type") if isinstance(exception, dict) else None,
+        (finished - started).total_seconds() if started and finished else None,
+        agent_result.get("n_input_tokens"),
+        agent_result.get("n_output_tokens"),
+        agent_result.get("cost_usd"),
+        relative.as_posix(),
+    )
+
+
+def open_trial_index(cache_dir: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the trial index for ``cache_dir``."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(cache_dir / TRIAL_INDEX_NAME)
+    conn.executescript(_INDEX_SCHEMA)
+    return conn
 
-    return sorted(results, key=lambda x: x["task_name"])
+
+def _run_index_key(run_dir: Path) -> float | None:
+    """mtime that changes whenever a run's downloaded trials may have changed.
+
+    A completed run's marker is rewritten whenever the run is downloaded
+    again. A run without one (still in progress, or its status could not be
+    fetched) gains artifacts over time; each finished artifact writes its
+    marker into or beside its folder, which bumps the newest mtime among the
+    run dir and its direct children. Dot children (partial downloads, the
+    run marker) are left out.
+    """
+    try:
+        return (run_dir / RUN_COMPLETE_MARKER).stat().st_mtime
+    except OSError:
+        pass
+    try:
+        children = [path for path in run_dir.iterdir() if not path.name.startswith(".")]
+        return max(path.stat().st_mtime for path in (run_dir, *children))
+    except OSError:
+        return None
+
+
+def index_run(conn: sqlite3.Connection, run_id: int, run_dir: Path) -> bool:
+    """Index a run's downloaded trials unless the index is already current.
+
+    Returns:
+        True if the run was (re)indexed
+    """
+    marker_mtime = _run_index_key(run_dir)
+    if marker_mtime is None:
+        return False
+    row = conn.execute(
+        "SELECT marker_mtime FROM runs WHERE run_id = ?", (run_id,)
+    ).fetchone()
+    if row is not None and row[0] == marker_mtime:
+        return False
+
+    rows = [
+        _index_row(run_id, run_dir, trial) for trial in _iter_trial_results(run_dir)
+    ]
+    with conn:
+        conn.execute("DELETE FROM trials WHERE run_id = ?", (run_id,))
+        conn.executemany(
+            f"INSERT INTO trials VALUES ({', '.join('?' * 12)})",
+            rows,
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?, ?)",
+            (run_id, marker_mtime, len(rows)),
+        )
+    return True
+
+
+def index_cached_runs(conn: sqlite3.Connection, cache_dir: Path) -> list[int]:
+    """Bring the index up to date with every run in ``cache_dir``.
+
+    Returns:
+        IDs of the cached runs, newest first
+    """
+    run_ids = sorted(
+        (
+            int(run_dir.name)
+            for run_dir in cache_dir.iterdir()
+            if run_dir.name.isdigit() and run_dir.is_dir()
+        ),
+        reverse=True,
+    )
+    for run_id in run_ids:
+        index_run(conn, run_id, cache_dir / str(run_id))
+    return run_ids
+
+
+def _like_substring(value: str) -> str:
+    """A LIKE pattern matching ``value`` literally anywhere in a column."""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def query_trials(
+    conn: sqlite3.Connection,
+    cache_dir: Path,
+    run_ids: list[int],
+    task: str | None = None,
+    model: str | None = None,
+    failures_only: bool = False,
+) -> list[dict]:
+    """Trials of ``run_ids`` from the index, filtered like the CLI flags.
+
+    ``task`` and ``model`` are case-insensitive substring matches on the
+    task name and the artifact name; ``%`` and ``_`` in them match literally.
+    """
+    clauses = [f"run_id IN ({', '.join('?' * len(run_ids))})"]
+    params: list[object] = list(run_ids)
+    if task:
+        clauses.append("task_name LIKE ? ESCAPE '\\'")
+        params.append(_like_substring(task))
+    if model:
+        clauses.append("artifact LIKE ? ESCAPE '\\'")
+        params.append(_like_substring(model.replace("/", "-")))
+    if failures_only:
+        clauses.append("passed = 0")
+    cursor = conn.execute(
+        f"SELECT * FROM trials WHERE {' AND '.join(clauses)} "
+        "ORDER BY run_id DESC, task_name, trial_name",
+        params,
+    )
+    columns = [column[0] for column in cursor.description]
+    trials = []
+    for row in cursor:
+        trial = dict(zip(columns, row))
+        trial["path"] = _trial_path(cache_dir / str(trial["run_id"]), trial["path"])
+        if trial["passed"] is not None:
+            trial["passed"] = bool(trial["passed"])
+        trials.append(trial)
+    return trials
 
 
 def print_trial_summary(trial: dict, verbose: bool = False) -> None:
@@ -130,21 +392,24 @@ def print_trial_summary(trial: dict, verbose: bool = False) -> None:
         # Check for agent logs
         agent_dir = trial_dir / "agent"
         if agent_dir.exists():
-            for cmd_dir in sorted(agent_dir.iterdir()):
+            for cmd_dir in sorted(agent_dir.iterdir(), key=lambda path: path.name):
                 if cmd_dir.is_dir() and cmd_dir.name.startswith("command-"):
-                    stdout_file = cmd_dir / "stdout.txt"
-                    stderr_file = cmd_dir / "stderr.txt"
-                    if stderr_file.exists():
-                        stderr = stderr_file.read_text().strip()
-                        if stderr:
-                            # Show last 10 lines of stderr
-                            lines = stderr.split("\n")[-10:]
-                            print(f"         stderr (last {len(lines)} lines):")
-                            for line in lines:
-                                print(f"           {line[:100]}")
-
-        # Check for exception info
-        data = trial["data"]
+                    # stderr.txt, or stderr.txt.gz/.zst from capped log capture
+                    stderr = (read_agent_log(cmd_dir, "stderr.txt") or "").strip()
+                    if stderr:
+                        # Show last 10 lines of stderr
+                        lines = stderr.split("\n")[-10:]
+                        print(f"         stderr (last {len(lines)} lines):")
+                        for line in lines:
+                            print(f"           {line[:100]}")
+
+        # Check for exception info (index rows carry no parsed result)
+        data = trial.get("data")
+        if data is None:
+            try:
+                data = json.loads(result_path.read_text())
+            except (OSError, json.JSONDecodeError):
+                data = {}
         if data.get("exception_info"):
             print(f"         exception: {data['exception_info']}")
 
@@ -175,6 +440,21 @@ def main():
     parser.add_argument(
         "--failures-only", action="store_true", help="Show only failed trials"
     )
+    parser.add_argument(
+        "--keep-zips",
+        action="store_true",
+        help="Keep downloaded artifacts as zips instead of extracting them",
+    )
+    parser.add_argument(
+        "--extract",
+        action="store_true",
+        help="Extract the matching trials' folders from kept zips",
+    )
+    parser.add_argument(
+        "--all-runs",
+        action="store_true",
+        help="Query every cached run instead of downloading one",
+    )
     parser.add_argument(
         "--verbose",
         "-v",
@@ -187,11 +467,22 @@ def main():
         default=CACHE_DIR,
         help=f"Output directory (default: {CACHE_DIR})",
     )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=ARTIFACT_DOWNLOAD_WORKERS,
+        help=f"Artifacts downloaded in parallel (default: {ARTIFACT_DOWNLOAD_WORKERS})",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached GitHub run/artifact listings",
+    )
     args = parser.parse_args()
 
     # List runs mode
     if args.list_runs:
-        runs = list_nightly_runs()
+        runs = list_nightly_runs(refresh=args.refresh)
         if not runs:
             print("No runs found")
             return 1
@@ -203,74 +494,91 @@ def main():
             )
         return 0
 
-    # Determine run ID
+    conn = open_trial_index(args.output_dir)
+    with closing(conn):
+        if args.all_runs:
+            run_ids = index_cached_runs(conn, args.output_dir)
+            if not run_ids:
+                print(f"No cached runs in {args.output_dir}", file=sys.stderr)
+                return 1
+        else:
+            run_id = _ensure_run_downloaded(args)
+            if run_id is None:
+                return 1
+            index_run(conn, run_id, args.output_dir / str(run_id))
+            run_ids = [run_id]
+        results = query_trials(
+            conn,
+            args.output_dir,
+            run_ids,
+            task=args.task,
+            model=args.model,
+            failures_only=args.failures_only,
+        )
+
+    if not results:
+        print("No matching results found")
+        return 0
+
+    # Group by run and model (artifact name)
+    by_model: dict[tuple[int, str], list[dict]] = {}
+    for r in results:
+        by_model.setdefault((r["run_id"], r["model"]), []).append(r)
+
+    # Print results
+    for (run_id, model), trials in sorted(
+        by_model.items(), key=lambda item: (-item[0][0], item[0][1])
+    ):
+        passed = sum(1 for t in trials if t["passed"])
+        total = len(trials)
+        run_label = f" (run {run_id})" if args.all_runs else ""
+        print(f"\n{model}{run_label}: {passed}/{total} passed")
+        for trial in trials:
+            if not args.failures_only or not trial["passed"]:
+                print_trial_summary(trial, verbose=args.verbose)
+
+    if args.extract:
+        print(f"\nTrial folders ({len(results)}):")
+        for trial in results:
+            print(f"  {extract_trial(trial['path'])}")
+
+    return 0
+
+
+def _ensure_run_downloaded(args: argparse.Namespace) -> int | None:
+    """Resolve the requested (or latest completed) run and make sure it is cached."""
     if args.run_id:
         run_id = args.run_id
     else:
         # Get latest completed run (not in-progress)
-        runs = list_nightly_runs(limit=5)
+        runs = list_nightly_runs(limit=5, refresh=args.refresh)
         completed_runs = [
             r for r in runs if r.get("conclusion") in ("success", "failure")
         ]
         if not completed_runs:
             print("No completed runs found", file=sys.stderr)
-            return 1
+            return None
         run_id = completed_runs[0]["databaseId"]
         print(f"Using latest completed run: {run_id}")
 
-    # Download if needed - include smoke test artifacts for log inspection
+    # Download if needed - include smoke test artifacts for log inspection.
+    # An interrupted download has no run marker and resumes where it stopped.
     run_dir = args.output_dir / str(run_id)
-    if not run_dir.exists():
+    if not run_is_complete(run_dir):
         if not download_run_artifacts(
-            run_id, run_dir, include_smoke_test=True, verbose=True
+            run_id,
+            run_dir,
+            include_smoke_test=True,
+            verbose=True,
+            max_workers=args.download_workers,
+            refresh=args.refresh,
+            keep_zip=args.keep_zips,
         ):
-            return 1
+            return None
     else:
         print(f"Using cached run data from {run_dir}")
 
-    # Find and filter results
-    results = find_trial_results(run_dir)
-
-    if args.task:
-        results = [r for r in results if args.task.lower() in r["task_name"].lower()]
-
-    if args.model:
-        # Filter by checking the artifact path
-        def matches_model(r):
-            path_str = str(r["path"]).lower()
-            return args.model.lower().replace("/", "-") in path_str
-
-        results = [r for r in results if matches_model(r)]
-
-    if args.failures_only:
-        results = [r for r in results if r["passed"] is False]
-
-    if not results:
-        print("No matching results found")
-        return 0
-
-    # Group by model (artifact name)
-    by_model: dict[str, list[dict]] = {}
-    for r in results:
-        # Extract model from path
-        parts = r["path"].parts
-        model = "unknown"
-        for p in parts:
-            if p.startswith("terminal-bench-results-"):
-                model = p.replace("terminal-bench-results-", "")
-                break
-        by_model.setdefault(model, []).append(r)
-
-    # Print results
-    for model, trials in sorted(by_model.items()):
-        passed = sum(1 for t in trials if t["passed"])
-        total = len(trials)
-        print(f"\n{model}: {passed}/{total} passed")
-        for trial in trials:
-            if not args.failures_only or not trial["passed"]:
-                print_trial_summary(trial, verbose=args.verbose)
-
-    return 0
+    return run_id
 
 
 if __name__ == "__main__":
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from . import download_run_logs, tbench_utils
+from .download_run_logs import (
+    extract_trial,
+    find_trial_results,
+    index_run,
+    open_trial_index,
+    query_trials,
+)
+from .tbench_utils import download_artifacts, read_agent_log
+
+
+def test_trial_index_is_built_once_per_run_and_queried(tmp_path: Path) -> None:
+    def write_trial(run_dir: Path, model: str, trial: str, result: dict) -> None:
+        folder = (
+            run_dir
+            / f"terminal-bench-results-{model}"
+            / "jobs"
+            / "2026-01-01__00-00-00"
+            / trial
+        )
+        folder.mkdir(parents=True)
+        (folder / "result.json").write_text(json.dumps(result))
+
+    run_dir = tmp_path / "42"
+    write_trial(
+        run_dir,
+        "opus",
+        "chess-best-move__A1",
+        {
+            "verifier_result": {"rewards": {"reward": 0}},
+            "exception_info": {"exception_type": "AgentTimeoutError"},
+            "started_at": "2026-01-01T00:00:00Z",
+            "finished_at": "2026-01-01T00:01:30Z",
+            "agent_result": {"n_input_tokens": 900, "n_output_tokens": 90},
+        },
+    )
+    write_trial(run_dir, "opus", "fix-git__B2", {"passed": True})
+    write_trial(run_dir, "gpt", "chess-best-move__C3", {"passed": True})
+    (run_dir / tbench_utils.RUN_COMPLETE_MARKER).write_text("{}")
+
+    conn = open_trial_index(tmp_path)
+    assert index_run(conn, 42, run_dir)
+    assert not index_run(conn, 42, run_dir)  # Unchanged run is not re-walked
+    assert not index_run(conn, 43, tmp_path / "43")  # Not downloaded
+
+    failures = query_trials(conn, tmp_path, [42], failures_only=True)
+    assert [(t["model"], t["task_name"]) for t in failures] == [
+        ("opus", "chess-best-move")
+    ]
+    assert failures[0]["exception_type"] == "AgentTimeoutError"
+    assert failures[0]["duration_sec"] == 90
+    assert failures[0]["n_input_tokens"] == 900
+    assert failures[0]["path"].read_text().startswith("{")
+    chess = query_trials(conn, tmp_path, [42], task="CHESS")
+    assert sorted(t["model"] for t in chess) == ["gpt", "opus"]
+    assert len(query_trials(conn, tmp_path, [42], model="opus")) == 2
+    # Filters are literal substrings, not LIKE patterns.
+    assert query_trials(conn, tmp_path, [42], task="fix_git") == []
+    assert query_trials(conn, tmp_path, [42], task="%") == []
+
+    # Re-downloading rewrites the marker, which triggers a re-index. A
+    # download that was interrupted mid-extraction is not a result.
+    write_trial(run_dir, "gpt", "fix-git__D4", {"passed": False})
+    partial = run_dir / ".terminal-bench-results-sonnet.partial"
+    write_trial(partial, "sonnet", "fix-git__E5", {"passed": True})
+    marker = run_dir / tbench_utils.RUN_COMPLETE_MARKER
+    os.utime(marker, (marker.stat().st_atime, marker.stat().st_mtime + 1))
+    assert index_run(conn, 42, run_dir)
+    assert len(query_trials(conn, tmp_path, [42])) == 4
+    conn.close()
+
+
+def test_in_progress_runs_without_a_marker_are_indexed_and_shown(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+) -> None:
+    def fake_download(run_id: int, run_dir: Path, **kwargs: object) -> bool:
+        # Like download_run_artifacts for a run that is still in progress:
+        # its artifacts so far are extracted, but no run marker is written.
+        trial = run_dir / "terminal-bench-results-opus" / "jobs" / "j" / "fix-git__A1"
+        trial.mkdir(parents=True, exist_ok=True)
+        (trial / "result.json").write_text(json.dumps({"passed": False}))
+        return True
+
+    monkeypatch.setattr(download_run_logs, "download_run_artifacts", fake_download)
+    argv = ["download_run_logs.py", "--run-id", "42", "--output-dir", str(tmp_path)]
+    monkeypatch.setattr(sys, "argv", argv)
+
+    assert download_run_logs.main() == 0
+    out = capsys.readouterr().out
+    assert "opus: 0/1 passed" in out
+    assert "fix-git" in out
+    assert not tbench_utils.run_is_complete(tmp_path / "42")
+
+    # A later artifact of the same run re-indexes it.
+    trial = (
+        tmp_path / "42" / "terminal-bench-results-gpt" / "jobs" / "j" / "fix-git__B2"
+    )
+    trial.mkdir(parents=True)
+    (trial / "result.json").write_text(json.dumps({"passed": True}))
+    os.utime(tmp_path / "42", (0, time.time() + 5))
+    conn = open_trial_index(tmp_path)
+    assert index_run(conn, 42, tmp_path / "42")
+    assert len(query_trials(conn, tmp_path, [42])) == 2
+    conn.close()
+
+
+def test_kept_artifact_zips_are_read_lazily_and_extracted_on_demand(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    trial = "jobs/2026-01-01__00-00-00/fix-git__A1"
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(f"{trial}/result.json", json.dumps({"passed": False}))
+        archive.writestr(
+            f"{trial}/agent/command-0/stderr.txt.gz", gzip.compress(b"boom\n")
+        )
+    payload = buffer.getvalue()
+    monkeypatch.setattr(
+        tbench_utils,
+        "_fetch_artifact_zip",
+        lambda artifact, zip_path: zip_path.write_bytes(payload),
+    )
+    artifact = {"name": "terminal-bench-results-opus", "id": 5, "size_in_bytes": None}
+    run_dir = tmp_path / "42"
+
+    assert download_artifacts([(artifact, run_dir)], keep_zip=True)
+    assert tbench_utils.artifact_is_complete(run_dir, artifact)
+    assert not (run_dir / artifact["name"]).exists()  # Nothing extracted
+    (run_dir / tbench_utils.RUN_COMPLETE_MARKER).write_text("{}")
+
+    conn = open_trial_index(tmp_path)
+    index_run(conn, 42, run_dir)
+    [failure] = query_trials(conn, tmp_path, [42], failures_only=True)
+    conn.close()
+    assert (failure["model"], failure["task_name"]) == ("opus", "fix-git")
+    command_dir = failure["path"].parent / "agent" / "command-0"
+    assert read_agent_log(command_dir, "stderr.txt") == "boom\n"
+
+    trial_dir = extract_trial(failure["path"])
+    assert trial_dir == run_dir / artifact["name"] / trial
+    assert (trial_dir / "agent" / "command-0" / "stderr.txt.gz").is_file()
+    # The extracted copy does not show up as a second trial.
+    assert len(find_trial_results(run_dir)) == 1
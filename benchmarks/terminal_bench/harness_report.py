@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Report Harbor + MuxAgent harness throughput from local job folders.
+
+Meant for runs against the scripted mock provider (make
+benchmark-terminal-mock), where model latency is fixed and small, so the
+numbers reflect the harness itself. For each job:
+  trials/min  = finished trials / wall clock from first start to last finish
+  setup       = median environment and agent setup seconds per trial
+  agent       = median agent execution seconds per trial
+
+When several jobs ran at different concurrencies (a sweep), the report also
+names the max useful TB_CONCURRENCY: the lowest concurrency that reaches 90%
+of the best observed throughput.
+
+Usage:
+    # Report every job under jobs/
+    python benchmarks/terminal_bench/harness_report.py
+
+    # Only jobs started after a given time (as the make target does)
+    python benchmarks/terminal_bench/harness_report.py --since 1760000000
+
+    # Machine-readable output
+    python benchmarks/terminal_bench/harness_report.py --json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+try:
+    from .tbench_utils import parse_iso_time
+except ImportError:
+    from tbench_utils import parse_iso_time  # type: ignore[import-not-found,no-redef]
+
+# Fraction of the best throughput a concurrency level must reach to count.
+USEFUL_THROUGHPUT_FRACTION = 0.9
+
+
+@dataclass
+class JobThroughput:
+    """Throughput and overhead summary for one Harbor job."""
+
+    job: str
+    concurrency: int | None
+    n_trials: int
+    wall_clock_sec: float
+    trials_per_min: float
+    median_env_setup_sec: float | None
+    median_agent_setup_sec: float | None
+    median_agent_sec: float | None
+
+
+def _phase_seconds(trial_result: dict, phase: str) -> float | None:
+    """Duration of a Harbor trial phase (environment_setup, agent_setup, ...)."""
+    timing = trial_result.get(phase) or {}
+    started = parse_iso_time(timing.get("started_at"))
+    finished = parse_iso_time(timing.get("finished_at"))
+    if started is None or finished is None:
+        return None
+    return (finished - started).total_seconds()
+
+
+def _median(values: list[float | None]) -> float | None:
+    present = [value for value in values if value is not None]
+    return round(statistics.median(present), 2) if present else None
+
+
+def _job_concurrency(job_folder: Path) -> int | None:
+    try:
+        config = json.loads((job_folder / "config.json").read_text())
+    except (OSError, json.JSONDecodeError):
+        return None
+    orchestrator = config.get("orchestrator") or {}
+    return orchestrator.get("n_concurrent_trials") or config.get("n_concurrent_trials")
+
+
+def summarize_job(job_folder: Path) -> JobThroughput | None:
+    """Summarize one job folder; None if it has no finished trials."""
+    trial_folders = []
+    trials = []
+    for trial_folder in sorted(job_folder.iterdir()):
+        try:
+            trials.append(json.loads((trial_folder / "result.json").read_text()))
+        except (OSError, json.JSONDecodeError):
+            continue
+        trial_folders.append(trial_folder)
+
+    starts = [parse_iso_time(trial.get("started_at")) for trial in trials]
+    finishes = [parse_iso_time(trial.get("finished_at")) for trial in trials]
+    starts = [start for start in starts if start is not None]
+    finishes = [finish for finish in finishes if finish is not None]
+    if not starts or not finishes:
+        return None
+
+    wall_clock = (max(finishes) - min(starts)).total_seconds()
+    # MuxAgent's own setup timer covers runs where Harbor lacks agent_setup.
+    agent_setup = []
+    for trial_folder, trial in zip(trial_folders, trials):
+        seconds = _phase_seconds(trial, "agent_setup")
+        if seconds is None:
+            try:
+                timings = json.loads(
+                    (trial_folder / "agent" / "setup-timings.json").read_text()
+                )
+                seconds = timings.get("total_seconds")
+            except (OSError, json.JSONDecodeError):
+                pass
+        agent_setup.append(seconds)
+
+    return JobThroughput(
+        job=job_folder.name,
+        concurrency=_job_concurrency(job_folder),
+        n_trials=len(finishes),
+        wall_clock_sec=round(wall_clock, 1),
+        trials_per_min=round(len(finishes) / wall_clock * 60, 2) if wall_clock else 0.0,
+        median_env_setup_sec=_median(
+            [_phase_seconds(trial, "environment_setup") for trial in trials]
+        ),
+        median_agent_setup_sec=_median(agent_setup),
+        median_agent_sec=_median(
+            [_phase_seconds(trial, "agent_execution") for trial in trials]
+        ),
+    )
+
+
+def _cell(value: object) -> str:
+    return "-" if value is None else str(value)
+
+
+def max_useful_concurrency(jobs: list[JobThroughput]) -> int | None:
+    """Lowest concurrency within USEFUL_THROUGHPUT_FRACTION of the best."""
+    swept = [job for job in jobs if job.concurrency]
+    if len({job.concurrency for job in swept}) < 2:
+        return None
+    best = max(job.trials_per_min for job in swept)
+    useful = [
+        job.concurrency
+        for job in swept
+        if job.trials_per_min >= best * USEFUL_THROUGHPUT_FRACTION
+    ]
+    return min(useful) if useful else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Report harness throughput from Harbor job folders"
+    )
+    parser.add_argument(
+        "--jobs-dir", type=Path, default=Path("jobs"), help="Harbor jobs directory"
+    )
+    parser.add_argument(
+        "--since",
+        type=float,
+        help="Only jobs whose folder changed after this Unix time",
+    )
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+
+    if not args.jobs_dir.is_dir():
+        print(f"No jobs directory at {args.jobs_dir}", file=sys.stderr)
+        return 1
+    job_folders = sorted(
+        folder
+        for folder in args.jobs_dir.iterdir()
+        if folder.is_dir()
+        and (args.since is None or folder.stat().st_mtime >= args.since)
+    )
+    jobs = [job for folder in job_folders if (job := summarize_job(folder))]
+    if not jobs:
+        print("No finished trials found", file=sys.stderr)
+        return 1
+
+    jobs.sort(key=lambda job: (job.concurrency or 0, job.job))
+    knee = max_useful_concurrency(jobs)
+    if args.json:
+        print(
+            json.dumps(
+                {"jobs": [asdict(job) for job in jobs], "max_useful_concurrency": knee},
+                indent=2,
+            )
+        )
+        return 0
+
+    print(
+        f"{'job':<28} {'conc':>5} {'trials':>6} {'wall s':>8} {'trials/min':>10} "
+        f"{'env setup':>9} {'agent setup':>11} {'agent':>7}"
+    )
+    for job in jobs:
+        print(
+            f"{job.job:<28} {_cell(job.concurrency):>5} {job.n_trials:>6} "
+            f"{job.wall_clock_sec:>8} {job.trials_per_min:>10} "
+            f"{_cell(job.median_env_setup_sec):>9} "
+            f"{_cell(job.median_agent_setup_sec):>11} "
+            f"{_cell(job.median_agent_sec):>7}"
+        )
+    if knee is not None:
+        print(f"\nMax useful TB_CONCURRENCY on this host: {knee}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
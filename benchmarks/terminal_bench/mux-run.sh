@@ -11,6 +11,9 @@ fatal() {
   exit 1
 }
 
+# The python helpers staged next to this script (mux_*.py) run with whatever
+# python3 the task image ships, so they stick to the standard library.
+
 instruction=${1:-}
 if [[ -z "${instruction}" ]]; then
   fatal "instruction argument is required"
@@ -34,6 +37,42 @@ MUX_MODEL="${MUX_MODEL:-anthropic:claude-sonnet-4-5}"
 MUX_TIMEOUT_MS="${MUX_TIMEOUT_MS:-}"
 MUX_WORKSPACE_ID="${MUX_WORKSPACE_ID:-mux-bench}"
 MUX_EXPERIMENTS="${MUX_EXPERIMENTS:-}"
+# Size the JS heap heuristics, GC and JIT threads to the sandbox's cgroup
+# limits instead of the host's (0 disables).
+MUX_RUNTIME_TUNING="${MUX_RUNTIME_TUNING:-1}"
+# Number of start-up probe runs (first cold, rest warm) before the session; 0
+# skips the probe.
+MUX_STARTUP_PROBE_RUNS="${MUX_STARTUP_PROBE_RUNS:-0}"
+# Provider record/replay proxy: "record" captures provider traffic to a
+# cassette, "replay" serves a cassette back offline; unset talks to providers
+# directly.
+MUX_PROVIDER_PROXY="${MUX_PROVIDER_PROXY:-}"
+MUX_PROVIDER_REPLAY_LATENCY="${MUX_PROVIDER_REPLAY_LATENCY:-original}"
+# Scripted mock Anthropic provider for harness throughput runs (1 enables);
+# MUX_MOCK_SCRIPT overrides the turns, the rest shape its latency.
+MUX_MOCK_PROVIDER="${MUX_MOCK_PROVIDER:-0}"
+MUX_MOCK_SCRIPT="${MUX_MOCK_SCRIPT:-}"
+MUX_MOCK_TTFT_MS="${MUX_MOCK_TTFT_MS:-500}"
+MUX_MOCK_TOKENS_PER_SEC="${MUX_MOCK_TOKENS_PER_SEC:-50}"
+
+# Start a localhost helper server in the background; it writes its port to
+# the file passed as --port-file once listening. Sets local_server_url.
+local_server_pids=()
+start_local_server() {
+  local name=$1
+  shift
+  local port_file
+  port_file="$(mktemp -u /tmp/mux-port.XXXXXX)"
+  python3 "$@" --port-file "${port_file}" &
+  local_server_pids+=($!)
+  for _ in $(seq 1 100); do
+    [[ -s "${port_file}" ]] && break
+    sleep 0.1
+  done
+  [[ -s "${port_file}" ]] || fatal "${name} did not start"
+  local_server_url="http://127.0.0.1:$(cat "${port_file}")"
+  rm -f "${port_file}"
+}
 
 resolve_project_path() {
   if [[ -n "${MUX_PROJECT_PATH}" ]]; then
@@ -61,7 +100,28 @@ project_path=$(resolve_project_path)
 log "starting mux agent session for ${project_path}"
 cd "${MUX_APP_ROOT}"
 
-cmd=(bun src/cli/run.ts
+# Payloads built with MUX_PAYLOAD_MODE=bundle ship a pre-bundled, minified CLI
+# that skips the TypeScript transpile at startup.
+cli_entry="src/cli/run.ts"
+if [[ -f "bundle/run.js" ]]; then
+  cli_entry="bundle/run.js"
+fi
+
+cmd=(bun)
+if [[ "${MUX_RUNTIME_TUNING}" != "0" ]]; then
+  tuning="$(python3 /installed-agent/mux_resources.py tune)" || fatal "runtime tuning failed"
+  eval "${tuning}"
+  log "runtime tuning: $(printf '%s' "${tuning}" | sed 's/^export //' | tr '\n' ' ')"
+  if [[ "${MUX_BUN_SMOL:-0}" == "1" ]]; then
+    cmd+=(--smol)
+  fi
+fi
+
+# The start-up probe runs the same runtime and entry point, without the
+# session's project, model and run flags.
+probe_cmd=("${cmd[@]}" "${cli_entry}")
+
+cmd+=("${cli_entry}"
   --dir "${project_path}"
   --model "${MUX_MODEL}"
   --keep-background-processes
@@ -92,9 +152,89 @@ fi
 # the trial hits AgentTimeoutError and the exec call is cancelled.
 MUX_LOG_DIR="/logs/agent/command-0"
 mkdir -p "${MUX_LOG_DIR}"
-MUX_OUTPUT_FILE="${MUX_LOG_DIR}/stdout.txt"
-MUX_STDERR_FILE="${MUX_LOG_DIR}/stderr.txt"
+# Logs are captured compressed (MUX_LOG_CODEC: gzip, zstd or none) and capped at
+# MUX_LOG_MAX_BYTES of uncompressed output per stream (head + tail are kept),
+# flushed every MUX_LOG_FLUSH_SEC seconds.
+MUX_LOG_CODEC="${MUX_LOG_CODEC:-gzip}"
+MUX_LOG_MAX_BYTES="${MUX_LOG_MAX_BYTES:-67108864}"
+MUX_LOG_FLUSH_SEC="${MUX_LOG_FLUSH_SEC:-5}"
+case "${MUX_LOG_CODEC}" in
+  gzip) log_suffix=".gz" ;;
+  zstd) log_suffix=".zst" ;;
+  none) log_suffix="" ;;
+  *) fatal "MUX_LOG_CODEC must be gzip, zstd or none (got ${MUX_LOG_CODEC})" ;;
+esac
+MUX_OUTPUT_FILE="${MUX_LOG_DIR}/stdout.txt${log_suffix}"
+MUX_STDERR_FILE="${MUX_LOG_DIR}/stderr.txt${log_suffix}"
 MUX_TOKEN_FILE="/tmp/mux-tokens.json"
+# Resource time series (RSS/CPU of this process tree, cgroup memory) and the
+# exit classification derived from it; 0 disables sampling.
+MUX_RESOURCE_SAMPLE_SEC="${MUX_RESOURCE_SAMPLE_SEC:-2}"
+MUX_RESOURCE_SAMPLES_FILE="${MUX_LOG_DIR}/resources.jsonl"
+MUX_RESOURCE_SUMMARY_FILE="${MUX_LOG_DIR}/resources.json"
+MUX_TOKEN_CHECKPOINT_SEC="${MUX_TOKEN_CHECKPOINT_SEC:-5}"
+
+# Warmup stage (a separate exec before the timed run): load the CLI once
+# against the stub provider to fill bun's transpile cache and the page cache,
+# then stop before the session.
+if [[ "${MUX_WARMUP_ONLY:-0}" == "1" ]]; then
+  log "warming up the CLI against a stub provider"
+  python3 /installed-agent/mux_startup_probe.py --runs 1 \
+    "${MUX_LOG_DIR}/warmup-probe.json" -- "${probe_cmd[@]}" \
+    || fatal "warmup run failed"
+  exit 0
+fi
+
+if [[ "${MUX_STARTUP_PROBE_RUNS}" != "0" ]]; then
+  log "probing CLI start-up (${MUX_STARTUP_PROBE_RUNS} runs)"
+  python3 /installed-agent/mux_startup_probe.py --runs "${MUX_STARTUP_PROBE_RUNS}" \
+    "${MUX_LOG_DIR}/startup-probe.json" -- "${probe_cmd[@]}" \
+    || log "start-up probe failed; continuing with the session"
+fi
+
+if [[ -n "${MUX_PROVIDER_PROXY}" && "${MUX_MOCK_PROVIDER}" == "1" ]]; then
+  fatal "MUX_PROVIDER_PROXY and MUX_MOCK_PROVIDER are mutually exclusive"
+fi
+
+if [[ -n "${MUX_PROVIDER_PROXY}" ]]; then
+  MUX_PROVIDER_CASSETTE="${MUX_PROVIDER_CASSETTE:-${MUX_LOG_DIR}/provider-cassette.jsonl}"
+  case "${MUX_PROVIDER_PROXY}" in
+    record) rm -f "${MUX_PROVIDER_CASSETTE}" ;;
+    replay)
+      [[ -f "${MUX_PROVIDER_CASSETTE}" ]] || fatal "provider cassette ${MUX_PROVIDER_CASSETTE} not found"
+      ;;
+    *) fatal "MUX_PROVIDER_PROXY must be record or replay (got ${MUX_PROVIDER_PROXY})" ;;
+  esac
+  # The proxy reads the real upstream base URLs before they are redirected.
+  start_local_server "provider proxy" /installed-agent/mux_provider_proxy.py \
+    --mode "${MUX_PROVIDER_PROXY}" \
+    --cassette "${MUX_PROVIDER_CASSETTE}" \
+    --latency "${MUX_PROVIDER_REPLAY_LATENCY}" \
+    --stats "${MUX_LOG_DIR}/provider-proxy.json"
+  # mux appends /v1, so Anthropic requests arrive as /anthropic/v1/...
+  export ANTHROPIC_BASE_URL="${local_server_url}/anthropic"
+  export OPENAI_BASE_URL="${local_server_url}/openai"
+  export GOOGLE_BASE_URL="${local_server_url}/google"
+  if [[ "${MUX_PROVIDER_PROXY}" == "replay" ]]; then
+    # Providers only count as configured with a key; replay never sends it on.
+    export ANTHROPIC_API_KEY="${ANTHROPIC_API_KEY:-replay}"
+    export OPENAI_API_KEY="${OPENAI_API_KEY:-replay}"
+    export GOOGLE_GENERATIVE_AI_API_KEY="${GOOGLE_GENERATIVE_AI_API_KEY:-replay}"
+  fi
+  log "provider proxy (${MUX_PROVIDER_PROXY}) listening on ${local_server_url}"
+fi
+
+if [[ "${MUX_MOCK_PROVIDER}" == "1" ]]; then
+  [[ "${MUX_MODEL}" == anthropic:* ]] || fatal "MUX_MOCK_PROVIDER needs an anthropic: model (got ${MUX_MODEL})"
+  start_local_server "mock provider" /installed-agent/mux_mock_provider.py \
+    --script "${MUX_MOCK_SCRIPT}" \
+    --ttft-ms "${MUX_MOCK_TTFT_MS}" \
+    --tokens-per-sec "${MUX_MOCK_TOKENS_PER_SEC}" \
+    --stats "${MUX_LOG_DIR}/mock-provider.json"
+  export ANTHROPIC_BASE_URL="${local_server_url}/v1"
+  export ANTHROPIC_API_KEY="mock"
+  log "mock provider listening on ${local_server_url}"
+fi
 
 # Wrap command with timeout if MUX_TIMEOUT_MS is set (converts ms to seconds)
 if [[ -n "${MUX_TIMEOUT_MS}" ]]; then
@@ -102,61 +242,71 @@ if [[ -n "${MUX_TIMEOUT_MS}" ]]; then
   cmd=(timeout "${timeout_sec}s" "${cmd[@]}")
 fi
 
-# Capture output to file while streaming to terminal for token extraction.
-# Keep stderr separate so the stdout log stays valid JSONL.
-if ! printf '%s' "${instruction}" \
-  | "${cmd[@]}" \
-    2> >(tee "${MUX_STDERR_FILE}" >&2) \
-  | tee "${MUX_OUTPUT_FILE}"; then
-  fatal "mux agent session failed"
+capture=(python3 /installed-agent/mux_log_capture.py
+  --codec "${MUX_LOG_CODEC}"
+  --max-bytes "${MUX_LOG_MAX_BYTES}"
+  --flush-sec "${MUX_LOG_FLUSH_SEC}")
+
+# Stderr goes through a FIFO to a background capture so we can wait for it to
+# finish writing (a process substitution inside the pipeline can't be waited on).
+stderr_fifo="$(mktemp -u /tmp/mux-stderr.XXXXXX)"
+mkfifo "${stderr_fifo}"
+"${capture[@]}" --no-passthrough "${MUX_STDERR_FILE}" <"${stderr_fifo}" &
+stderr_capture_pid=$!
+
+sampler_pid=""
+if [[ "${MUX_RESOURCE_SAMPLE_SEC}" != "0" ]]; then
+  rm -f "${MUX_RESOURCE_SAMPLES_FILE}" "${MUX_RESOURCE_SUMMARY_FILE}"
+  # Root the sampler at the agent stage of the pipeline below, not at this
+  # shell, so the log capture, token tap and local servers are not counted.
+  # The stage writes its own pid before exec'ing the agent command.
+  agent_pid_file="$(mktemp /tmp/mux-agent-pid.XXXXXX)"
+  cmd=(bash -c 'echo $$ >"$0" && exec "$@"' "${agent_pid_file}" "${cmd[@]}")
+  python3 /installed-agent/mux_resources.py sample \
+    --root-pid-file "${agent_pid_file}" --interval "${MUX_RESOURCE_SAMPLE_SEC}" \
+    "${MUX_RESOURCE_SAMPLES_FILE}" &
+  sampler_pid=$!
+fi
+
+# Capture stdout (valid JSONL) and stderr separately. The agent stream is not
+# echoed to this script's stdout, so Harbor's exec result stays small; the host
+# downloads the capped, compressed logs instead. Stdout also flows through the
+# token tap, which keeps running usage totals and checkpoints them to
+# MUX_TOKEN_FILE every few seconds, so usage survives timeouts and cancelled
+# execs.
+set +e
+printf '%s' "${instruction}" \
+  | "${cmd[@]}" 2>"${stderr_fifo}" \
+  | "${capture[@]}" "${MUX_OUTPUT_FILE}" \
+  | python3 /installed-agent/mux_token_tap.py \
+    --interval "${MUX_TOKEN_CHECKPOINT_SEC}" "${MUX_TOKEN_FILE}" >/dev/null
+pipe_status=("${PIPESTATUS[@]}")
+set -e
+# The agent's own exit code (124 from timeout, 137 when SIGKILLed) drives the
+# classification; any failing stage fails the session.
+agent_status=${pipe_status[1]}
+status=0
+for stage_status in "${pipe_status[@]}"; do
+  if ((stage_status != 0)); then
+    status=${stage_status}
+  fi
+done
+wait "${stderr_capture_pid}" || true
+rm -f "${stderr_fifo}"
+
+if [[ -n "${sampler_pid}" ]]; then
+  kill -TERM "${sampler_pid}" 2>/dev/null || true
+  wait "${sampler_pid}" || true
+  rm -f "${agent_pid_file}"
+  python3 /installed-agent/mux_resources.py summarize --exit-code "${agent_status}" \
+    "${MUX_RESOURCE_SAMPLES_FILE}" "${MUX_RESOURCE_SUMMARY_FILE}" || true
 fi
 
-# Extract usage and cost from the JSONL output.
-# Prefer the run-complete event (emitted at end of --json run) which has aggregated
-# totals. Fall back to summing usage-delta + session-usage-delta events when
-# run-complete is missing (e.g. process killed by timeout, stdout not flushed).
-python3 -c '
-import json, sys
-result = {"input": 0, "output": 0, "cost_usd": None}
-# Track cumulative usage from usage-delta events (keyed by messageId).
-# Each usage-delta contains cumulative totals for its message, so we keep the
-# latest per message and sum across messages at the end.
-cumulative_by_msg = {}
-# Track sub-agent usage from session-usage-delta events. These carry per-model
-# byModelDelta dicts with {input: {tokens, cost_usd}, output: {tokens, cost_usd}, ...}.
-# Each event is an incremental delta, so we sum them all.
-subagent_input = 0
-subagent_output = 0
-for line in open(sys.argv[1]):
-    try:
-        obj = json.loads(line)
-        if obj.get("type") == "run-complete":
-            usage = obj.get("usage") or {}
-            result["input"] = usage.get("inputTokens", 0) or 0
-            result["output"] = usage.get("outputTokens", 0) or 0
-            result["cost_usd"] = obj.get("cost_usd")
-            print(json.dumps(result))
-            sys.exit(0)
-        # Nested event wrapper: {"type":"event","payload":{"type":"usage-delta",...}}
-        payload = obj.get("payload") or obj
-        if payload.get("type") == "usage-delta":
-            msg_id = payload.get("messageId", "")
-            # Prefer cumulativeUsage (running total across all steps in a message)
-            # over usage (per-step delta). Keeping the latest cumulative per message
-            # gives the correct total when summed across messages.
-            usage = payload.get("cumulativeUsage") or payload.get("usage") or {}
-            cumulative_by_msg[msg_id] = usage
-        elif payload.get("type") == "session-usage-delta":
-            for model_usage in (payload.get("byModelDelta") or {}).values():
-                subagent_input += (model_usage.get("input") or {}).get("tokens", 0)
-                subagent_output += (model_usage.get("output") or {}).get("tokens", 0)
-    except Exception:
-        pass
-# No run-complete found — aggregate the last usage-delta per message + sub-agent totals
-for usage in cumulative_by_msg.values():
-    result["input"] += (usage.get("inputTokens", 0) or 0)
-    result["output"] += (usage.get("outputTokens", 0) or 0)
-result["input"] += subagent_input
-result["output"] += subagent_output
-print(json.dumps(result))
-' "${MUX_OUTPUT_FILE}" > "${MUX_TOKEN_FILE}" 2>/dev/null || true
+for server_pid in ${local_server_pids[@]+"${local_server_pids[@]}"}; do
+  kill -TERM "${server_pid}" 2>/dev/null || true
+  wait "${server_pid}" || true
+done
+
+if ((status != 0)); then
+  fatal "mux agent session failed (agent exit ${agent_status})"
+fi
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import hashlib
 import json
 import os
 import shlex
+import time
 from collections.abc import Sequence
 from pathlib import Path
 from typing import Any
@@ -11,7 +15,35 @@ from harbor.agents.installed.base import BaseInstalledAgent, ExecInput
 from harbor.environments.base import BaseEnvironment
 from harbor.models.agent.context import AgentContext
 
-from .mux_payload import build_app_archive
+from .mux_live import LIVE_EVENTS_FILE, LiveEventStream
+from .mux_log_capture import LOG_CODEC_SUFFIXES
+from .mux_mock_provider import MOCK_PROVIDER_STATS_FILE
+from .mux_payload import (
+    DEFAULT_DEPS_PLATFORM,
+    DEFAULT_INCLUDE_PATHS,
+    DEFAULT_PAYLOAD_CODEC,
+    PAYLOAD_CODECS,
+    CachedArchive,
+    CliBundleSpec,
+    PayloadManifest,
+    get_cached_app_archive,
+    get_cached_deps_snapshot,
+    host_platform,
+    stage_payload_bundle,
+)
+from .mux_provider_proxy import (
+    PROVIDER_CASSETTE_FILE,
+    PROVIDER_PROXY_STATS_FILE,
+    PROXY_MODES,
+    REPLAY_LATENCIES,
+)
+from .mux_resources import (
+    RESOURCE_SAMPLES_FILE,
+    RESOURCE_SUMMARY_FILE,
+    summarize_samples,
+)
+from .mux_startup_probe import STARTUP_PROBE_FILE
+from .mux_timings import SetupTimer
 
 
 class MuxAgent(BaseInstalledAgent):
@@ -21,19 +53,22 @@ class MuxAgent(BaseInstalledAgent):
     """
 
     _ARCHIVE_NAME = "mux-app.tar.gz"
+    _DEPS_ARCHIVE_NAME = "mux-deps.tar.gz"
+    _INSTALL_MARKER_NAME = ".mux-install-digest"
+    _PAYLOAD_RECORD_NAME = "mux-payload.json"
     _RUNNER_NAME = "mux-run.sh"
+    # Helper scripts mux-run.sh runs around the agent (staged next to it).
+    _RUNNER_HELPER_NAMES: Sequence[str] = (
+        "mux_token_tap.py",
+        "mux_log_capture.py",
+        "mux_resources.py",
+        "mux_startup_probe.py",
+        "mux_provider_proxy.py",
+        "mux_mock_provider.py",
+    )
     _DEFAULT_MODEL = "anthropic:claude-sonnet-4-5"
     _DEFAULT_PROJECT_CANDIDATES = "/workspace:/app:/workspaces:/root/project"
-    _INCLUDE_PATHS: Sequence[str] = (
-        "package.json",
-        "bun.lock",
-        "bunfig.toml",
-        "tsconfig.json",
-        "tsconfig.main.json",
-        "src",
-        "dist",
-        "scripts/postinstall.sh",
-    )
+    _INCLUDE_PATHS: Sequence[str] = DEFAULT_INCLUDE_PATHS
 
     _PROVIDER_ENV_KEYS: Sequence[str] = (
         "ANTHROPIC_API_KEY",
@@ -68,6 +103,30 @@ class MuxAgent(BaseInstalledAgent):
         # Generic pass-through for arbitrary mux run CLI flags (e.g., --thinking
         # high --use-1m --budget 5.00). Avoids per-flag plumbing.
         "MUX_RUN_ARGS",
+        # Seconds between usage checkpoints written to /tmp/mux-tokens.json.
+        "MUX_TOKEN_CHECKPOINT_SEC",
+        # Agent log capture: codec (gzip/zstd/none), per-stream byte cap and
+        # seconds between flushes.
+        "MUX_LOG_CODEC",
+        "MUX_LOG_MAX_BYTES",
+        "MUX_LOG_FLUSH_SEC",
+        # Seconds between RSS/CPU/cgroup memory samples (0 disables sampling).
+        "MUX_RESOURCE_SAMPLE_SEC",
+        # Set to 0 to skip sizing Bun's heap/GC/JIT threads to the cgroup limits.
+        "MUX_RUNTIME_TUNING",
+        # CLI start-up probe runs against a stub provider before the session
+        # (first cold, rest warm); 0 or unset skips the probe.
+        "MUX_STARTUP_PROBE_RUNS",
+        # Provider record/replay proxy (record|replay) and replay chunk timing
+        # (original|zero); cassettes live in MUX_PROVIDER_CASSETTE_DIR.
+        "MUX_PROVIDER_PROXY",
+        "MUX_PROVIDER_REPLAY_LATENCY",
+        # Scripted mock Anthropic provider for harness benchmarks: on/off, turn
+        # script (inline JSON or path), first-token delay and stream rate.
+        "MUX_MOCK_PROVIDER",
+        "MUX_MOCK_SCRIPT",
+        "MUX_MOCK_TTFT_MS",
+        "MUX_MOCK_TOKENS_PER_SEC",
     )
 
     def __init__(
@@ -96,8 +155,12 @@ class MuxAgent(BaseInstalledAgent):
             raise RuntimeError(f"mux runner script missing at {runner_path}")
 
         self._runner_path = runner_path
+        self._runner_helper_paths = {
+            name: Path(__file__).with_name(name) for name in self._RUNNER_HELPER_NAMES
+        }
         self._repo_root = repo_root
-        self._archive_bytes: bytes | None = None
+        self._archive: CachedArchive | None = None
+        self._deps_archive: CachedArchive | None = None
         self._model_name = (model_name or "").strip()
         self._experiments = (experiments or "").strip() if experiments else None
         self._last_environment: BaseEnvironment | None = None
@@ -131,9 +194,14 @@ class MuxAgent(BaseInstalledAgent):
 
         # Fail fast for Google models if credentials weren't forwarded into the
         # sandbox env. Otherwise Harbor/mux will fail later with a less actionable
-        # "api_key_not_found" error.
-        if model_value.startswith("google:") and not (
-            env.get("GOOGLE_GENERATIVE_AI_API_KEY") or env.get("GOOGLE_API_KEY")
+        # "api_key_not_found" error. Replayed runs never reach Google.
+        mock_provider = env.get("MUX_MOCK_PROVIDER", "").lower() in ("1", "true", "yes")
+        if (
+            model_value.startswith("google:")
+            and env.get("MUX_PROVIDER_PROXY") != "replay"
+            and not (
+                env.get("GOOGLE_GENERATIVE_AI_API_KEY") or env.get("GOOGLE_API_KEY")
+            )
         ):
             raise ValueError(
                 "Google models require GOOGLE_GENERATIVE_AI_API_KEY (preferred) or GOOGLE_API_KEY"
@@ -161,6 +229,67 @@ class MuxAgent(BaseInstalledAgent):
         if self._experiments:
             env["MUX_EXPERIMENTS"] = self._experiments
 
+        # Live event streaming tails the plain stdout log as it grows, so it
+        # defaults to no compression and rejects an explicit codec.
+        live_interval = self._live_events_interval
+        default_codec = "gzip" if live_interval is None else "none"
+        log_codec = env.get("MUX_LOG_CODEC", default_codec).strip()
+        if log_codec not in LOG_CODEC_SUFFIXES:
+            raise ValueError(
+                f"MUX_LOG_CODEC must be one of {', '.join(sorted(LOG_CODEC_SUFFIXES))}"
+            )
+        if live_interval is not None:
+            if log_codec != "none":
+                raise ValueError(
+                    f"{self._LIVE_EVENTS_ENV_KEY} requires MUX_LOG_CODEC=none "
+                    f"(got {log_codec})"
+                )
+            # Flush the capture as often as the host pulls it.
+            env["MUX_LOG_FLUSH_SEC"] = str(live_interval)
+        env["MUX_LOG_CODEC"] = log_codec
+
+        if max_bytes := env.get("MUX_LOG_MAX_BYTES"):
+            if not max_bytes.strip().isdigit():
+                raise ValueError("MUX_LOG_MAX_BYTES must be an integer")
+        if flush_sec := env.get("MUX_LOG_FLUSH_SEC"):
+            try:
+                float(flush_sec)
+            except ValueError:
+                raise ValueError("MUX_LOG_FLUSH_SEC must be a number") from None
+
+        if proxy_mode := env.get("MUX_PROVIDER_PROXY"):
+            if proxy_mode not in PROXY_MODES:
+                raise ValueError(
+                    f"MUX_PROVIDER_PROXY must be one of {', '.join(PROXY_MODES)}"
+                )
+            if proxy_mode == "replay":
+                env["MUX_PROVIDER_CASSETTE"] = self._PROVIDER_CASSETTE_PATH
+        latency = env.get("MUX_PROVIDER_REPLAY_LATENCY")
+        if latency and latency not in REPLAY_LATENCIES:
+            raise ValueError(
+                "MUX_PROVIDER_REPLAY_LATENCY must be one of "
+                f"{', '.join(REPLAY_LATENCIES)}"
+            )
+
+        if mock_provider:
+            env["MUX_MOCK_PROVIDER"] = "1"  # mux-run.sh only checks for "1"
+            if not model_value.startswith("anthropic:"):
+                raise ValueError("MUX_MOCK_PROVIDER requires an anthropic: model")
+            if env.get("MUX_PROVIDER_PROXY"):
+                raise ValueError(
+                    "MUX_MOCK_PROVIDER and MUX_PROVIDER_PROXY are mutually exclusive"
+                )
+        for key in ("MUX_MOCK_TTFT_MS", "MUX_MOCK_TOKENS_PER_SEC"):
+            if mock_value := env.get(key):
+                try:
+                    float(mock_value)
+                except ValueError:
+                    raise ValueError(f"{key} must be a number") from None
+
+        if probe_runs := env.get("MUX_STARTUP_PROBE_RUNS"):
+            if not probe_runs.strip().isdigit():
+                raise ValueError("MUX_STARTUP_PROBE_RUNS must be an integer")
+
         return env
 
     @property
@@ -168,81 +297,438 @@ class MuxAgent(BaseInstalledAgent):
         return Path(__file__).with_name("mux_setup.sh.j2")
 
     _PROVIDERS_FILE_ENV_KEY = "MUX_PROVIDERS_FILE"
+    _PAYLOAD_CACHE_DIR_ENV_KEY = "MUX_PAYLOAD_CACHE_DIR"
+    _PAYLOAD_MANIFEST_ENV_KEY = "MUX_PAYLOAD_MANIFEST"
+    _PAYLOAD_MODE_ENV_KEY = "MUX_PAYLOAD_MODE"
+    _PAYLOAD_MODES: Sequence[str] = ("source", "bundle")
+    _PAYLOAD_CODEC_ENV_KEY = "MUX_PAYLOAD_CODEC"
+    _PAYLOAD_LEVEL_ENV_KEY = "MUX_PAYLOAD_LEVEL"
+    _PAYLOAD_THREADS_ENV_KEY = "MUX_PAYLOAD_THREADS"
+    _DEPS_SNAPSHOT_ENV_KEY = "MUX_DEPS_SNAPSHOT"
+    _DEPS_PLATFORM_ENV_KEY = "MUX_DEPS_SNAPSHOT_PLATFORM"
+    _LIVE_EVENTS_ENV_KEY = "MUX_LIVE_EVENTS_SEC"
+    _WARMUP_ENV_KEY = "MUX_WARMUP"
+    # Upper bound for the warmup exec; it only loads the CLI and runs one
+    # no-op session against a local stub provider.
+    _WARMUP_TIMEOUT_SEC = 300
+    _WARMUP_FILE = "warmup.json"
+    _PROVIDER_CASSETTE_DIR_ENV_KEY = "MUX_PROVIDER_CASSETTE_DIR"
+    # Where replay mode uploads the trial's cassette in the sandbox.
+    _PROVIDER_CASSETTE_PATH = "/tmp/mux-provider-cassette.jsonl"
     _TOKEN_FILE_PATH = "/tmp/mux-tokens.json"
+    # Written by mux-run.sh for the first command. Logs carry a codec suffix
+    # (MUX_LOG_CODEC); live event streaming needs the plain stdout.txt.
+    _AGENT_LOG_DIR = "/logs/agent/command-0"
+    _AGENT_STDOUT_PATH = f"{_AGENT_LOG_DIR}/stdout.txt"
+    _SETUP_TIMINGS_PATH = "/installed-agent/setup-timings.jsonl"
 
-    async def _stage_providers_config(
-        self, environment: BaseEnvironment, env: dict[str, str]
-    ) -> None:
-        """Upload host providers.jsonc into the sandbox when explicitly requested."""
+    @property
+    def _payload_cache_dir(self) -> Path | None:
+        cache_dir_raw = os.environ.get(self._PAYLOAD_CACHE_DIR_ENV_KEY)
+        if not cache_dir_raw:
+            return None
+        return Path(cache_dir_raw).expanduser().resolve()
+
+    @property
+    def _provider_cassette_dir(self) -> Path:
+        cassette_dir_raw = os.environ.get(self._PROVIDER_CASSETTE_DIR_ENV_KEY)
+        if not cassette_dir_raw:
+            return Path(__file__).with_name(".provider_cassettes")
+        return Path(cassette_dir_raw).expanduser().resolve()
+
+    def _provider_cassette(self, instruction: str) -> Path:
+        """Host cassette for a task, keyed by its instruction."""
+        key = hashlib.sha256(instruction.encode()).hexdigest()[:16]
+        return self._provider_cassette_dir / f"{key}.jsonl"
+
+    @property
+    def _payload_manifest(self) -> PayloadManifest:
+        """Payload manifest from MUX_PAYLOAD_MANIFEST, or the full include list."""
+        manifest_raw = os.environ.get(self._PAYLOAD_MANIFEST_ENV_KEY)
+        if not manifest_raw:
+            return PayloadManifest(include=tuple(self._INCLUDE_PATHS))
+
+        manifest_path = Path(manifest_raw).expanduser().resolve()
+        if not manifest_path.is_file():
+            raise RuntimeError(
+                f"{self._PAYLOAD_MANIFEST_ENV_KEY}={manifest_path} is not a readable file"
+            )
+        return PayloadManifest.load(manifest_path)
+
+    @property
+    def _payload_options(self) -> dict[str, Any]:
+        """Host-side archive settings (codec, level, threads, bundled CLI)."""
+        mode = (os.environ.get(self._PAYLOAD_MODE_ENV_KEY) or "source").strip()
+        if mode not in self._PAYLOAD_MODES:
+            raise ValueError(
+                f"{self._PAYLOAD_MODE_ENV_KEY} must be one of {list(self._PAYLOAD_MODES)}"
+            )
+        codec = (
+            os.environ.get(self._PAYLOAD_CODEC_ENV_KEY) or DEFAULT_PAYLOAD_CODEC
+        ).strip()
+        if codec not in PAYLOAD_CODECS:
+            raise ValueError(
+                f"{self._PAYLOAD_CODEC_ENV_KEY} must be one of {sorted(PAYLOAD_CODECS)}"
+            )
+        options: dict[str, Any] = {
+            "codec": codec,
+            "level": None,
+            "threads": None,
+            "bundle": CliBundleSpec() if mode == "bundle" else None,
+        }
+        for key, env_key in (
+            ("level", self._PAYLOAD_LEVEL_ENV_KEY),
+            ("threads", self._PAYLOAD_THREADS_ENV_KEY),
+        ):
+            if value := os.environ.get(env_key, "").strip():
+                if not value.isdigit():
+                    raise ValueError(f"{env_key} must be an integer")
+                options[key] = int(value)
+        return options
+
+    @property
+    def _deps_snapshot_platform(self) -> str | None:
+        """Target platform for the vendored node_modules snapshot, if enabled."""
+        enabled = os.environ.get(self._DEPS_SNAPSHOT_ENV_KEY, "").strip().lower()
+        if enabled not in ("1", "true", "yes"):
+            return None
+        if self._payload_options["bundle"] is not None:
+            raise ValueError(
+                f"{self._DEPS_SNAPSHOT_ENV_KEY} only applies to the source payload mode"
+            )
+        platform = (
+            os.environ.get(self._DEPS_PLATFORM_ENV_KEY) or DEFAULT_DEPS_PLATFORM
+        ).strip()
+        # Native addons are compiled for the build host, so a snapshot built
+        # elsewhere would not load in the sandbox.
+        if platform != host_platform():
+            raise ValueError(
+                f"{self._DEPS_SNAPSHOT_ENV_KEY} needs a {platform} host (this is "
+                f"{host_platform()}); unset it to install dependencies in the sandbox"
+            )
+        return platform
+
+    @property
+    def _providers_path(self) -> Path | None:
         providers_file_raw = os.environ.get(self._PROVIDERS_FILE_ENV_KEY)
         if not providers_file_raw:
-            return
+            return None
 
         providers_path = Path(providers_file_raw).expanduser().resolve()
         if not providers_path.is_file():
             raise RuntimeError(
                 f"{self._PROVIDERS_FILE_ENV_KEY}={providers_path} is not a readable file"
             )
+        return providers_path
+
+    @staticmethod
+    def _mux_config_root(env: dict[str, str]) -> str:
+        return (env.get("MUX_CONFIG_ROOT") or "/root/.mux").strip() or "/root/.mux"
+
+    async def _stage_providers_config(
+        self, environment: BaseEnvironment, env: dict[str, str]
+    ) -> None:
+        """Upload host providers.jsonc into the sandbox when explicitly requested."""
+        providers_path = self._providers_path
+        if providers_path is None:
+            return
 
-        mux_config_root = (
-            env.get("MUX_CONFIG_ROOT") or "/root/.mux"
-        ).strip() or "/root/.mux"
-        target_path = f"{mux_config_root.rstrip('/')}/providers.jsonc"
+        target_path = f"{self._mux_config_root(env).rstrip('/')}/providers.jsonc"
 
         await environment.upload_file(
             source_path=providers_path,
             target_path=target_path,
         )
 
+    async def _build_payloads(self) -> None:
+        """Build (or reuse) the cached app archive and optional deps snapshot."""
+        # The archive lives in a content-addressed host cache so concurrent
+        # agents reuse one build instead of each gzipping the tree again.
+        options = self._payload_options
+        if self._archive is None or not self._archive.path.is_file():
+            self._archive = await asyncio.to_thread(
+                get_cached_app_archive,
+                self._repo_root,
+                self._payload_manifest,
+                self._payload_cache_dir,
+                **options,
+            )
+
+        # Optionally ship a host-built production node_modules snapshot so the
+        # install template extracts it instead of running bun install.
+        if deps_platform := self._deps_snapshot_platform:
+            if self._deps_archive is None or not self._deps_archive.path.is_file():
+                self._deps_archive = await asyncio.to_thread(
+                    get_cached_deps_snapshot,
+                    self._repo_root,
+                    self._payload_cache_dir,
+                    deps_platform,
+                    options["codec"],
+                    options["level"],
+                    options["threads"],
+                )
+
+    @property
+    def _install_digest(self) -> str | None:
+        """Digest of everything the install template would put in the sandbox."""
+        if self._archive is None:
+            return None
+        hasher = hashlib.sha256()
+        for part in (
+            self._archive.digest,
+            self._deps_archive.digest if self._deps_archive else "",
+            *(
+                hashlib.sha256(path.read_bytes()).hexdigest()
+                for path in (self._runner_path, *self._runner_helper_paths.values())
+            ),
+            hashlib.sha256(self._install_agent_template_path.read_bytes()).hexdigest(),
+            json.dumps(super()._template_variables, sort_keys=True),
+        ):
+            hasher.update(part.encode())
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    @property
+    def _template_variables(self) -> dict[str, str]:
+        variables = dict(super()._template_variables)
+        if install_digest := self._install_digest:
+            variables["install_digest"] = install_digest
+        return variables
+
     async def setup(self, environment: BaseEnvironment) -> None:
         """Override setup to stage payload first, then run install template."""
-        env = self._env
+        timer = SetupTimer()
+        try:
+            await self._setup(environment, timer)
+        finally:
+            # Written even when setup fails, so slow or broken phases show up.
+            timer.write(self.logs_dir, install_digest=self._install_digest)
 
-        # Create /installed-agent directory (normally done by super().setup(),
-        # but we need it to exist before uploading files)
-        await environment.exec(command="mkdir -p /installed-agent")
+    async def _setup(self, environment: BaseEnvironment, timer: SetupTimer) -> None:
+        env = self._env
 
-        # Build and stage the mux app archive BEFORE super().setup() runs the
-        # install template, which extracts the archive and runs chmod on runner
-        if not self._archive_bytes:
-            self._archive_bytes = build_app_archive(
-                self._repo_root, self._INCLUDE_PATHS
+        # Build the payload BEFORE super().setup() runs the install template,
+        # which extracts the archive and runs chmod on runner.
+        with timer.phase("build_payloads"):
+            await self._build_payloads()
+        install_digest = self._install_digest
+        self._write_payload_record(install_digest)
+
+        # Create /installed-agent and the config root (normally done by
+        # super().setup() and the install template, but the uploads below need
+        # them first) and read the install marker in the same round trip. A
+        # warm container that already holds this exact payload needs no uploads
+        # and no install.
+        mux_config_root = self._mux_config_root(env)
+        marker_path = f"{env['MUX_APP_ROOT'].rstrip('/')}/{self._INSTALL_MARKER_NAME}"
+        with timer.phase("probe"):
+            probe = await environment.exec(
+                command=(
+                    f"mkdir -p /installed-agent {shlex.quote(mux_config_root)} && "
+                    f"cat {shlex.quote(marker_path)} 2>/dev/null || true"
+                )
             )
+        if install_digest and (probe.stdout or "").strip() == install_digest:
+            with timer.phase("providers", warm=True):
+                await self._stage_providers_config(environment, env)
+            self._last_environment = environment
+            return
 
-        # Write archive to logs_dir and upload
-        archive_path = self.logs_dir / self._ARCHIVE_NAME
-        archive_path.write_bytes(self._archive_bytes)
-        await environment.upload_file(
-            source_path=archive_path,
-            target_path=f"/installed-agent/{self._ARCHIVE_NAME}",
-        )
-
-        # Upload runner script
-        await environment.upload_file(
-            source_path=self._runner_path,
-            target_path=f"/installed-agent/{self._RUNNER_NAME}",
-        )
+        assert self._archive is not None
+        # Archive, deps snapshot and runner go up as one staged directory; the
+        # providers file targets a different directory, so it uploads alongside.
+        staged_files = {
+            self._ARCHIVE_NAME: self._archive.path,
+            self._RUNNER_NAME: self._runner_path,
+            **self._runner_helper_paths,
+        }
+        if self._deps_archive is not None:
+            staged_files[self._DEPS_ARCHIVE_NAME] = self._deps_archive.path
+        with timer.phase("stage"):
+            staging_dir = await asyncio.to_thread(
+                stage_payload_bundle, staged_files, self._payload_cache_dir
+            )
+        upload_bytes = sum(path.stat().st_size for path in staged_files.values())
+        if providers_path := self._providers_path:
+            upload_bytes += providers_path.stat().st_size
+        with timer.phase("upload", bytes=upload_bytes):
+            await asyncio.gather(
+                environment.upload_dir(
+                    source_dir=staging_dir, target_dir="/installed-agent"
+                ),
+                # Optionally seed the sandbox with providers.jsonc from the host
+                # machine. This is required for OAuth-only configs where env var
+                # API keys are absent.
+                self._stage_providers_config(environment, env),
+            )
 
         # Now run parent setup which executes mux_setup.sh.j2 template
-        # (extracts archive, installs bun/deps, chmod +x runner)
-        await super().setup(environment)
-
-        # Optionally seed the sandbox with providers.jsonc from the host machine.
-        # This is required for OAuth-only configs where env var API keys are absent.
-        await self._stage_providers_config(environment, env)
+        # (extracts archive, installs bun/deps, chmod +x runner, writes marker)
+        try:
+            with timer.phase("install"):
+                await super().setup(environment)
+        finally:
+            await self._collect_sandbox_timings(environment, timer)
 
         # Store environment reference for token extraction later
         self._last_environment = environment
 
+    def _write_payload_record(self, install_digest: str | None) -> None:
+        """Record which payload this trial installed.
+
+        The archives themselves stay in the shared host cache; trial dirs (and
+        the CI artifacts built from them) only carry their digests.
+        """
+        record: dict[str, Any] = {"install_digest": install_digest}
+        for name, archive in (
+            (self._ARCHIVE_NAME, self._archive),
+            (self._DEPS_ARCHIVE_NAME, self._deps_archive),
+        ):
+            if archive is not None:
+                record[name] = {"digest": archive.digest, "size": archive.size}
+        (self.logs_dir / self._PAYLOAD_RECORD_NAME).write_text(
+            json.dumps(record, indent=2) + "\n"
+        )
+
+    async def _collect_sandbox_timings(
+        self, environment: BaseEnvironment, timer: SetupTimer
+    ) -> None:
+        """Merge the install template's phase timings into the host timer."""
+        timings_file = self.logs_dir / "setup-timings.jsonl"
+        timings_file.unlink(missing_ok=True)
+        try:
+            await environment.download_file(self._SETUP_TIMINGS_PATH, timings_file)
+            timer.add_sandbox_phases(timings_file.read_text())
+        except Exception:
+            pass  # Timings are best-effort; the template may have failed early
+
+    @property
+    def _warmup_enabled(self) -> bool:
+        enabled = os.environ.get(self._WARMUP_ENV_KEY, "").strip().lower()
+        return enabled in ("1", "true", "yes")
+
     def create_run_agent_commands(self, instruction: str) -> list[ExecInput]:
         escaped = shlex.quote(instruction)
         command = f"bash /installed-agent/{self._RUNNER_NAME} {escaped}"
-        return [
+        env = self._env
+        commands = [
             ExecInput(
                 command=command,
-                env=self._env,
+                env=env,
             )
         ]
+        if self._warmup_enabled:
+            # Same runner and flags, stopped after the CLI has loaded and run
+            # one session against the stub provider (see run()).
+            warmup = ExecInput(
+                command=command,
+                env={**env, "MUX_WARMUP_ONLY": "1"},
+                timeout_sec=self._WARMUP_TIMEOUT_SEC,
+            )
+            commands.insert(0, warmup)
+        return commands
+
+    async def _run_warmup(
+        self, environment: BaseEnvironment, exec_input: ExecInput
+    ) -> None:
+        """Run the warmup command and record its timing in command-0/.
+
+        The warmup populates bun's transpile cache and the OS page cache so the
+        timed run measures agent work. A failed warmup is recorded, not fatal.
+        """
+        command_dir = self.logs_dir / "command-0"
+        command_dir.mkdir(parents=True, exist_ok=True)
+        record: dict[str, Any] = {}
+        started = time.monotonic()
+        try:
+            result = await environment.exec(
+                command=exec_input.command,
+                cwd=exec_input.cwd,
+                env=exec_input.env,
+                timeout_sec=exec_input.timeout_sec,
+            )
+            record["return_code"] = result.return_code
+            if result.stdout:
+                (command_dir / "warmup-stdout.txt").write_text(result.stdout)
+            if result.stderr:
+                (command_dir / "warmup-stderr.txt").write_text(result.stderr)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            record["error"] = f"{type(exc).__name__}: {exc}"
+        record["wall_clock_sec"] = round(time.monotonic() - started, 3)
+
+        probe_file = command_dir / "warmup-probe.json"
+        probe_file.unlink(missing_ok=True)
+        with contextlib.suppress(Exception):
+            await environment.download_file(
+                f"{self._AGENT_LOG_DIR}/warmup-probe.json", probe_file
+            )
+            probe = json.loads(probe_file.read_text())
+            probe.pop("runs", None)
+            record["probe"] = probe
+        (command_dir / self._WARMUP_FILE).write_text(json.dumps(record, indent=2))
+
+    @property
+    def _live_events_interval(self) -> float | None:
+        """Seconds between live event pulls, or None when live mode is off.
+
+        A pull only sees what mux_log_capture has flushed, so live mode sets
+        its flush interval (MUX_LOG_FLUSH_SEC) to the same value; events reach
+        the host at most about two intervals after the agent prints them.
+        """
+        raw = os.environ.get(self._LIVE_EVENTS_ENV_KEY, "").strip()
+        if not raw:
+            return None
+        try:
+            interval = float(raw)
+        except ValueError as exc:
+            raise ValueError(
+                f"{self._LIVE_EVENTS_ENV_KEY} must be a number of seconds"
+            ) from exc
+        return interval if interval > 0 else None
+
+    def _live_event_stream(
+        self, environment: BaseEnvironment
+    ) -> LiveEventStream | None:
+        interval = self._live_events_interval
+        if interval is None:
+            return None
+        local_path = self.logs_dir / LIVE_EVENTS_FILE
+        local_path.unlink(missing_ok=True)
+        return LiveEventStream(
+            environment, self._AGENT_STDOUT_PATH, local_path, interval
+        )
+
+    async def _download_agent_logs(
+        self, environment: BaseEnvironment, command_dir: Path, env: dict[str, str]
+    ) -> None:
+        """Fetch the agent logs mux-run.sh captured, straight to disk.
+
+        Environments that bind-mount /logs/agent onto logs_dir already have
+        them; anything already present locally is left alone.
+        """
+        suffix = LOG_CODEC_SUFFIXES[env.get("MUX_LOG_CODEC", "gzip")]
+
+        async def download(name: str) -> None:
+            target = command_dir / name
+            if target.exists():
+                return
+            try:
+                await environment.download_file(f"{self._AGENT_LOG_DIR}/{name}", target)
+            except Exception:
+                pass  # The log may not exist if the agent never started
+
+        await asyncio.gather(
+            download(f"stdout.txt{suffix}"),
+            download(f"stderr.txt{suffix}"),
+            download(RESOURCE_SAMPLES_FILE),
+            download(RESOURCE_SUMMARY_FILE),
+            download(STARTUP_PROBE_FILE),
+            download(PROVIDER_CASSETTE_FILE),
+            download(PROVIDER_PROXY_STATS_FILE),
+            download(MOCK_PROVIDER_STATS_FILE),
+        )
 
     async def run(
         self,
@@ -251,24 +737,69 @@ class MuxAgent(BaseInstalledAgent):
         context: AgentContext,
     ) -> None:
         """Run agent commands, download token file, then populate context."""
+        commands = self.create_run_agent_commands(instruction)
+        proxy_mode = (commands[-1].env or {}).get("MUX_PROVIDER_PROXY")
+        if proxy_mode == "replay":
+            cassette = self._provider_cassette(instruction)
+            if not cassette.exists():
+                raise FileNotFoundError(
+                    f"No provider cassette for this task at {cassette}; "
+                    "record one with MUX_PROVIDER_PROXY=record first"
+                )
+            await environment.upload_file(
+                source_path=cassette,
+                target_path=self._PROVIDER_CASSETTE_PATH,
+            )
+        if self._warmup_enabled:
+            warmup, *commands = commands
+            await self._run_warmup(environment, warmup)
+
         # Execute commands (from base class logic, but without calling populate_context)
-        for i, exec_input in enumerate(self.create_run_agent_commands(instruction)):
+        for i, exec_input in enumerate(commands):
             command_dir = self.logs_dir / f"command-{i}"
             command_dir.mkdir(parents=True, exist_ok=True)
             (command_dir / "command.txt").write_text(exec_input.command)
 
-            result = await environment.exec(
-                command=exec_input.command,
-                cwd=exec_input.cwd,
-                env=exec_input.env,
-                timeout_sec=exec_input.timeout_sec,
+            # Only the first command runs mux-run.sh and writes the event log.
+            live_events = self._live_event_stream(environment) if i == 0 else None
+            follower = (
+                asyncio.create_task(live_events.follow()) if live_events else None
             )
+            try:
+                result = await environment.exec(
+                    command=exec_input.command,
+                    cwd=exec_input.cwd,
+                    env=exec_input.env,
+                    timeout_sec=exec_input.timeout_sec,
+                )
+            finally:
+                if follower is not None:
+                    follower.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await follower
+            if live_events is not None:
+                with contextlib.suppress(Exception):
+                    await live_events.drain()
 
             (command_dir / "return-code.txt").write_text(str(result.return_code))
+            # mux-run.sh only prints its own status lines; the agent's output is
+            # in the capped, compressed logs it captured under /logs/agent.
             if result.stdout:
-                (command_dir / "stdout.txt").write_text(result.stdout)
+                (command_dir / "exec-stdout.txt").write_text(result.stdout)
             if result.stderr:
-                (command_dir / "stderr.txt").write_text(result.stderr)
+                (command_dir / "exec-stderr.txt").write_text(result.stderr)
+            if i == 0:
+                await self._download_agent_logs(
+                    environment, command_dir, exec_input.env or {}
+                )
+
+        recorded = self.logs_dir / "command-0" / PROVIDER_CASSETTE_FILE
+        if proxy_mode == "record" and recorded.exists():
+            cassette = self._provider_cassette(instruction)
+            cassette.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cassette.with_name(f".{cassette.name}.tmp")
+            tmp_path.write_bytes(recorded.read_bytes())
+            os.replace(tmp_path, cassette)
 
         # Download token file from container BEFORE populating context
         # Clear any stale token file first to avoid reading outdated data if download fails
@@ -281,9 +812,27 @@ class MuxAgent(BaseInstalledAgent):
 
         self.populate_context_post_run(context)
 
+    def _resource_summary(self) -> dict[str, Any] | None:
+        """Peak memory/CPU and exit classification written by mux-run.sh.
+
+        When the exec was cancelled before mux-run.sh could summarize, fall
+        back to the sampled series (exit code and OOM kills then unknown).
+        """
+        command_dir = self.logs_dir / "command-0"
+        try:
+            return json.loads((command_dir / RESOURCE_SUMMARY_FILE).read_text())
+        except (OSError, json.JSONDecodeError):
+            pass
+        try:
+            samples = (command_dir / RESOURCE_SAMPLES_FILE).read_text().splitlines()
+        except OSError:
+            return None
+        return summarize_samples(samples)
+
     def populate_context_post_run(self, context: AgentContext) -> None:
-        """Extract token usage and cost from the token file written by mux-run.sh."""
+        """Extract token usage, cost, perf and resource summaries from mux-run.sh."""
         token_file = self.logs_dir / "mux-tokens.json"
+        perf = None
         if token_file.exists():
             try:
                 data = json.loads(token_file.read_text())
@@ -292,5 +841,47 @@ class MuxAgent(BaseInstalledAgent):
                 # cost_usd is computed by mux CLI from model pricing
                 if data.get("cost_usd") is not None:
                     context.cost_usd = data["cost_usd"]
+                # Performance summary (TTFT, turns, model-wait vs tool time)
+                # accumulated by mux_token_tap.py from the same event stream
+                perf = data.get("perf")
             except Exception:
                 pass  # Token/cost extraction is best-effort
+
+        self._add_metadata(context, "perf", perf)
+        self._add_metadata(context, "resources", self._resource_summary())
+
+        command_dir = self.logs_dir / "command-0"
+        self._merge_metadata(context, "warmup", command_dir / self._WARMUP_FILE)
+        self._merge_metadata(
+            context, "provider_proxy", command_dir / PROVIDER_PROXY_STATS_FILE
+        )
+        self._merge_metadata(
+            context, "mock_provider", command_dir / MOCK_PROVIDER_STATS_FILE
+        )
+        # Cold/warm CLI start-up numbers from the optional probe (runs omitted)
+        self._merge_metadata(
+            context, "startup", command_dir / STARTUP_PROBE_FILE, omit=("runs",)
+        )
+
+    @staticmethod
+    def _merge_metadata(
+        context: AgentContext, key: str, path: Path, omit: Sequence[str] = ()
+    ) -> None:
+        """Add the JSON object at ``path`` to ``context.metadata[key]``.
+
+        These summaries are best-effort: a missing or unreadable file is
+        skipped, but any other error is left to surface.
+        """
+        try:
+            value = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return
+        if isinstance(value, dict):
+            value = {name: item for name, item in value.items() if name not in omit}
+        MuxAgent._add_metadata(context, key, value)
+
+    @staticmethod
+    def _add_metadata(context: AgentContext, key: str, value: Any) -> None:
+        """Set ``context.metadata[key]`` unless ``value`` is empty."""
+        if value:
+            context.metadata = {**(context.metadata or {}), key: value}
@@ -0,0 +1,270 @@
+"""
+Micro-benchmark MuxAgent's host-side overhead against local fake sandboxes.
+
+Drives many simulated trials concurrently through MuxAgent.setup() and run()
+(which calls populate_context_post_run()) on LocalSandboxEnvironment, with
+stand-ins for the install template and the agent session, so only the host's
+work (payload digests and staging, uploads, exec round trips, log downloads,
+context extraction) is measured. Reports:
+  setup/run   = median and p95 wall seconds per trial
+  cpu         = host CPU seconds per trial (this process + its subprocesses)
+  memory      = peak resident memory of this process, and its growth while
+                the trials ran divided by the number of trials
+  loop lag    = how late a 10 ms event-loop ticker fired (max, p99) and the
+                total time the loop was blocked for more than 50 ms
+
+Usage:
+    # 48 concurrent trials with zero injected latency
+    python -m benchmarks.terminal_bench.mux_agent_bench --trials 48
+
+    # Approximate a remote sandbox API: 50 ms per exec, 200 ms + 100 MB/s per transfer
+    python -m benchmarks.terminal_bench.mux_agent_bench --trials 96 --concurrency 48 \\
+        --exec-latency 0.05 --transfer-latency 0.2 --transfer-mbps 100
+
+MUX_* settings (MUX_PAYLOAD_MODE, MUX_LOG_CODEC, MUX_LIVE_EVENTS_SEC, ...) are
+read from the environment as in a real run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from harbor.models.agent.context import AgentContext
+
+from .mux_agent import MuxAgent
+from .mux_local_env import LocalSandboxEnvironment
+from .mux_log_capture import LOG_CODEC_SUFFIXES
+
+INSTRUCTION = "Create hello.txt containing 'Hello, world!'."
+# Ticker period and the lag past which the loop counts as blocked.
+_LAG_INTERVAL_SEC = 0.01
+_BLOCKED_THRESHOLD_SEC = 0.05
+# How the fake session compresses its logs for each MUX_LOG_CODEC suffix.
+_LOG_COMPRESSORS = {".gz": "gzip -1 -k", ".zst": "zstd -q -1 -k", "": None}
+
+
+class LoopLagMonitor:
+    """Records how late a periodic ticker fires on the running event loop."""
+
+    def __init__(self, interval: float = _LAG_INTERVAL_SEC) -> None:
+        self._interval = interval
+        self.lags: list[float] = []
+
+    async def run(self) -> None:
+        while True:
+            expected = time.monotonic() + self._interval
+            await asyncio.sleep(self._interval)
+            self.lags.append(max(time.monotonic() - expected, 0.0))
+
+    def summary(self) -> dict[str, float | None]:
+        if not self.lags:
+            return {"max_lag_ms": None, "p99_lag_ms": None, "blocked_sec": 0.0}
+        ordered = sorted(self.lags)
+        return {
+            "max_lag_ms": round(ordered[-1] * 1000, 1),
+            "p99_lag_ms": round(ordered[int(len(ordered) * 0.99)] * 1000, 1),
+            "blocked_sec": round(
+                sum(lag for lag in ordered if lag > _BLOCKED_THRESHOLD_SEC), 3
+            ),
+        }
+
+
+def _fake_install_command(install_sec: float) -> str:
+    """Stands in for mux_setup.sh.j2: no extraction, just its timings file."""
+    return (
+        f"sleep {install_sec} && "
+        f'printf \'{{"phase":"install","start":0,"end":{install_sec}}}\\n\' '
+        f"> {MuxAgent._SETUP_TIMINGS_PATH}"
+    )
+
+
+def _fake_agent_command(agent_sec: float, n_events: int, log_codec: str) -> str:
+    """Stands in for mux-run.sh: writes the logs and token file it would.
+
+    Logs get the suffix ``log_codec`` gives them in a real run, so the host
+    downloads and reads the same files.
+    """
+    log_dir = MuxAgent._AGENT_LOG_DIR
+    event = '{"type":"stream-delta","delta":"' + "x" * 64 + '"}'
+    tokens = json.dumps({"input": 1000, "output": 100, "cost_usd": 0.01})
+    compress = _LOG_COMPRESSORS[LOG_CODEC_SUFFIXES[log_codec]]
+    compress_logs = (
+        f"{compress} {log_dir}/stdout.txt {log_dir}/stderr.txt && " if compress else ""
+    )
+    return (
+        f"mkdir -p {log_dir} && sleep {agent_sec} && "
+        f"yes '{event}' | head -n {n_events} > {log_dir}/stdout.txt && "
+        f": > {log_dir}/stderr.txt && {compress_logs}"
+        f"printf '%s' '{tokens}' > {MuxAgent._TOKEN_FILE_PATH}"
+    )
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _cpu_seconds() -> float:
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+async def run_trial(
+    index: int, work_dir: Path, args: argparse.Namespace
+) -> dict[str, Any]:
+    """One simulated trial: setup, run and context population."""
+    trial_dir = work_dir / f"trial-{index:04d}"
+    logs_dir = trial_dir / "agent"
+    logs_dir.mkdir(parents=True)
+    agent = MuxAgent(logs_dir=logs_dir)
+    # The codec after MuxAgent's normalization (live events force "none").
+    log_codec = agent._env["MUX_LOG_CODEC"]
+    environment = LocalSandboxEnvironment(
+        trial_dir / "sandbox",
+        exec_latency_sec=args.exec_latency,
+        transfer_latency_sec=args.transfer_latency,
+        transfer_bytes_per_sec=args.transfer_mbps * 1e6 if args.transfer_mbps else None,
+        command_overrides={
+            "/installed-agent/install.sh": _fake_install_command(args.install_sec),
+            f"/installed-agent/{MuxAgent._RUNNER_NAME}": _fake_agent_command(
+                args.agent_sec, args.events, log_codec
+            ),
+        },
+    )
+    await environment.start()
+    context = AgentContext()
+    try:
+        started = time.monotonic()
+        await agent.setup(environment)
+        set_up = time.monotonic()
+        await agent.run(INSTRUCTION, environment, context)
+        finished = time.monotonic()
+    finally:
+        await environment.stop(delete=not args.keep)
+    return {
+        "setup_sec": set_up - started,
+        "run_sec": finished - set_up,
+        "populated": context.n_input_tokens == 1000,
+        **environment.stats,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace, work_dir: Path) -> dict[str, Any]:
+    if not args.cold:
+        # Build the shared payload cache once so trials measure steady state.
+        primer_logs = work_dir / "primer"
+        primer_logs.mkdir()
+        await MuxAgent(logs_dir=primer_logs)._build_payloads()
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(index: int) -> dict[str, Any]:
+        async with semaphore:
+            return await run_trial(index, work_dir, args)
+
+    monitor = LoopLagMonitor()
+    ticker = asyncio.create_task(monitor.run())
+    cpu_before = _cpu_seconds()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.monotonic()
+    try:
+        trials = await asyncio.gather(*(bounded(i) for i in range(args.trials)))
+    finally:
+        ticker.cancel()
+    wall_clock = time.monotonic() - started
+    cpu = _cpu_seconds() - cpu_before
+    # ru_maxrss is KiB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    setup = [trial["setup_sec"] for trial in trials]
+    run = [trial["run_sec"] for trial in trials]
+    return {
+        "n_trials": len(trials),
+        "concurrency": args.concurrency,
+        "wall_clock_sec": round(wall_clock, 2),
+        "median_setup_sec": round(statistics.median(setup), 3),
+        "p95_setup_sec": round(_percentile(setup, 0.95), 3),
+        "median_run_sec": round(statistics.median(run), 3),
+        "p95_run_sec": round(_percentile(run, 0.95), 3),
+        "cpu_sec_per_trial": round(cpu / len(trials), 3),
+        "peak_rss_mib": round(peak_rss / 1024, 1),
+        "rss_growth_mib_per_trial": round(
+            (peak_rss - rss_before) / 1024 / len(trials), 2
+        ),
+        "n_exec_per_trial": statistics.mean(trial["n_exec"] for trial in trials),
+        "n_unpopulated": sum(1 for trial in trials if not trial["populated"]),
+        **monitor.summary(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark MuxAgent host overhead on local fake sandboxes"
+    )
+    parser.add_argument("--trials", type=int, default=16)
+    parser.add_argument(
+        "--concurrency", type=int, help="Trials in flight at once (default: --trials)"
+    )
+    parser.add_argument(
+        "--exec-latency", type=float, default=0.0, help="Seconds added to each exec"
+    )
+    parser.add_argument(
+        "--transfer-latency",
+        type=float,
+        default=0.0,
+        help="Seconds added to each upload/download",
+    )
+    parser.add_argument(
+        "--transfer-mbps", type=float, help="Simulated transfer bandwidth in MB/s"
+    )
+    parser.add_argument(
+        "--install-sec", type=float, default=0.0, help="Simulated install time"
+    )
+    parser.add_argument(
+        "--agent-sec", type=float, default=0.5, help="Simulated agent session time"
+    )
+    parser.add_argument(
+        "--events", type=int, default=2000, help="JSONL events in the simulated log"
+    )
+    parser.add_argument(
+        "--cold", action="store_true", help="Do not prebuild the payload cache"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep trial directories for inspection"
+    )
+    parser.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+    args.concurrency = args.concurrency or args.trials
+
+    work_dir = Path(tempfile.mkdtemp(prefix="mux-agent-bench-"))
+    try:
+        result = asyncio.run(run_benchmark(args, work_dir))
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    if args.keep:
+        result["work_dir"] = str(work_dir)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:<26} {value}")
+    return 1 if result["n_unpopulated"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,50 @@
 from __future__ import annotations
 
+import asyncio
+import gzip
+import inspect
 import io
+import json
+import os
+import re
+import subprocess
+import sys
 import tarfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
+from . import mux_payload, mux_resources
+from .harness_report import JobThroughput, max_useful_concurrency
 from .mux_agent import MuxAgent
-from .mux_payload import build_app_archive
+from .mux_live import LiveEventStream
+from .mux_local_env import LocalSandboxEnvironment
+from .mux_log_capture import BoundedLogWriter
+from .mux_mock_provider import MockProvider
+from .mux_payload import (
+    DEPS_PLATFORM_STAMP,
+    PayloadManifest,
+    _bundle_dependencies,
+    build_app_archive,
+    build_deps_snapshot,
+    get_cached_app_archive,
+    host_platform,
+    resolve_payload_files,
+    stage_payload_bundle,
+    write_app_archive,
+)
+from .mux_provider_proxy import ProviderProxy, _upstream_base
+from .mux_resources import runtime_tuning, summarize_samples
+from .mux_startup_probe import StubOllamaServer, probe_once, summarize_probe
+from .mux_timings import SetupTimer
+from .mux_token_tap import PerfAccumulator, UsageAccumulator
+from .tbench_utils import read_agent_log
 
 
 @pytest.fixture(autouse=True)
@@ -42,6 +79,38 @@ def test_timeout_must_be_numeric(monkeypatch: pytest.MonkeyPatch) -> None:
         _ = agent._env
 
 
+def test_live_events_default_to_plain_logs_and_reject_a_codec(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("MUX_AGENT_REPO_ROOT", str(_repo_root()))
+    monkeypatch.setenv("MUX_LIVE_EVENTS_SEC", "2")
+    agent = MuxAgent(logs_dir=tmp_path)
+
+    env = agent._env
+
+    assert env["MUX_LOG_CODEC"] == "none"
+    assert env["MUX_LOG_FLUSH_SEC"] == "2.0"
+    monkeypatch.setenv("MUX_LOG_CODEC", "gzip")
+    with pytest.raises(ValueError, match="MUX_LOG_CODEC=none"):
+        _ = agent._env
+
+
+def test_warmup_command_precedes_the_run(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("MUX_AGENT_REPO_ROOT", str(_repo_root()))
+    agent = MuxAgent(logs_dir=tmp_path)
+    assert len(agent.create_run_agent_commands("do it")) == 1
+
+    monkeypatch.setenv("MUX_WARMUP", "1")
+    warmup, run = agent.create_run_agent_commands("do it")
+
+    assert warmup.command == run.command
+    assert warmup.env["MUX_WARMUP_ONLY"] == "1"
+    assert "MUX_WARMUP_ONLY" not in run.env
+    assert warmup.timeout_sec == agent._WARMUP_TIMEOUT_SEC
+
+
 def test_app_archive_includes_postinstall_script() -> None:
     assert "scripts/postinstall.sh" in MuxAgent._INCLUDE_PATHS
 
@@ -52,3 +121,760 @@ def test_app_archive_includes_postinstall_script() -> None:
     archive_bytes = build_app_archive(repo_root, ["scripts/postinstall.sh"])
     with tarfile.open(fileobj=io.BytesIO(archive_bytes), mode="r:gz") as archive:
         assert "scripts/postinstall.sh" in archive.getnames()
+
+
+def test_cached_app_archive_reuses_build_and_evicts_on_change(tmp_path: Path) -> None:
+    repo_root = tmp_path / "repo"
+    (repo_root / "src").mkdir(parents=True)
+    (repo_root / "src" / "index.ts").write_text("export {};\n")
+    (repo_root / "package.json").write_text("{}\n")
+    cache_dir = tmp_path / "cache"
+    include_paths = ("package.json", "src")
+
+    first = get_cached_app_archive(repo_root, include_paths, cache_dir)
+    second = get_cached_app_archive(repo_root, include_paths, cache_dir)
+    assert second == first
+    assert second.path.stat().st_mtime_ns == first.path.stat().st_mtime_ns
+    assert first.path.stat().st_mode & 0o777 == 0o644
+
+    (repo_root / "src" / "index.ts").write_text("export const changed = 1;\n")
+    third = get_cached_app_archive(repo_root, include_paths, cache_dir)
+    assert third.digest != first.digest
+    # Kept while a setup that read the previous state may still upload it.
+    assert first.path.exists()
+    with tarfile.open(third.path, mode="r:gz") as archive:
+        member = archive.extractfile("src/index.ts")
+        assert member is not None
+        assert b"changed" in member.read()
+
+    long_ago = time.time() - 2 * mux_payload._STALE_ENTRY_AGE_SEC
+    os.utime(first.path, (long_ago, long_ago))
+    (repo_root / "src" / "index.ts").write_text("export const changed = 2;\n")
+    fourth = get_cached_app_archive(repo_root, include_paths, cache_dir)
+    assert not first.path.exists()
+    assert third.path.exists() and fourth.path.exists()
+
+
+def test_stage_payload_bundle_is_shared_and_replaced_on_change(tmp_path: Path) -> None:
+    archive = tmp_path / "app.tar.gz"
+    archive.write_bytes(b"archive")
+    runner = tmp_path / "run.sh"
+    runner.write_text("#!/bin/sh\n")
+    cache_dir = tmp_path / "cache"
+    files = {"mux-app.tar.gz": archive, "mux-run.sh": runner}
+
+    first = stage_payload_bundle(files, cache_dir)
+    assert stage_payload_bundle(files, cache_dir) == first
+    assert sorted(entry.name for entry in first.iterdir()) == sorted(files)
+    assert (first / "mux-app.tar.gz").stat().st_ino == archive.stat().st_ino
+
+    runner.write_text("#!/bin/sh\necho changed\n")
+    second = stage_payload_bundle(files, cache_dir)
+    assert second != first
+    assert first.exists()  # Another agent may still be uploading it
+    assert (second / "mux-run.sh").read_text().endswith("changed\n")
+
+    long_ago = time.time() - 2 * mux_payload._STALE_ENTRY_AGE_SEC
+    os.utime(first, (long_ago, long_ago))
+    runner.write_text("#!/bin/sh\necho again\n")
+    third = stage_payload_bundle(files, cache_dir)
+    assert not first.exists()
+    assert second.exists() and third.exists()
+
+
+def test_parallel_gzip_archive_round_trips(tmp_path: Path) -> None:
+    repo_root = tmp_path / "repo"
+    (repo_root / "dist").mkdir(parents=True)
+    # Larger than one compression block so several gzip members are produced.
+    payload = os.urandom(3 << 20)
+    (repo_root / "dist" / "blob.bin").write_bytes(payload)
+
+    archive_path = tmp_path / "payload.tar.gz"
+    with archive_path.open("wb") as handle:
+        write_app_archive(handle, repo_root, ["dist"], codec="gzip", threads=4)
+
+    with tarfile.open(archive_path, mode="r:gz") as archive:
+        member = archive.extractfile("dist/blob.bin")
+        assert member is not None
+        assert member.read() == payload
+
+
+def test_payload_manifest_excludes_and_traces_entrypoint_imports(
+    tmp_path: Path,
+) -> None:
+    repo_root = tmp_path / "repo"
+    cli_dir = repo_root / "src" / "cli"
+    common_dir = repo_root / "src" / "common"
+    data_dir = repo_root / "src" / "data"
+    for directory in (cli_dir, common_dir, data_dir):
+        directory.mkdir(parents=True)
+    (repo_root / "tsconfig.json").write_text(
+        '{"compilerOptions": {"paths": {"@/*": ["./src/*"]}}}'
+    )
+    (cli_dir / "run.ts").write_text(
+        'import { a } from "../common/a";\nimport b from "@/common/b.js";\n'
+    )
+    (common_dir / "a.ts").write_text('export * from "./models.json";\n')
+    (common_dir / "models.json").write_text("{}")
+    (common_dir / "b.ts").write_text("export default 1;\n")
+    (common_dir / "b.test.ts").write_text('import b from "./b";\n')
+    (common_dir / "unused.ts").write_text("export {};\n")
+    (data_dir / "prompt.md").write_text("# prompt\n")
+
+    manifest = PayloadManifest(
+        include=("tsconfig.json", "src", "src/data"),
+        exclude=("**/*.test.ts",),
+        entrypoints=("src/cli/run.ts",),
+    )
+    names = [arcname for arcname, _ in resolve_payload_files(repo_root, manifest)]
+
+    assert len(names) == len(set(names))
+    assert set(names) == {
+        "tsconfig.json",
+        "src/cli/run.ts",
+        "src/common/a.ts",
+        "src/common/b.ts",
+        "src/common/models.json",
+        "src/data/prompt.md",
+    }
+
+
+def test_bundle_dependencies_pin_installed_production_externals(
+    tmp_path: Path,
+) -> None:
+    (tmp_path / "package.json").write_text(
+        '{"dependencies": {"@duckdb/node-api": "^1.4.4", "typescript": "^5.0.0"}}'
+    )
+    duckdb_dir = tmp_path / "node_modules" / "@duckdb" / "node-api"
+    duckdb_dir.mkdir(parents=True)
+    (duckdb_dir / "package.json").write_text('{"version": "1.4.4-r.1"}')
+
+    dependencies = _bundle_dependencies(
+        tmp_path, ["@duckdb/node-api", "typescript", "electron"]
+    )
+
+    # Installed packages are pinned; dev-only externals are not installed.
+    assert dependencies == {"@duckdb/node-api": "1.4.4-r.1", "typescript": "^5.0.0"}
+
+
+def test_bundle_externals_cover_the_makefile_esbuild_flags() -> None:
+    makefile = (_repo_root() / "Makefile").read_text()
+    required: set[str] = set()
+    for variable in ("ESBUILD_CLI_FLAGS", "ESBUILD_SERVER_FLAGS"):
+        match = re.search(rf"^{variable} :=(.*)$", makefile, re.MULTILINE)
+        assert match, variable
+        flags = match.group(1)
+        required.update(re.findall(r"--external:(\S+)", flags))
+        required.update(re.findall(r"--alias:([^=\s]+)=", flags))
+
+    assert required
+    assert required <= set(mux_payload.DEFAULT_BUNDLE_EXTERNALS)
+
+
+def _tar_gz(files: dict[str, str]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, text in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(text.encode())
+            archive.addfile(info, io.BytesIO(text.encode()))
+    return buffer.getvalue()
+
+
+def _run_setup_template(
+    sandbox: Path, install_digest: str = "", deps: bytes | None = None
+) -> tuple[str, list[str]]:
+    """Run mux_setup.sh.j2 against ``sandbox`` with a stub bun.
+
+    /installed-agent and the app, config and bun roots are redirected into
+    ``sandbox``. Returns the script's stdout and the bun invocations.
+    """
+    jinja2 = pytest.importorskip("jinja2")
+    template = Path(__file__).with_name("mux_setup.sh.j2").read_text()
+    installed = sandbox / "installed-agent"
+    script = (
+        jinja2.Template(template)
+        .render(version=None, install_digest=install_digest)
+        .replace("/installed-agent", str(installed))
+    )
+    installed.mkdir(parents=True, exist_ok=True)
+    (installed / "mux-run.sh").write_text("#!/bin/sh\n")
+    (installed / "mux-app.tar.gz").write_bytes(_tar_gz({"package.json": "{}"}))
+    if deps is not None:
+        (installed / "mux-deps.tar.gz").write_bytes(deps)
+    bun = sandbox / "bun" / "bin" / "bun"
+    bun.parent.mkdir(parents=True, exist_ok=True)
+    bun.write_text('#!/bin/sh\necho "$*" >> "$BUN_CALLS"\n')
+    bun.chmod(0o755)
+    calls = sandbox / "bun-calls.txt"
+    calls.write_text("")
+    result = subprocess.run(
+        ["bash", "-c", script],
+        env={
+            **os.environ,
+            "MUX_APP_ROOT": str(sandbox / "app"),
+            "MUX_CONFIG_ROOT": str(sandbox / "config"),
+            "BUN_INSTALL": str(sandbox / "bun"),
+            "BUN_CALLS": str(calls),
+        },
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout, calls.read_text().splitlines()
+
+
+def test_deps_snapshot_refuses_a_foreign_platform(tmp_path: Path) -> None:
+    foreign = "win32-x64" if host_platform() != "win32-x64" else "linux-x64"
+    with pytest.raises(RuntimeError, match="native addons"):
+        build_deps_snapshot(tmp_path, tmp_path / "out", foreign)
+
+
+def test_setup_uses_a_matching_deps_snapshot_and_reinstalls_otherwise(
+    tmp_path: Path,
+) -> None:
+    def snapshot(platform: str) -> bytes:
+        return _tar_gz(
+            {
+                f"node_modules/{DEPS_PLATFORM_STAMP}": f"{platform}\n",
+                "node_modules/left-pad/index.js": "",
+            }
+        )
+
+    _, bun_calls = _run_setup_template(tmp_path / "a", deps=snapshot(host_platform()))
+    assert bun_calls == []  # Extracted instead of installed
+    assert (tmp_path / "a" / "app" / "node_modules" / "left-pad").is_dir()
+
+    stdout, bun_calls = _run_setup_template(
+        tmp_path / "b", deps=snapshot("darwin-arm64-elsewhere")
+    )
+    assert "reinstalling" in stdout
+    assert bun_calls == ["install --production --frozen-lockfile"]
+    assert not (tmp_path / "b" / "app" / "node_modules").exists()
+
+
+def test_setup_template_skips_when_the_install_marker_matches(tmp_path: Path) -> None:
+    _, bun_calls = _run_setup_template(tmp_path, install_digest="d1")
+    assert bun_calls == ["install --production --frozen-lockfile"]
+    marker = tmp_path / "app" / ".mux-install-digest"
+    assert marker.read_text() == "d1\n"
+
+    stdout, bun_calls = _run_setup_template(tmp_path, install_digest="d1")
+    assert "already installed, skipping setup" in stdout
+    assert bun_calls == []
+
+    stdout, bun_calls = _run_setup_template(tmp_path, install_digest="d2")
+    assert "already installed" not in stdout
+    assert bun_calls == ["install --production --frozen-lockfile"]
+    assert marker.read_text() == "d2\n"
+
+
+def test_setup_reinstalls_only_when_the_install_marker_differs(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # A tiny stand-in for the checkout, so the payload needs no build output.
+    repo_root = tmp_path / "repo"
+    for relative in MuxAgent._INCLUDE_PATHS:
+        path = repo_root / relative
+        if not path.suffix:
+            path = path / "index.js"  # A directory such as src/ or dist/
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"// {relative}\n")
+    monkeypatch.setenv("MUX_AGENT_REPO_ROOT", str(repo_root))
+    monkeypatch.setenv("MUX_PAYLOAD_CACHE_DIR", str(tmp_path / "cache"))
+    # Stands in for mux_setup.sh.j2: counts installs and writes its marker.
+    install = (
+        "mkdir -p /opt/mux-app && "
+        "grep -o 'MUX_INSTALL_DIGEST=\"[0-9a-f]*' /installed-agent/install.sh "
+        "| cut -d'\"' -f2 > /opt/mux-app/.mux-install-digest && "
+        "echo installed >> /opt/installs.txt"
+    )
+    environment = LocalSandboxEnvironment(
+        tmp_path / "sandbox", command_overrides={"/installed-agent/install.sh": install}
+    )
+    (tmp_path / "agent").mkdir()
+    installs = environment.sandbox_path("/opt/installs.txt")
+    marker = environment.sandbox_path("/opt/mux-app/.mux-install-digest")
+
+    async def set_up() -> MuxAgent:
+        agent = MuxAgent(logs_dir=tmp_path / "agent")
+        await agent.setup(environment)
+        return agent
+
+    asyncio.run(environment.start())
+    agent = asyncio.run(set_up())
+    assert marker.read_text().strip() == agent._install_digest
+    assert installs.read_text().splitlines() == ["installed"]
+
+    n_uploads = environment.stats["n_uploads"]
+    asyncio.run(set_up())
+    assert installs.read_text().splitlines() == ["installed"]
+    assert environment.stats["n_uploads"] == n_uploads  # No payload re-upload
+
+    marker.write_text("stale\n")
+    asyncio.run(set_up())
+    assert installs.read_text().splitlines() == ["installed", "installed"]
+    assert marker.read_text().strip() == agent._install_digest
+
+
+def test_setup_timer_merges_sandbox_phases(tmp_path: Path) -> None:
+    timer = SetupTimer()
+    with timer.phase("upload", bytes=1024):
+        pass
+    timer.add_sandbox_phases(
+        '{"phase":"tools","start":100.5,"end":103.25}\n'
+        '{"phase":"bun_install","start":103.25,"end"\n'
+    )
+
+    data = json.loads(timer.write(tmp_path, install_digest="abc").read_text())
+    assert data["upload_bytes"] == 1024
+    assert data["install_digest"] == "abc"
+    assert [(p["phase"], p["where"]) for p in data["phases"]] == [
+        ("upload", "host"),
+        ("tools", "sandbox"),
+    ]
+    assert data["phases"][1]["seconds"] == 2.75
+
+
+def test_usage_accumulator_sums_deltas_until_run_complete() -> None:
+    def usage_delta(message_id: str, key: str, inputs: int, outputs: int) -> dict:
+        usage = {"inputTokens": inputs, "outputTokens": outputs}
+        return {"type": "usage-delta", "messageId": message_id, key: usage}
+
+    accumulator = UsageAccumulator()
+    for event in (
+        {"type": "event", "payload": usage_delta("a", "cumulativeUsage", 10, 1)},
+        {"type": "event", "payload": usage_delta("a", "cumulativeUsage", 30, 4)},
+        usage_delta("b", "usage", 5, 2),
+        {
+            "type": "session-usage-delta",
+            "byModelDelta": {"m": {"input": {"tokens": 7}, "output": {"tokens": 3}}},
+        },
+    ):
+        accumulator.feed(json.dumps(event))
+    accumulator.feed("not json\n")
+    assert accumulator.totals() == {"input": 42, "output": 9, "cost_usd": None}
+
+    run_complete = {
+        "type": "run-complete",
+        "usage": {"inputTokens": 50, "outputTokens": 10},
+        "cost_usd": 0.25,
+    }
+    accumulator.feed(json.dumps(run_complete))
+    assert accumulator.totals() == {"input": 50, "output": 10, "cost_usd": 0.25}
+
+
+def test_token_tap_checkpoints_while_stdin_is_quiet(tmp_path: Path) -> None:
+    token_file = tmp_path / "tokens.json"
+    tap = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("mux_token_tap.py"))]
+        + [str(token_file), "--interval", "1"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+    )
+    assert tap.stdin is not None
+    try:
+        usage = {"inputTokens": 12, "outputTokens": 3}
+        event = {"type": "usage-delta", "messageId": "a", "usage": usage}
+        tap.stdin.write(json.dumps(event).encode() + b"\n")
+        tap.stdin.flush()
+        # No further input: the agent is busy in a long tool call.
+        deadline = time.monotonic() + 5
+        totals: dict = {}
+        while time.monotonic() < deadline and totals.get("input") != 12:
+            time.sleep(0.05)
+            try:
+                totals = json.loads(token_file.read_text())
+            except (OSError, ValueError):
+                pass
+        assert (totals.get("input"), totals.get("output")) == (12, 3)
+    finally:
+        tap.stdin.close()
+        tap.wait(timeout=5)
+
+
+def test_live_event_stream_appends_only_complete_lines(tmp_path: Path) -> None:
+    class LocalEnvironment:
+        async def exec(self, command: str) -> SimpleNamespace:
+            result = subprocess.run(
+                ["bash", "-c", command], capture_output=True, text=True, check=True
+            )
+            return SimpleNamespace(stdout=result.stdout)
+
+    remote = tmp_path / "stdout.txt"
+    local = tmp_path / "live-events.jsonl"
+    stream = LiveEventStream(LocalEnvironment(), str(remote), local, chunk_bytes=8)
+
+    asyncio.run(stream.drain())  # Remote log not created yet
+    assert not local.exists()
+
+    remote.write_text('{"a":1}\n{"long":"é-line"}\n{"par')
+    asyncio.run(stream.drain())
+    assert local.read_text() == '{"a":1}\n{"long":"é-line"}\n'
+
+    with remote.open("a") as handle:
+        handle.write('tial":true}\n')
+    asyncio.run(stream.drain())
+    assert local.read_text().splitlines()[-1] == '{"partial":true}'
+    assert stream.n_events == 3
+
+
+def test_perf_accumulator_splits_model_wait_and_tool_time() -> None:
+    def event(event_type: str, **fields: object) -> dict:
+        payload = {"type": event_type, "messageId": "m", **fields}
+        return {"type": "event", "payload": payload}
+
+    perf = PerfAccumulator()
+    for obj in (
+        event("stream-start", startTime=1_000),
+        event("reasoning-delta", timestamp=3_000),  # TTFT 2s
+        # Two parallel tool calls in one turn: 3s-7s and 4s-9s → 6s of tool time
+        event("tool-call-start", toolCallId="a", toolName="bash", timestamp=3_000),
+        event("tool-call-start", toolCallId="b", toolName="file_read", timestamp=4_000),
+        event("tool-call-end", toolCallId="a", toolName="bash", timestamp=7_000),
+        event("tool-call-end", toolCallId="b", toolName="file_read", timestamp=9_000),
+        event("stream-delta", timestamp=10_000),  # Second turn
+        # Nested PTC call: already covered by its parent's interval
+        event(
+            "tool-call-start", toolCallId="c", parentToolCallId="a", timestamp=10_000
+        ),
+        event("stream-end", metadata={"duration": 12_000}),
+    ):
+        perf.feed_event(obj)
+
+    summary = perf.summary()
+    assert summary["ttft_sec"] == 2.0
+    assert summary["n_model_turns"] == 2
+    assert summary["n_tool_calls"] == 2
+    assert summary["tool_sec"] == 6.0
+    assert summary["model_wait_sec"] == 6.0
+    assert [tool["tool"] for tool in summary["slowest_tools"]] == ["file_read", "bash"]
+
+
+def test_bounded_log_writer_keeps_head_and_tail_lines(tmp_path: Path) -> None:
+    command_dir = tmp_path / "command-0"
+    command_dir.mkdir()
+    lines = [f'{{"n":{n}}}\n'.encode() for n in range(100)]  # 8-9 bytes each
+    with gzip.open(command_dir / "stdout.txt.gz", "wb") as sink:
+        writer = BoundedLogWriter(sink, head_bytes=30, tail_bytes=25)
+        for line in lines:
+            writer.write_line(line)
+        writer.finish()
+
+    logged = (read_agent_log(command_dir, "stdout.txt") or "").splitlines()
+    assert [json.loads(line) for line in logged] == [
+        {"n": 0},
+        {"n": 1},
+        {"n": 2},
+        {"type": "log-truncated", "dropped_lines": 95, "dropped_bytes": 848},
+        {"n": 98},
+        {"n": 99},
+    ]
+    assert read_agent_log(command_dir, "stderr.txt") is None
+
+
+def test_plain_log_is_written_through_and_capped_on_finish(tmp_path: Path) -> None:
+    lines = [f'{{"n":{n}}}\n'.encode() for n in range(100)]
+    path = tmp_path / "stdout.txt"
+    with path.open("wb") as sink:
+        writer = BoundedLogWriter(
+            sink, head_bytes=30, tail_bytes=25, write_through=True
+        )
+        for line in lines:
+            writer.write_line(line)
+        sink.flush()
+        # Live readers see every line while the agent runs.
+        assert path.read_bytes() == b"".join(lines)
+        writer.finish()
+
+    logged = [json.loads(line) for line in path.read_text().splitlines()]
+    assert logged[:3] == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert logged[3]["type"] == "log-truncated"
+    assert logged[4:] == [{"n": 98}, {"n": 99}]
+
+
+def test_summarize_samples_tracks_peaks_and_classifies_exit() -> None:
+    start = {"cpu_count": 4, "cgroup_memory_max": 1000, "cgroup_oom_kill": 2}
+    lines = [
+        json.dumps({"type": "start", **start}),
+        json.dumps(
+            {
+                "type": "sample",
+                "t": 2.0,
+                "rss": 300,
+                "cpu_pct": 50.0,
+                "cgroup_memory": 400,
+            }
+        ),
+        json.dumps(
+            {
+                "type": "sample",
+                "t": 4.0,
+                "rss": 700,
+                "cpu_pct": 180.0,
+                "cgroup_memory": 900,
+            }
+        ),
+        '{"type": "sample", "t": 6.0, "rss"',  # Truncated by a killed sampler
+    ]
+
+    summary = summarize_samples(
+        lines, exit_code=137, cgroup={"peak": 950, "oom_kill": 3}
+    )
+    assert summary["exit_classification"] == "oom"
+    assert summary["oom_kills"] == 1
+    assert summary["peak_rss_bytes"] == 700
+    assert summary["peak_cgroup_memory_bytes"] == 950
+    assert summary["cgroup_memory_max_bytes"] == 1000
+    assert summary["peak_cpu_pct"] == 180.0
+    assert summary["n_samples"] == 2
+
+    # No final cgroup reading (host-side fallback): OOM kills are unknown.
+    assert summarize_samples(lines, exit_code=137)["exit_classification"] == "killed"
+    assert summarize_samples(lines, exit_code=124)["exit_classification"] == "timeout"
+    assert summarize_samples([], exit_code=None)["exit_classification"] == "unknown"
+
+
+def test_sampler_is_rooted_at_the_pid_the_agent_stage_writes(tmp_path: Path) -> None:
+    pid_file = tmp_path / "agent.pid"
+    samples_file = tmp_path / "samples.jsonl"
+    agent = subprocess.Popen(
+        ["bash", "-c", 'echo $$ >"$0" && exec sleep 0.5', str(pid_file)]
+    )
+    # Reap the agent as soon as it exits so the sampler sees its root disappear.
+    reaper = threading.Thread(target=agent.wait)
+    reaper.start()
+    args = ["sample", str(samples_file), "--root-pid-file", str(pid_file)]
+    assert mux_resources.main([*args, "--interval", "0.05"]) == 0
+    reaper.join()
+
+    samples = [json.loads(line) for line in samples_file.read_text().splitlines()]
+    counts = {sample["n_procs"] for sample in samples if sample["type"] == "sample"}
+    assert counts == {1}  # Only the agent, not this process or the sampler
+
+
+def test_runtime_tuning_fits_cgroup_limits(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(os, "sched_getaffinity", lambda _pid: set(range(64)))
+
+    small = runtime_tuning(memory_max=1 << 30, cpus=1.5)
+    assert int(small["BUN_JSC_forceRAMSize"]) < 1 << 30
+    assert small["MUX_BUN_SMOL"] == "1"
+    assert small["BUN_JSC_numberOfGCMarkers"] == "2"
+    assert small["BUN_JSC_numberOfDFGCompilerThreads"] == "1"
+
+    unlimited = runtime_tuning(memory_max=None, cpus=None)
+    assert "BUN_JSC_forceRAMSize" not in unlimited
+    assert "MUX_BUN_SMOL" not in unlimited
+    assert unlimited["BUN_JSC_numberOfGCMarkers"] == "64"
+
+
+def test_startup_probe_times_first_request_and_event(tmp_path: Path) -> None:
+    # Stand-in CLI: reads the stub's URL from providers.jsonc, calls it once and
+    # emits one JSONL event.
+    fake_cli = tmp_path / "fake_cli.py"
+    fake_cli.write_text(
+        "import json, os, sys, urllib.request\n"
+        "sys.stdin.read()\n"
+        "config = os.path.join(os.environ['MUX_ROOT'], 'providers.jsonc')\n"
+        "base = json.load(open(config))['ollama']['baseUrl']\n"
+        "body = json.dumps({'model': 'm', 'stream': True}).encode()\n"
+        "reply = urllib.request.urlopen(base + '/chat', data=body).read()\n"
+        "assert json.loads(reply.splitlines()[-1])['done']\n"
+        "print(json.dumps({'type': 'run-complete'}))\n"
+    )
+    mux_root = tmp_path / "mux"
+    mux_root.mkdir()
+    server = StubOllamaServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        (mux_root / "providers.jsonc").write_text(
+            json.dumps({"ollama": {"baseUrl": server.base_url}})
+        )
+        runs = [
+            probe_once([sys.executable, str(fake_cli)], server, mux_root, tmp_path, 30)
+            for _ in range(3)
+        ]
+    finally:
+        server.shutdown()
+
+    for run in runs:
+        assert run["exit_code"] == 0
+        assert 0 < run["first_request_sec"] <= run["first_event_sec"] <= run["exit_sec"]
+    summary = summarize_probe(runs)
+    assert summary["cold_first_event_sec"] == runs[0]["first_event_sec"]
+    assert summary["warm_first_event_sec"] is not None
+    assert summary["n_failed"] == 0
+
+
+def test_provider_proxy_records_then_replays_offline(tmp_path: Path) -> None:
+    upstream_paths: list[str] = []
+
+    class Upstream(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            upstream_paths.append(self.path)
+            self.rfile.read(int(self.headers["Content-Length"]))
+            assert self.headers["x-api-key"] == "secret"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for n in range(3):
+                self.wfile.write(f"data: {n}\n\n".encode())
+                self.wfile.flush()
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    def serve(server: ThreadingHTTPServer) -> None:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def post(proxy: ProviderProxy, body: bytes) -> bytes:
+        request = urllib.request.Request(
+            # mux appends /v1 to ANTHROPIC_BASE_URL (normalizeAnthropicBaseURL)
+            f"http://127.0.0.1:{proxy.port}/anthropic/v1/messages",
+            data=body,
+            headers={"x-api-key": "secret"},
+        )
+        with urllib.request.urlopen(request) as response:
+            return response.read()
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    serve(upstream)
+    cassette = tmp_path / "cassette.jsonl"
+    # A base URL given with /v1 (as users often set it) must not double it.
+    upstream_url = _upstream_base(
+        "anthropic", f"http://127.0.0.1:{upstream.server_address[1]}/v1/"
+    )
+    assert upstream_url == f"http://127.0.0.1:{upstream.server_address[1]}"
+    recorder = ProviderProxy("record", cassette, upstreams={"anthropic": upstream_url})
+    serve(recorder)
+    try:
+        recorded = post(recorder, b'{"turn": 1}')
+    finally:
+        recorder.shutdown()
+        recorder.close()
+        upstream.shutdown()
+    assert recorded == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
+    assert upstream_paths == ["/v1/messages"]
+
+    # Upstream is gone: replay must be served entirely from the cassette.
+    replayer = ProviderProxy("replay", cassette, latency="zero")
+    serve(replayer)
+    try:
+        assert post(replayer, b'{"turn": 1, "changed": true}') == recorded
+        with pytest.raises(urllib.error.HTTPError):
+            post(replayer, b'{"turn": 2}')
+    finally:
+        replayer.shutdown()
+    assert replayer.stats["n_replayed"] == 1
+    assert replayer.stats["n_body_mismatches"] == 1
+    assert replayer.stats["n_misses"] == 1
+
+
+def test_mock_provider_streams_scripted_tool_turns() -> None:
+    provider = MockProvider(
+        [{"text": "Looking.", "bash": "ls"}], ttft_ms=0, tokens_per_sec=0
+    )
+    threading.Thread(target=provider.serve_forever, daemon=True).start()
+
+    def stream(messages: list[dict[str, str]]) -> list[dict]:
+        body = {"model": "m", "stream": True, "tools": [{}], "messages": messages}
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{provider.port}/v1/messages",
+            data=json.dumps(body).encode(),
+        )
+        with urllib.request.urlopen(request) as response:
+            return [
+                json.loads(line[len("data: ") :])
+                for line in response.read().decode().splitlines()
+                if line.startswith("data: ")
+            ]
+
+    try:
+        first = stream([{"role": "user", "content": "go"}])
+        done = stream(
+            [
+                {"role": "user", "content": "go"},
+                {"role": "assistant", "content": "..."},
+            ]
+        )
+    finally:
+        provider.shutdown()
+
+    tool_json = "".join(
+        event["delta"]["partial_json"]
+        for event in first
+        if event["type"] == "content_block_delta"
+        and event["delta"]["type"] == "input_json_delta"
+    )
+    assert json.loads(tool_json)["script"] == "ls"
+    assert first[-2]["delta"]["stop_reason"] == "tool_use"
+    assert done[-2]["delta"]["stop_reason"] == "end_turn"
+    assert provider.stats["n_requests"] == 2
+    assert provider.stats["n_tool_turns"] == 1
+
+
+def test_max_useful_concurrency_picks_the_throughput_knee() -> None:
+    def job(concurrency: int, trials_per_min: float) -> JobThroughput:
+        return JobThroughput(
+            f"c{concurrency}", concurrency, 8, 60.0, trials_per_min, None, None, None
+        )
+
+    assert max_useful_concurrency([job(1, 2.0), job(4, 7.5), job(8, 8.0)]) == 4
+    assert max_useful_concurrency([job(4, 7.5)]) is None
+
+
+def test_local_sandbox_environment_matches_the_base_environment_api() -> None:
+    base = pytest.importorskip("harbor.environments.base").BaseEnvironment
+    # Every environment method the agent calls, plus the lifecycle the
+    # benchmark drives, must exist on the stand-in with Harbor's parameters.
+    sources = [
+        Path(__file__).with_name(name) for name in ("mux_agent.py", "mux_live.py")
+    ]
+    used = {"start", "stop"} | {
+        name
+        for source in sources
+        for name in re.findall(r"\benvironment\.([a-z_]+)\(", source.read_text())
+    }
+    assert {"exec", "upload_dir", "download_file"} <= used
+    for name in sorted(used):
+        local = getattr(LocalSandboxEnvironment, name, None)
+        assert callable(local), f"LocalSandboxEnvironment lacks {name}()"
+        if (harbor_method := getattr(base, name, None)) is not None:
+            expected = list(inspect.signature(harbor_method).parameters)
+            assert list(inspect.signature(local).parameters) == expected, name
+
+
+def test_local_sandbox_environment_maps_paths_and_overrides_commands(
+    tmp_path: Path,
+) -> None:
+    environment = LocalSandboxEnvironment(
+        tmp_path / "sandbox",
+        transfer_latency_sec=0.01,
+        command_overrides={"install.sh": "echo installed > /opt/marker"},
+    )
+    source = tmp_path / "runner.sh"
+    source.write_text("echo hi\n")
+
+    async def scenario() -> list:
+        await environment.start()
+        await environment.upload_file(
+            source_path=source, target_path="/installed-agent/runner.sh"
+        )
+        run = await environment.exec(
+            command="bash /installed-agent/runner.sh > /logs/out.txt; echo $MUX_APP_ROOT",
+            env={"MUX_APP_ROOT": "/opt/mux-app"},
+        )
+        install = await environment.exec(command="bash /installed-agent/install.sh")
+        await environment.download_file("/logs/out.txt", tmp_path / "out.txt")
+        with pytest.raises(FileNotFoundError):
+            await environment.download_file("/logs/missing.txt", tmp_path / "x")
+        return [run, install]
+
+    run, install = asyncio.run(scenario())
+    assert run.return_code == 0
+    assert run.stdout.strip() == str(environment.sandbox_path("/opt/mux-app"))
+    assert install.return_code == 0
+    assert environment.sandbox_path("/opt/marker").read_text() == "installed\n"
+    assert (tmp_path / "out.txt").read_text() == "hi\n"
+    assert environment.stats["n_exec"] == 2
+    assert environment.stats["n_downloads"] == 1
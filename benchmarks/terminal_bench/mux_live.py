@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+import shlex
+from pathlib import Path
+from typing import Any
+
+LIVE_EVENTS_FILE = "live-events.jsonl"
+
+
+class LiveEventStream:
+    """Mirror a JSONL file that grows inside the sandbox onto the host.
+
+    Each pull asks the sandbox for the bytes past the last offset (``tail -c``)
+    and appends only complete lines to ``local_path``, so the host copy is
+    always valid JSONL and survives a cancelled trial. Works with any Harbor
+    environment, since it only needs ``exec``.
+    """
+
+    def __init__(
+        self,
+        environment: Any,
+        remote_path: str,
+        local_path: Path,
+        interval: float = 10.0,
+        chunk_bytes: int = 1 << 20,
+    ) -> None:
+        self._environment = environment
+        self._remote_path = remote_path
+        self._local_path = local_path
+        self._interval = interval
+        self._chunk_bytes = chunk_bytes
+        self.offset = 0
+        self.n_events = 0
+
+    async def pull(self) -> bool:
+        """Append newly completed lines; returns True if more data is pending."""
+        result = await self._environment.exec(
+            command=(
+                f"tail -c +{self.offset + 1} {shlex.quote(self._remote_path)} "
+                f"2>/dev/null | head -c {self._chunk_bytes}"
+            )
+        )
+        text = result.stdout or ""
+        complete, newline, _ = text.rpartition("\n")
+        if not newline:
+            if len(text.encode()) < self._chunk_bytes:
+                return False
+            # A single line longer than the chunk: widen until it fits.
+            self._chunk_bytes *= 2
+            return True
+        data = f"{complete}\n"
+        with self._local_path.open("a", encoding="utf-8") as handle:
+            handle.write(data)
+        self.offset += len(data.encode())
+        self.n_events += data.count("\n")
+        return len(text.encode()) >= self._chunk_bytes
+
+    async def drain(self) -> None:
+        while await self.pull():
+            pass
+
+    async def follow(self) -> None:
+        """Pull every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                continue  # Transient exec failures must not end the trial
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import shutil
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+# Top-level sandbox directories that commands and transfers are rerouted into
+# the local root (MuxAgent and mux-run.sh only touch these).
+SANDBOX_TOP_DIRS = ("installed-agent", "logs", "tmp", "opt", "root", "workspace", "app")
+
+_SANDBOX_PATH_RE = re.compile(
+    r"(?<![\w./-])/(?=(?:{})(?:/|\b))".format(
+        "|".join(map(re.escape, SANDBOX_TOP_DIRS))
+    )
+)
+
+
+@dataclass
+class LocalExecResult:
+    stdout: str | None
+    stderr: str | None
+    return_code: int
+
+
+class LocalSandboxEnvironment:
+    """Stand-in for a Harbor environment backed by a local directory.
+
+    Implements the part of ``BaseEnvironment`` MuxAgent uses (``exec``,
+    ``upload_file``/``upload_dir``, ``download_file``/``download_dir``) without
+    Docker or a cloud sandbox, so host-side agent overhead can be measured at
+    high trial concurrency. Sandbox paths under ``SANDBOX_TOP_DIRS`` map into
+    ``root``, in transfers and in exec'd commands and env values; commands run
+    through ``bash -c`` as real subprocesses.
+
+    ``command_overrides`` maps a substring to a replacement command: the first
+    key found in a command runs instead of it (e.g. to stand in for the
+    install template or the agent itself). Each exec waits
+    ``exec_latency_sec`` and each transfer ``transfer_latency_sec`` plus its
+    size over ``transfer_bytes_per_sec``, approximating a remote sandbox API.
+
+    Deliberately duck-typed rather than a ``BaseEnvironment`` subclass: that
+    constructor is tied to a Harbor trial (task environment directory, trial
+    paths, environment config) that a benchmark stand-in does not have. The
+    test suite instead checks that every environment method MuxAgent calls
+    exists here with ``BaseEnvironment``'s parameters, so a Harbor signature
+    change fails a test rather than only the benchmark.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        exec_latency_sec: float = 0.0,
+        transfer_latency_sec: float = 0.0,
+        transfer_bytes_per_sec: float | None = None,
+        command_overrides: Mapping[str, str] | None = None,
+    ) -> None:
+        self.root = root.resolve()
+        self._exec_latency_sec = exec_latency_sec
+        self._transfer_latency_sec = transfer_latency_sec
+        self._transfer_bytes_per_sec = transfer_bytes_per_sec
+        self._command_overrides = dict(command_overrides or {})
+        self.stats = {
+            "n_exec": 0,
+            "n_uploads": 0,
+            "n_downloads": 0,
+            "upload_bytes": 0,
+            "download_bytes": 0,
+            "exec_sec": 0.0,
+        }
+
+    def sandbox_path(self, path: str | Path) -> Path:
+        """Local path backing an absolute sandbox path."""
+        return self.root / str(path).lstrip("/")
+
+    def _rewrite(self, text: str) -> str:
+        return _SANDBOX_PATH_RE.sub(f"{self.root}/", text)
+
+    async def _transfer_delay(self, n_bytes: int) -> None:
+        delay = self._transfer_latency_sec
+        if self._transfer_bytes_per_sec:
+            delay += n_bytes / self._transfer_bytes_per_sec
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def start(self, force_build: bool = False) -> None:
+        for name in SANDBOX_TOP_DIRS:
+            self.sandbox_path(name).mkdir(parents=True, exist_ok=True)
+
+    async def stop(self, delete: bool = True) -> None:
+        if delete:
+            await asyncio.to_thread(shutil.rmtree, self.root, True)
+
+    async def exec(
+        self,
+        command: str,
+        cwd: str | None = None,
+        env: dict[str, str] | None = None,
+        timeout_sec: int | None = None,
+    ) -> LocalExecResult:
+        self.stats["n_exec"] += 1
+        if self._exec_latency_sec > 0:
+            await asyncio.sleep(self._exec_latency_sec)
+        for needle, replacement in self._command_overrides.items():
+            if needle in command:
+                command = replacement
+                break
+
+        local_cwd = self.sandbox_path(cwd) if cwd else self.root
+        local_cwd.mkdir(parents=True, exist_ok=True)
+        local_env = {
+            **os.environ,
+            **{key: self._rewrite(value) for key, value in (env or {}).items()},
+        }
+        started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            "bash",
+            "-c",
+            self._rewrite(command),
+            cwd=local_cwd,
+            env=local_env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(), timeout=timeout_sec
+            )
+        except TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        finally:
+            self.stats["exec_sec"] += time.monotonic() - started
+        return LocalExecResult(
+            stdout=stdout.decode(errors="replace"),
+            stderr=stderr.decode(errors="replace"),
+            return_code=process.returncode,
+        )
+
+    async def upload_file(self, source_path: Path | str, target_path: str) -> None:
+        size = Path(source_path).stat().st_size
+        await self._transfer_delay(size)
+        target = self.sandbox_path(target_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, source_path, target)
+        self.stats["n_uploads"] += 1
+        self.stats["upload_bytes"] += size
+
+    async def upload_dir(self, source_dir: Path | str, target_dir: str) -> None:
+        files = [path for path in Path(source_dir).rglob("*") if path.is_file()]
+        size = sum(path.stat().st_size for path in files)
+        await self._transfer_delay(size)
+        await asyncio.to_thread(
+            shutil.copytree,
+            source_dir,
+            self.sandbox_path(target_dir),
+            dirs_exist_ok=True,
+        )
+        self.stats["n_uploads"] += 1
+        self.stats["upload_bytes"] += size
+
+    async def download_file(self, source_path: str, target_path: Path | str) -> None:
+        source = self.sandbox_path(source_path)
+        size = source.stat().st_size  # FileNotFoundError like a missing remote file
+        await self._transfer_delay(size)
+        Path(target_path).parent.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(shutil.copyfile, source, target_path)
+        self.stats["n_downloads"] += 1
+        self.stats["download_bytes"] += size
+
+    async def download_dir(self, source_dir: str, target_dir: Path | str) -> None:
+        source = self.sandbox_path(source_dir)
+        files = [path for path in source.rglob("*") if path.is_file()]
+        size = sum(path.stat().st_size for path in files)
+        await self._transfer_delay(size)
+        await asyncio.to_thread(shutil.copytree, source, target_dir, dirs_exist_ok=True)
+        self.stats["n_downloads"] += 1
+        self.stats["download_bytes"] += size
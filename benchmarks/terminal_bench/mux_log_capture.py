@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Bounded, compressed log capture for the agent's stdout/stderr.
+
+mux-run.sh pipes each stream through this script instead of ``tee``. Lines are
+written whole into a gzip (or zstd, or plain) file, so the log decompresses to
+valid JSONL. Once ``--max-bytes`` of input is exceeded, the first half is kept
+as the head, the most recent lines are held in a ring buffer of the other half,
+and a ``{"type": "log-truncated", ...}`` line marks the gap when the tail is
+written at EOF or on SIGTERM/SIGHUP. A plain (``none``) log is written through
+past the head instead, so live readers keep seeing every line; the cap is
+applied when the capture finishes by truncating the file back to the head. A background thread flushes the file every
+``--flush-sec`` seconds, whether or not new lines arrive, so a hard-killed run
+still leaves a readable prefix and live readers see output without waiting for
+the next line. zstd output goes through the ``zstd`` binary.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import IO
+
+LOG_CODEC_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+DEFAULT_MAX_BYTES = 64 << 20
+_FLUSH_INTERVAL_SEC = 5.0
+
+
+class BoundedLogWriter:
+    """Keeps the first ``head_bytes`` and the last ``tail_bytes`` of a line stream.
+
+    With ``write_through`` (a seekable sink) every line is written as it
+    arrives, and ``finish`` truncates the sink back to the head before writing
+    the marker and tail.
+    """
+
+    def __init__(
+        self,
+        sink: IO[bytes],
+        head_bytes: int,
+        tail_bytes: int,
+        write_through: bool = False,
+    ) -> None:
+        self._sink = sink
+        self._write_through = write_through
+        self._head_end = 0
+        self._head_left = head_bytes
+        self._tail_bytes = tail_bytes
+        self._tail: deque[bytes] = deque()
+        self._tail_size = 0
+        self.dropped_lines = 0
+        self.dropped_bytes = 0
+
+    def write_line(self, line: bytes) -> None:
+        if self._head_left >= len(line):
+            self._head_left -= len(line)
+            self._head_end += len(line)
+            self._sink.write(line)
+            return
+        if self._write_through:
+            self._sink.write(line)
+        # Head is full: once the head cap is hit, everything else competes
+        # for the tail.
+        self._head_left = 0
+        self._tail.append(line)
+        self._tail_size += len(line)
+        while self._tail_size > self._tail_bytes and self._tail:
+            evicted = self._tail.popleft()
+            self._tail_size -= len(evicted)
+            self.dropped_lines += 1
+            self.dropped_bytes += len(evicted)
+
+    def finish(self) -> None:
+        if self._write_through:
+            if not self.dropped_lines:
+                # Everything is already in the file, in order.
+                self._tail.clear()
+                self._tail_size = 0
+                return
+            self._sink.seek(self._head_end)
+            self._sink.truncate()
+        if self.dropped_lines:
+            marker = {
+                "type": "log-truncated",
+                "dropped_lines": self.dropped_lines,
+                "dropped_bytes": self.dropped_bytes,
+            }
+            self._sink.write(f"{json.dumps(marker)}\n".encode())
+        while self._tail:
+            self._sink.write(self._tail.popleft())
+        self._tail_size = 0
+
+
+def _open_sink(path: Path, codec: str) -> tuple[IO[bytes], subprocess.Popen | None]:
+    if codec == "zstd":
+        if shutil.which("zstd"):
+            handle = path.open("wb")
+            process = subprocess.Popen(
+                ["zstd", "-q", "-c", "-"], stdin=subprocess.PIPE, stdout=handle
+            )
+            handle.close()
+            assert process.stdin is not None
+            return process.stdin, process
+        # Keep the requested file name so readers find it; gzip is detected by
+        # magic bytes.
+        print("[mux-log-capture] zstd not found, writing gzip", file=sys.stderr)
+        codec = "gzip"
+    if codec == "gzip":
+        return gzip.open(path, "wb", compresslevel=6), None
+    return path.open("wb"), None
+
+
+def _flush(sink: IO[bytes]) -> None:
+    if isinstance(sink, gzip.GzipFile):
+        # Sync flush keeps everything written so far decompressible.
+        sink.flush(zlib.Z_SYNC_FLUSH)
+    else:
+        sink.flush()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--codec", choices=sorted(LOG_CODEC_SUFFIXES), default="gzip")
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="Uncompressed bytes kept (half head, half tail); 0 disables the cap",
+    )
+    parser.add_argument(
+        "--flush-sec",
+        type=float,
+        default=_FLUSH_INTERVAL_SEC,
+        help="Seconds between flushes of the output file",
+    )
+    parser.add_argument(
+        "--no-passthrough",
+        action="store_true",
+        help="Do not copy input to stdout",
+    )
+    args = parser.parse_args(argv)
+
+    max_bytes = args.max_bytes if args.max_bytes > 0 else sys.maxsize
+    sink, process = _open_sink(args.output, args.codec)
+    writer = BoundedLogWriter(
+        sink,
+        max_bytes - max_bytes // 2,
+        max_bytes // 2,
+        write_through=args.codec == "none",
+    )
+    # Reentrant: the signal handlers run on the main thread, possibly while it
+    # holds the lock in the read loop.
+    lock = threading.RLock()
+    closed = threading.Event()
+    dirty = False
+
+    def flush_periodically() -> None:
+        nonlocal dirty
+        while not closed.wait(max(args.flush_sec, 0.1)):
+            with lock:
+                if dirty and not closed.is_set():
+                    _flush(sink)
+                    dirty = False
+
+    def close() -> None:
+        closed.set()
+        with lock:
+            writer.finish()
+            sink.close()
+        if process is not None:
+            process.wait()
+
+    def on_signal(signum: int, _frame: object) -> None:
+        close()
+        sys.exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGHUP, on_signal)
+
+    threading.Thread(target=flush_periodically, daemon=True).start()
+    passthrough = None if args.no_passthrough else sys.stdout.buffer
+    for raw in sys.stdin.buffer:
+        if passthrough is not None:
+            try:
+                passthrough.write(raw)
+                passthrough.flush()
+            except BrokenPipeError:
+                # Keep capturing even if nobody reads the passthrough anymore.
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                passthrough = None
+        with lock:
+            writer.write_line(raw)
+            dirty = True
+    close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
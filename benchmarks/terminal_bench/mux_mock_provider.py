@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Scripted mock Anthropic provider for harness throughput benchmarks.
+
+mux-run.sh starts this on localhost when MUX_MOCK_PROVIDER is set and points
+``ANTHROPIC_BASE_URL`` at it. It speaks the streaming Messages API (SSE), so
+the CLI runs its normal Anthropic path, but every reply comes from a script
+instead of a model: a JSON list of turns such as
+
+    [{"bash": "ls -la"}, {"text": "Done."}]
+
+The reply to a request is the turn indexed by the number of assistant
+messages already in the conversation; ``bash`` turns become a ``bash`` tool
+call, and turns past the end of the script finish the session. Requests
+without tools (e.g. title generation) get a short text reply. Each reply
+waits ``--ttft-ms`` before its first token and then streams at
+``--tokens-per-sec`` (about four characters per token).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+try:
+    from .mux_provider_proxy import add_local_server_arguments, serve_until_signalled
+except ImportError:  # Run as a script from /installed-agent
+    from mux_provider_proxy import (  # type: ignore[import-not-found,no-redef]
+        add_local_server_arguments,
+        serve_until_signalled,
+    )
+
+MOCK_PROVIDER_STATS_FILE = "mock-provider.json"
+
+# Inspect the task, then finish: two tool round trips per trial.
+DEFAULT_SCRIPT: list[dict[str, Any]] = [
+    {"text": "Let me look around.", "bash": "pwd && ls -la"},
+    {"bash": "find . -maxdepth 2 -type f | head -50"},
+    {"text": "Done."},
+]
+
+_CHARS_PER_TOKEN = 4
+
+
+def load_script(raw: str) -> list[dict[str, Any]]:
+    """Parse a script given inline as JSON or as a path to a JSON file."""
+    if not raw:
+        return DEFAULT_SCRIPT
+    text = raw if raw.lstrip().startswith("[") else Path(raw).read_text()
+    script = json.loads(text)
+    if not isinstance(script, list) or not all(isinstance(t, dict) for t in script):
+        raise ValueError("mock provider script must be a JSON list of turn objects")
+    return script
+
+
+def _tokens(text: str) -> list[str]:
+    return [
+        text[start : start + _CHARS_PER_TOKEN]
+        for start in range(0, len(text), _CHARS_PER_TOKEN)
+    ]
+
+
+def _sse(event: dict[str, Any]) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+class MockProvider(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        script: list[dict[str, Any]],
+        ttft_ms: float = 500.0,
+        tokens_per_sec: float = 50.0,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), _MockHandler)
+        self.script = script
+        self.ttft_sec = ttft_ms / 1000
+        self.token_delay_sec = 1 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+        self._lock = threading.Lock()
+        self._n_messages = 0
+        self.stats = {
+            "n_requests": 0,
+            "n_tool_turns": 0,
+            "n_text_turns": 0,
+            "n_output_tokens": 0,
+        }
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def next_message_id(self) -> str:
+        with self._lock:
+            self._n_messages += 1
+            return f"msg_mock_{self._n_messages:06d}"
+
+    def turn_for(self, request: dict[str, Any]) -> dict[str, Any]:
+        """The scripted turn answering ``request``."""
+        if not request.get("tools"):
+            return {"text": "Mock reply."}
+        messages = request.get("messages") or []
+        n_assistant = sum(
+            1 for message in messages if message.get("role") == "assistant"
+        )
+        if n_assistant < len(self.script):
+            return self.script[n_assistant]
+        return {"text": "Done."}
+
+    def stream_events(
+        self, turn: dict[str, Any], model: str, input_tokens: int
+    ) -> Iterator[tuple[dict[str, Any], bool]]:
+        """Anthropic stream events for a turn; the flag marks token-bearing deltas."""
+        message_id = self.next_message_id()
+        yield (
+            {
+                "type": "message_start",
+                "message": {
+                    "id": message_id,
+                    "type": "message",
+                    "role": "assistant",
+                    "model": model,
+                    "content": [],
+                    "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": input_tokens, "output_tokens": 1},
+                },
+            },
+            False,
+        )
+
+        index = 0
+        output_tokens = 0
+        if text := turn.get("text"):
+            yield (
+                {
+                    "type": "content_block_start",
+                    "index": index,
+                    "content_block": {"type": "text", "text": ""},
+                },
+                False,
+            )
+            for token in _tokens(text):
+                output_tokens += 1
+                yield (
+                    {
+                        "type": "content_block_delta",
+                        "index": index,
+                        "delta": {"type": "text_delta", "text": token},
+                    },
+                    True,
+                )
+            yield {"type": "content_block_stop", "index": index}, False
+            index += 1
+
+        tool = turn.get("tool")
+        if script := turn.get("bash"):
+            tool = {
+                "name": "bash",
+                "input": {
+                    "script": script,
+                    "timeout_secs": turn.get("timeout_secs", 60),
+                    "display_name": turn.get("display_name", "Mock command"),
+                },
+            }
+        if tool:
+            yield (
+                {
+                    "type": "content_block_start",
+                    "index": index,
+                    "content_block": {
+                        "type": "tool_use",
+                        "id": f"toolu_{message_id}",
+                        "name": tool["name"],
+                        "input": {},
+                    },
+                },
+                False,
+            )
+            for token in _tokens(json.dumps(tool.get("input") or {})):
+                output_tokens += 1
+                yield (
+                    {
+                        "type": "content_block_delta",
+                        "index": index,
+                        "delta": {"type": "input_json_delta", "partial_json": token},
+                    },
+                    True,
+                )
+            yield {"type": "content_block_stop", "index": index}, False
+
+        self.count("n_tool_turns" if tool else "n_text_turns")
+        self.count("n_output_tokens", output_tokens)
+        yield (
+            {
+                "type": "message_delta",
+                "delta": {
+                    "stop_reason": "tool_use" if tool else "end_turn",
+                    "stop_sequence": None,
+                },
+                "usage": {"output_tokens": output_tokens},
+            },
+            False,
+        )
+        yield {"type": "message_stop"}, False
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    server: MockProvider
+
+    def do_POST(self) -> None:
+        self.server.count("n_requests")
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        if not self.path.rstrip("/").endswith("/messages"):
+            self.send_error(
+                404, f"mock provider only serves /messages, not {self.path}"
+            )
+            return
+        try:
+            request = json.loads(raw)
+        except ValueError:
+            self.send_error(400, "request body is not JSON")
+            return
+
+        turn = self.server.turn_for(request)
+        model = request.get("model", "mock")
+        input_tokens = max(len(raw) // _CHARS_PER_TOKEN, 1)
+        events = self.server.stream_events(turn, model, input_tokens)
+        if not request.get("stream"):
+            self._reply_json(events)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        delay = self.server.ttft_sec
+        for event, has_token in events:
+            if has_token:
+                time.sleep(delay)
+                delay = self.server.token_delay_sec
+            self.wfile.write(_sse(event))
+            self.wfile.flush()
+
+    def _reply_json(self, events: Iterator[tuple[dict[str, Any], bool]]) -> None:
+        message: dict[str, Any] = {}
+        blocks: dict[int, dict[str, Any]] = {}
+        for event, _ in events:
+            if event["type"] == "message_start":
+                message = event["message"]
+            elif event["type"] == "content_block_start":
+                blocks[event["index"]] = dict(event["content_block"])
+            elif event["type"] == "content_block_delta":
+                block, delta = blocks[event["index"]], event["delta"]
+                if delta["type"] == "text_delta":
+                    block["text"] += delta["text"]
+                else:
+                    block["_json"] = block.get("_json", "") + delta["partial_json"]
+            elif event["type"] == "message_delta":
+                message.update(event["delta"])
+                message["usage"]["output_tokens"] = event["usage"]["output_tokens"]
+        for block in blocks.values():
+            if "_json" in block:
+                block["input"] = json.loads(block.pop("_json"))
+        message["content"] = [blocks[index] for index in sorted(blocks)]
+        time.sleep(self.server.ttft_sec)
+        payload = json.dumps(message).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # The stats file summarizes traffic
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--script", default="", help="Turns as inline JSON or a JSON file path"
+    )
+    parser.add_argument("--ttft-ms", type=float, default=500.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    add_local_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    provider = MockProvider(load_script(args.script), args.ttft_ms, args.tokens_per_sec)
+    serve_until_signalled(provider, args.port_file, args.stats, lambda: provider.stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,981 @@
 from __future__ import annotations
 
+import argparse
+import fcntl
+import fnmatch
+import gzip
+import hashlib
 import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
 import tarfile
-from collections.abc import Iterable
+import tempfile
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import IO
 
+# Host-side cache of built payloads, shared by every MuxAgent instance (and every
+# Harbor process) that runs from this checkout.
+PAYLOAD_CACHE_DIR = Path(__file__).parent / ".payload_cache"
 
-def build_app_archive(repo_root: Path, include_paths: Iterable[str]) -> bytes:
+# Paths shipped when no manifest is given (MuxAgent._INCLUDE_PATHS).
+DEFAULT_INCLUDE_PATHS: tuple[str, ...] = (
+    "package.json",
+    "bun.lock",
+    "bunfig.toml",
+    "tsconfig.json",
+    "tsconfig.main.json",
+    "src",
+    "dist",
+    "scripts/postinstall.sh",
+)
+
+# Bundled payload mode: entry points compiled by `bun build` on the host. The
+# workers are separate entry points because the CLI resolves them next to its
+# own file at runtime.
+DEFAULT_BUNDLE_ENTRYPOINTS: tuple[str, ...] = (
+    "src/cli/run.ts",
+    "src/node/utils/main/tokenizer.worker.ts",
+    "src/node/services/analytics/analyticsWorker.ts",
+)
+# Packages left out of the bundle: native addons, wasm loaders and packages the
+# CLI locates on disk at runtime (typescript lib files). Those listed in the root
+# package.json dependencies are installed in the sandbox from a minimal manifest.
+# Must cover every --external (and --alias source) in the Makefile's
+# ESBUILD_CLI_FLAGS and ESBUILD_SERVER_FLAGS; `bun build` has no --alias, so
+# aliased packages stay external and load their own entry point at runtime.
+DEFAULT_BUNDLE_EXTERNALS: tuple[str, ...] = (
+    "@1password/sdk",
+    "@1password/sdk-core",
+    "@duckdb/node-api",
+    "@jitl/quickjs-wasmfile-release-asyncify",
+    "@lydell/node-pty",
+    "@trpc/server",
+    "commander",
+    "cpu-features",
+    "electron",
+    "electron-devtools-installer",
+    "electron-updater",
+    "electron-window-state",
+    "jsonc-parser",
+    "node-pty",
+    "quickjs-emscripten-core",
+    "sharp",
+    "ssh2",
+    "typescript",
+    "zod",
+)
+# Directory inside the payload holding the bundled CLI; mux-run.sh and
+# mux_setup.sh.j2 switch to bundle mode when bundle/run.js exists.
+BUNDLE_DIR = "bundle"
+
+# Inputs that determine the production node_modules snapshot, and the sandbox
+# platform it is installed for (Harbor task images are linux/amd64).
+_DEPS_SNAPSHOT_INPUTS: tuple[str, ...] = (
+    "package.json",
+    "bun.lock",
+    "bunfig.toml",
+    "scripts/postinstall.sh",
+)
+DEFAULT_DEPS_PLATFORM = "linux-x64"
+# Written into the snapshot's node_modules; mux_setup.sh.j2 discards a
+# snapshot whose platform does not match the sandbox and runs bun install.
+DEPS_PLATFORM_STAMP = ".mux-deps-platform"
+
+_CACHE_STATE_FILE = "current.json"
+_CACHE_LOCK_FILE = ".lock"
+# Superseded archives and unused staging dirs are only removed once their mtime
+# is this old, so setups still uploading them from another process can finish.
+_STALE_ENTRY_AGE_SEC = 3600.0
+
+# Supported payload codecs and their archive suffix / default level. mux_setup.sh.j2
+# detects the codec from the archive's magic bytes, so the upload name is fixed.
+PAYLOAD_CODECS: dict[str, tuple[str, int]] = {
+    "gzip": (".tar.gz", 6),
+    "zstd": (".tar.zst", 3),
+}
+DEFAULT_PAYLOAD_CODEC = "gzip"
+
+# Uncompressed bytes per independently compressed gzip member. Each block is a
+# complete gzip member, so the concatenation is a valid multi-member gzip stream
+# that `tar -xzf` reads without any special flags.
+_GZIP_BLOCK_SIZE = 1 << 20
+
+# Files whose imports are followed when tracing from manifest entry points.
+_SCRIPT_SUFFIXES = (".ts", ".tsx", ".mts", ".cts", ".js", ".jsx", ".mjs", ".cjs")
+_RESOLVE_SUFFIXES = (*_SCRIPT_SUFFIXES, ".json")
+# Static imports/re-exports (`from "x"`), side-effect and dynamic imports
+# (`import "x"`, `import("x")`) and `require("x")`. Over-matching (e.g. inside
+# strings) only ever adds files, which is the safe direction.
+_IMPORT_PATTERN = re.compile(
+    r"""(?:\bfrom\s*|\bimport\s*\(?\s*|\brequire\(\s*)["']([^"'\n]+)["']"""
+)
+
+
+@dataclass(frozen=True)
+class CachedArchive:
+    """A finished payload archive stored in the host-side cache."""
+
+    path: Path
+    digest: str
+    size: int
+
+
+@dataclass(frozen=True)
+class PayloadManifest:
+    """Describes which repo paths go into the payload.
+
+    ``include`` lists files and directories relative to the repo root and
+    ``exclude`` holds glob patterns matched against archive paths (e.g.
+    ``**/*.test.ts``). When ``entrypoints`` is set, an include directory that
+    contains an entry point only keeps the files those entry points
+    transitively import; a more specific include entry inside it (say, a data
+    directory read at runtime) is still shipped whole.
+    """
+
+    include: tuple[str, ...]
+    exclude: tuple[str, ...] = ()
+    entrypoints: tuple[str, ...] = ()
+
+    @classmethod
+    def load(cls, path: Path) -> PayloadManifest:
+        """Load a manifest from a JSON file with include/exclude/entrypoints lists."""
+        data = json.loads(path.read_text())
+        if not isinstance(data, dict):
+            raise ValueError(f"payload manifest {path} must be a JSON object")
+        fields: dict[str, tuple[str, ...]] = {}
+        for key in ("include", "exclude", "entrypoints"):
+            value = data.get(key, [])
+            if not isinstance(value, list) or not all(
+                isinstance(item, str) for item in value
+            ):
+                raise ValueError(
+                    f"payload manifest {path}: {key} must be a list of strings"
+                )
+            fields[key] = tuple(value)
+        if not fields["include"]:
+            raise ValueError(f"payload manifest {path}: include must not be empty")
+        return cls(**fields)
+
+    @property
+    def key(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+
+@dataclass(frozen=True)
+class CliBundleSpec:
+    """Settings for the pre-bundled headless CLI payload."""
+
+    entrypoints: tuple[str, ...] = DEFAULT_BUNDLE_ENTRYPOINTS
+    externals: tuple[str, ...] = DEFAULT_BUNDLE_EXTERNALS
+    minify: bool = True
+
+    @property
+    def key(self) -> str:
+        return json.dumps(asdict(self), sort_keys=True)
+
+
+def _as_manifest(paths: PayloadManifest | Iterable[str]) -> PayloadManifest:
+    if isinstance(paths, PayloadManifest):
+        return paths
+    return PayloadManifest(include=tuple(paths))
+
+
+class _ParallelGzipWriter(io.RawIOBase):
+    """Write-only stream that gzips fixed-size blocks on a thread pool.
+
+    zlib releases the GIL, so blocks compress in parallel while the tar stream
+    keeps producing input. At most ``2 * threads`` blocks are in flight, which
+    bounds memory regardless of payload size.
+    """
+
+    def __init__(self, dest: IO[bytes], level: int, threads: int) -> None:
+        super().__init__()
+        self._dest = dest
+        self._level = level
+        self._max_pending = max(1, threads) * 2
+        self._executor = ThreadPoolExecutor(max_workers=max(1, threads))
+        self._pending: deque[Future[bytes]] = deque()
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:  # type: ignore[override]
+        self._buffer += data
+        while len(self._buffer) >= _GZIP_BLOCK_SIZE:
+            block = bytes(self._buffer[:_GZIP_BLOCK_SIZE])
+            del self._buffer[:_GZIP_BLOCK_SIZE]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block: bytes) -> None:
+        self._pending.append(
+            self._executor.submit(gzip.compress, block, self._level, mtime=0)
+        )
+        while len(self._pending) >= self._max_pending:
+            self._dest.write(self._pending.popleft().result())
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._pending:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._dest.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            super().close()
+
+
+@contextmanager
+def _zstd_writer(dest: IO[bytes], level: int, threads: int) -> Iterator[IO[bytes]]:
+    """Yield a zstd compression stream, via `zstandard` or the `zstd` CLI."""
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=level, threads=threads)
+        with compressor.stream_writer(dest, closefd=False) as writer:
+            yield writer
+        return
+
+    zstd_bin = shutil.which("zstd")
+    if zstd_bin is None:
+        raise RuntimeError(
+            "zstd payload codec requires the `zstandard` package or a `zstd` binary"
+        )
+    process = subprocess.Popen(
+        [zstd_bin, "-q", "-c", f"-{level}", f"-T{threads}"],
+        stdin=subprocess.PIPE,
+        stdout=dest,
+    )
+    assert process.stdin is not None
+    try:
+        yield process.stdin
+    finally:
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"zstd exited with status {process.returncode}")
+
+
+@contextmanager
+def _compressed_writer(
+    dest: IO[bytes], codec: str, level: int, threads: int
+) -> Iterator[IO[bytes]]:
+    if codec == "gzip":
+        writer = _ParallelGzipWriter(dest, level, threads)
+        try:
+            yield writer  # type: ignore[misc]
+        finally:
+            writer.close()
+    elif codec == "zstd":
+        with _zstd_writer(dest, level, threads) as writer:
+            yield writer
+    else:
+        raise ValueError(
+            f"Unknown payload codec {codec!r} (expected one of {sorted(PAYLOAD_CODECS)})"
+        )
+
+
+def _write_archive_files(
+    dest: IO[bytes],
+    files: Iterable[tuple[str, Path]],
+    codec: str,
+    level: int | None,
+    threads: int | None,
+) -> None:
+    if codec not in PAYLOAD_CODECS:
+        raise ValueError(
+            f"Unknown payload codec {codec!r} (expected one of {sorted(PAYLOAD_CODECS)})"
+        )
+    if level is None:
+        level = PAYLOAD_CODECS[codec][1]
+    threads = threads or os.cpu_count() or 1
+
+    with _compressed_writer(dest, codec, level, threads) as stream:
+        with tarfile.open(fileobj=stream, mode="w|") as archive:
+            for arcname, path in files:
+                archive.add(path, arcname=arcname, recursive=False)
+
+
+def write_app_archive(
+    dest: IO[bytes],
+    repo_root: Path,
+    include_paths: PayloadManifest | Iterable[str],
+    codec: str = DEFAULT_PAYLOAD_CODEC,
+    level: int | None = None,
+    threads: int | None = None,
+) -> None:
+    """Stream the mux workspace as a compressed tarball into ``dest``.
+
+    The tar stream is compressed as it is produced, so the payload is never held
+    in memory. ``threads`` defaults to the host CPU count.
+    """
+    files = resolve_payload_files(repo_root, include_paths)
+    _write_archive_files(dest, files, codec, level, threads)
+
+
+def build_app_archive(
+    repo_root: Path, include_paths: PayloadManifest | Iterable[str]
+) -> bytes:
     """Pack the mux workspace into a gzipped tarball."""
     if not repo_root.exists():
         raise FileNotFoundError(f"mux repo root {repo_root} not found")
 
     buffer = io.BytesIO()
-    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
-        for relative_path in include_paths:
-            source = repo_root / relative_path
-            if not source.exists():
-                raise FileNotFoundError(f"Required file {source} missing")
-            archive.add(source, arcname=relative_path, recursive=True)
+    write_app_archive(buffer, repo_root, include_paths)
     return buffer.getvalue()
+
+
+def iter_payload_files(
+    repo_root: Path, include_paths: Iterable[str]
+) -> Iterator[tuple[str, Path]]:
+    """Yield (arcname, path) for every file the payload would contain, in order."""
+    for relative_path in include_paths:
+        source = repo_root / relative_path
+        if not source.exists():
+            raise FileNotFoundError(f"Required file {source} missing")
+        if not source.is_dir() or source.is_symlink():
+            yield relative_path, source
+            continue
+        for dirpath, dirnames, filenames in os.walk(source):
+            base = Path(dirpath)
+            # os.walk does not descend into symlinked directories; ship the link.
+            symlinked = [name for name in dirnames if (base / name).is_symlink()]
+            dirnames[:] = sorted(set(dirnames) - set(symlinked))
+            for filename in sorted([*filenames, *symlinked]):
+                path = base / filename
+                yield path.relative_to(repo_root).as_posix(), path
+
+
+def _is_excluded(arcname: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatch.fnmatchcase(arcname, pattern) for pattern in patterns)
+
+
+def _load_path_aliases(repo_root: Path) -> list[tuple[str, str]]:
+    """Read ``compilerOptions.paths`` wildcard aliases (``@/*`` -> ``src/*``)."""
+    try:
+        tsconfig = json.loads((repo_root / "tsconfig.json").read_text())
+    except (OSError, json.JSONDecodeError):
+        return []
+    aliases: list[tuple[str, str]] = []
+    paths = (tsconfig.get("compilerOptions") or {}).get("paths") or {}
+    for pattern, targets in paths.items():
+        if not pattern.endswith("*") or not targets:
+            continue
+        target = os.path.normpath(targets[0].rstrip("*"))
+        aliases.append((pattern[:-1], target + "/"))
+    return aliases
+
+
+def _resolve_import(
+    specifier: str,
+    importer: Path,
+    repo_root: Path,
+    aliases: list[tuple[str, str]],
+) -> Path | None:
+    if specifier.startswith("."):
+        base = importer.parent / specifier
+    else:
+        for prefix, target in aliases:
+            if specifier.startswith(prefix):
+                base = repo_root / (target + specifier[len(prefix) :])
+                break
+        else:
+            return None  # bare package import, resolved from node_modules
+
+    base = Path(os.path.normpath(base))
+    candidates = [base]
+    # TypeScript ESM sources import "./foo.js" for ./foo.ts.
+    if base.suffix in (".js", ".jsx", ".mjs", ".cjs"):
+        stem = base.with_suffix("")
+        candidates.extend(stem.with_name(stem.name + ext) for ext in _SCRIPT_SUFFIXES)
+    candidates.extend(base.with_name(base.name + ext) for ext in _RESOLVE_SUFFIXES)
+    candidates.extend(base / f"index{ext}" for ext in _RESOLVE_SUFFIXES)
+    return next((candidate for candidate in candidates if candidate.is_file()), None)
+
+
+def trace_imports(repo_root: Path, entrypoints: Iterable[str]) -> set[Path]:
+    """Return every repo file reachable from ``entrypoints`` through imports."""
+    repo_root = Path(os.path.normpath(repo_root.absolute()))
+    aliases = _load_path_aliases(repo_root)
+    pending: list[Path] = []
+    for entrypoint in entrypoints:
+        path = repo_root / entrypoint
+        if not path.is_file():
+            raise FileNotFoundError(f"Payload entry point {path} missing")
+        pending.append(path)
+
+    reachable: set[Path] = set()
+    while pending:
+        path = pending.pop()
+        if path in reachable:
+            continue
+        reachable.add(path)
+        if path.suffix not in _SCRIPT_SUFFIXES:
+            continue
+        source = path.read_text(errors="replace")
+        for specifier in _IMPORT_PATTERN.findall(source):
+            resolved = _resolve_import(specifier, path, repo_root, aliases)
+            if resolved is not None and resolved not in reachable:
+                pending.append(resolved)
+    return reachable
+
+
+def _candidate_payload_files(
+    repo_root: Path, manifest: PayloadManifest
+) -> list[tuple[str, Path]]:
+    files: dict[str, Path] = {}
+    for arcname, path in iter_payload_files(repo_root, manifest.include):
+        # Nested include entries (src and src/data) list the same file twice.
+        if arcname not in files and not _is_excluded(arcname, manifest.exclude):
+            files[arcname] = path
+    return list(files.items())
+
+
+def _prune_untraced(
+    repo_root: Path, manifest: PayloadManifest, files: list[tuple[str, Path]]
+) -> list[tuple[str, Path]]:
+    if not manifest.entrypoints:
+        return files
+
+    def _covering_include(arcname: str) -> str | None:
+        matches = [
+            include
+            for include in manifest.include
+            if arcname == include or arcname.startswith(include.rstrip("/") + "/")
+        ]
+        return max(matches, key=len) if matches else None
+
+    traced_roots = {
+        _covering_include(entrypoint) for entrypoint in manifest.entrypoints
+    }
+    reachable = trace_imports(repo_root, manifest.entrypoints)
+    root = Path(os.path.normpath(repo_root.absolute()))
+    return [
+        (arcname, path)
+        for arcname, path in files
+        if _covering_include(arcname) not in traced_roots or root / arcname in reachable
+    ]
+
+
+def resolve_payload_files(
+    repo_root: Path, include_paths: PayloadManifest | Iterable[str]
+) -> list[tuple[str, Path]]:
+    """List the (arcname, path) pairs shipped for a manifest or plain include list."""
+    manifest = _as_manifest(include_paths)
+    files = _candidate_payload_files(repo_root, manifest)
+    return _prune_untraced(repo_root, manifest, files)
+
+
+def _bundle_dependencies(repo_root: Path, externals: Iterable[str]) -> dict[str, str]:
+    """Pin the externals that are production dependencies to the host's versions."""
+    package_json = json.loads((repo_root / "package.json").read_text())
+    declared = package_json.get("dependencies") or {}
+    dependencies: dict[str, str] = {}
+    for name in externals:
+        if name not in declared:
+            continue
+        installed = repo_root / "node_modules" / name / "package.json"
+        try:
+            dependencies[name] = json.loads(installed.read_text())["version"]
+        except (OSError, json.JSONDecodeError, KeyError):
+            dependencies[name] = declared[name]
+    return dict(sorted(dependencies.items()))
+
+
+def build_cli_bundle(
+    repo_root: Path, out_dir: Path, spec: CliBundleSpec
+) -> list[tuple[str, Path]]:
+    """Compile the headless CLI with `bun build` and return the payload files.
+
+    Produces ``bundle/<entry>.js`` for each entry point plus a minimal
+    ``package.json`` listing only the externals the sandbox must install.
+    """
+    bun = shutil.which("bun")
+    if bun is None:
+        raise RuntimeError("bundled payload mode requires bun on the host")
+
+    bundle_dir = out_dir / BUNDLE_DIR
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    # `pkg/*` also keeps subpath imports such as `pkg/ffi` external.
+    external_flags = [
+        flag
+        for name in spec.externals
+        for flag in (f"--external={name}", f"--external={name}/*")
+    ]
+    for entrypoint in spec.entrypoints:
+        result = subprocess.run(
+            [
+                bun,
+                "build",
+                entrypoint,
+                "--target=bun",
+                f"--outdir={bundle_dir}",
+                *(["--minify"] if spec.minify else []),
+                *external_flags,
+            ],
+            cwd=repo_root,
+            env={**os.environ, "NODE_ENV": "production"},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"bun build {entrypoint} failed:\n{result.stderr or result.stdout}"
+            )
+
+    package_json = {
+        "name": "mux-cli-bundle",
+        "private": True,
+        "dependencies": _bundle_dependencies(repo_root, spec.externals),
+    }
+    (out_dir / "package.json").write_text(json.dumps(package_json, indent=2) + "\n")
+
+    return [
+        (path.relative_to(out_dir).as_posix(), path)
+        for path in sorted(out_dir.rglob("*"))
+        if path.is_file()
+    ]
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def format_payload_report(
+    files: Iterable[tuple[str, Path]], top: int = 15, depth: int = 3
+) -> str:
+    """Summarize payload size with the largest directories and files."""
+    file_sizes: dict[str, int] = {}
+    dir_sizes: dict[str, int] = {}
+    for arcname, path in files:
+        size = path.lstat().st_size
+        file_sizes[arcname] = size
+        parts = arcname.split("/")[:-1]
+        for i in range(1, min(len(parts), depth) + 1):
+            prefix = "/".join(parts[:i]) + "/"
+            dir_sizes[prefix] = dir_sizes.get(prefix, 0) + size
+
+    total = sum(file_sizes.values())
+    lines = [f"Payload: {len(file_sizes)} files, {_format_size(total)} uncompressed"]
+    for title, sizes in (
+        ("Largest directories", dir_sizes),
+        ("Largest files", file_sizes),
+    ):
+        if not sizes:
+            continue
+        lines.append(f"{title}:")
+        largest = sorted(sizes.items(), key=lambda item: item[1], reverse=True)
+        for name, size in largest[:top]:
+            lines.append(f"  {_format_size(size):>11}  {name}")
+    return "\n".join(lines)
+
+
+def _payload_stat_key(files: list[tuple[str, Path]], variant: str) -> str:
+    """Cheap fingerprint of the payload tree from (path, size, mtime, mode)."""
+    hasher = hashlib.sha256(variant.encode())
+    for arcname, path in files:
+        st = path.lstat()
+        hasher.update(
+            f"{arcname}\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_mode}\n".encode()
+        )
+    return hasher.hexdigest()
+
+
+def payload_content_digest(files: list[tuple[str, Path]], variant: str = "") -> str:
+    """Digest of the payload contents (paths, executable bits and file bytes).
+
+    ``variant`` distinguishes archives of the same tree built with different
+    codec settings.
+    """
+    hasher = hashlib.sha256(variant.encode())
+    for arcname, path in files:
+        st = path.lstat()
+        hasher.update(f"{arcname}\0{st.st_mode & 0o777:o}\0".encode())
+        if path.is_symlink():
+            hasher.update(f"-> {os.readlink(path)}".encode())
+        else:
+            with path.open("rb") as handle:
+                for chunk in iter(lambda: handle.read(1 << 20), b""):
+                    hasher.update(chunk)
+        hasher.update(b"\n")
+    return hasher.hexdigest()
+
+
+@contextmanager
+def _cache_lock(cache_dir: Path) -> Iterator[None]:
+    with (cache_dir / _CACHE_LOCK_FILE).open("a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_cache_state(cache_dir: Path) -> dict:
+    try:
+        return json.loads((cache_dir / _CACHE_STATE_FILE).read_text())
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _write_cache_state(cache_dir: Path, state: dict) -> None:
+    tmp_path = cache_dir / f"{_CACHE_STATE_FILE}.tmp"
+    tmp_path.write_text(json.dumps(state))
+    os.replace(tmp_path, cache_dir / _CACHE_STATE_FILE)
+
+
+def _touch(path: Path) -> None:
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _is_stale(entry: Path, now: float) -> bool:
+    try:
+        return now - entry.stat().st_mtime > _STALE_ENTRY_AGE_SEC
+    except OSError:
+        return False
+
+
+def _evict_stale_archives(cache_dir: Path, keep: Path) -> None:
+    """Remove archives other than ``keep`` that were retired long enough ago.
+
+    An archive's mtime is set when it is superseded, so one that a concurrent
+    setup read from the previous state survives until that upload is done.
+    """
+    suffixes = tuple(suffix for suffix, _ in PAYLOAD_CODECS.values())
+    now = time.time()
+    for entry in cache_dir.iterdir():
+        if entry == keep or not entry.name.endswith(suffixes):
+            continue
+        if _is_stale(entry, now):
+            entry.unlink(missing_ok=True)
+
+
+def _cached_archive(cache_dir: Path, state: dict) -> CachedArchive | None:
+    digest = state.get("digest")
+    suffix = state.get("suffix")
+    if not digest or not suffix:
+        return None
+    path = cache_dir / f"{digest}{suffix}"
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return None
+    return CachedArchive(path=path, digest=digest, size=size)
+
+
+def _get_or_build_archive(
+    cache_dir: Path,
+    stat_key: str,
+    suffix: str,
+    compute_digest: Callable[[], str],
+    build: Callable[[IO[bytes]], None],
+) -> CachedArchive:
+    """Content-addressed, lock-protected archive cache shared by all payloads.
+
+    ``stat_key`` is a cheap fingerprint checked before taking the lock;
+    ``compute_digest`` names the entry and only runs on a fingerprint miss.
+    Entries are world-readable (0644) so every user and process sharing the
+    cache can read and upload them. Each cache directory holds one current
+    entry; superseded entries are only evicted once they have been retired
+    for ``_STALE_ENTRY_AGE_SEC``, since nothing tracks which setups are still
+    uploading them. Rapid edits therefore leave one archive per edited tree
+    behind for up to that long.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    state = _read_cache_state(cache_dir)
+    if state.get("stat_key") == stat_key:
+        if cached := _cached_archive(cache_dir, state):
+            return cached
+
+    with _cache_lock(cache_dir):
+        # Another agent may have finished the build while we waited on the lock.
+        state = _read_cache_state(cache_dir)
+        if state.get("stat_key") == stat_key:
+            if cached := _cached_archive(cache_dir, state):
+                return cached
+
+        digest = compute_digest()
+        archive_path = cache_dir / f"{digest}{suffix}"
+        if not archive_path.is_file():
+            fd, tmp_name = tempfile.mkstemp(dir=cache_dir, prefix=".build-")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    build(handle)
+                # mkstemp creates the file 0600.
+                os.chmod(tmp_name, 0o644)
+                os.replace(tmp_name, archive_path)
+            except BaseException:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
+
+        if (previous := _cached_archive(cache_dir, state)) and (
+            previous.path != archive_path
+        ):
+            _touch(previous.path)  # Start its retirement clock
+        _write_cache_state(
+            cache_dir, {"stat_key": stat_key, "digest": digest, "suffix": suffix}
+        )
+        _evict_stale_archives(cache_dir, keep=archive_path)
+        return CachedArchive(
+            path=archive_path, digest=digest, size=archive_path.stat().st_size
+        )
+
+
+def _codec_settings(codec: str, level: int | None) -> tuple[str, int]:
+    if codec not in PAYLOAD_CODECS:
+        raise ValueError(
+            f"Unknown payload codec {codec!r} (expected one of {sorted(PAYLOAD_CODECS)})"
+        )
+    suffix, default_level = PAYLOAD_CODECS[codec]
+    return suffix, default_level if level is None else level
+
+
+def get_cached_app_archive(
+    repo_root: Path,
+    include_paths: PayloadManifest | Iterable[str],
+    cache_dir: Path | None = None,
+    codec: str = DEFAULT_PAYLOAD_CODEC,
+    level: int | None = None,
+    threads: int | None = None,
+    bundle: CliBundleSpec | None = None,
+) -> CachedArchive:
+    """Return the payload archive for the current tree, building it at most once.
+
+    Entries are content-addressed by :func:`payload_content_digest`. A stat
+    fingerprint of the tree is stored next to the current entry so unchanged
+    trees skip rehashing. Builds are serialized with a file lock, so concurrent
+    agents (and processes) wait for the first builder and reuse its output.
+    Archives for older trees are evicted once they have been superseded for
+    ``_STALE_ENTRY_AGE_SEC``.
+
+    With ``bundle`` set, the archive holds the pre-bundled CLI from
+    :func:`build_cli_bundle` instead of the source tree; the manifest then only
+    decides which source edits invalidate the cached bundle.
+    """
+    if not repo_root.exists():
+        raise FileNotFoundError(f"mux repo root {repo_root} not found")
+
+    suffix, level = _codec_settings(codec, level)
+    manifest = _as_manifest(include_paths)
+    variant = f"{codec}:{level}:{manifest.key}"
+    if bundle is not None:
+        variant += f":bundle:{bundle.key}"
+
+    cache_dir = cache_dir or PAYLOAD_CACHE_DIR
+
+    # The stat key covers every candidate file (before import tracing), so any
+    # edit that could change the traced set also invalidates the fast path.
+    candidates = _candidate_payload_files(repo_root, manifest)
+    stat_key = _payload_stat_key(candidates, variant)
+    files: list[tuple[str, Path]] = []
+
+    def compute_digest() -> str:
+        files.extend(_prune_untraced(repo_root, manifest, candidates))
+        return payload_content_digest(files, variant)
+
+    def build(handle: IO[bytes]) -> None:
+        if bundle is None:
+            _write_archive_files(handle, files, codec, level, threads)
+            return
+        with tempfile.TemporaryDirectory(dir=cache_dir, prefix=".bundle-") as build_dir:
+            bundle_files = build_cli_bundle(repo_root, Path(build_dir), bundle)
+            _write_archive_files(handle, bundle_files, codec, level, threads)
+
+    return _get_or_build_archive(cache_dir, stat_key, suffix, compute_digest, build)
+
+
+def host_platform() -> str:
+    """This host's platform in snapshot naming (``linux-x64``, ``darwin-arm64``)."""
+    machine = os.uname().machine.lower()
+    cpu = {"x86_64": "x64", "amd64": "x64", "aarch64": "arm64"}.get(machine, machine)
+    return f"{sys.platform}-{cpu}"
+
+
+def build_deps_snapshot(repo_root: Path, out_dir: Path, platform: str) -> Path:
+    """Install production node_modules for ``platform`` into ``out_dir``.
+
+    Runs the same ``bun install --production --frozen-lockfile`` as
+    mux_setup.sh.j2, but once on the host, and stamps the result with
+    ``platform``. Install scripts compile native addons for the machine they
+    run on, so ``platform`` must be the host's own.
+    """
+    if platform != host_platform():
+        raise RuntimeError(
+            f"cannot build a {platform} node_modules snapshot on {host_platform()}: "
+            "install scripts build native addons for the host"
+        )
+    bun = shutil.which("bun")
+    if bun is None:
+        raise RuntimeError("node_modules snapshots require bun on the host")
+
+    for relative_path in _DEPS_SNAPSHOT_INPUTS:
+        source = repo_root / relative_path
+        if source.exists():
+            target = out_dir / relative_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+
+    result = subprocess.run(
+        [bun, "install", "--production", "--frozen-lockfile"],
+        cwd=out_dir,
+        env={**os.environ, "MUX_HEADLESS": "1"},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"bun install for node_modules snapshot failed:\n{result.stderr or result.stdout}"
+        )
+    node_modules = out_dir / "node_modules"
+    (node_modules / DEPS_PLATFORM_STAMP).write_text(f"{platform}\n")
+    return node_modules
+
+
+def get_cached_deps_snapshot(
+    repo_root: Path,
+    cache_dir: Path | None = None,
+    platform: str = DEFAULT_DEPS_PLATFORM,
+    codec: str = DEFAULT_PAYLOAD_CODEC,
+    level: int | None = None,
+    threads: int | None = None,
+) -> CachedArchive:
+    """Return a cached production node_modules archive keyed by bun.lock.
+
+    The archive extracts to ``node_modules/`` in the app root, so setup can skip
+    ``bun install`` entirely. It lives in its own cache subdirectory and is
+    rebuilt only when the lockfile, package.json or target platform change.
+    """
+    suffix, level = _codec_settings(codec, level)
+    cache_dir = (cache_dir or PAYLOAD_CACHE_DIR) / "deps"
+    inputs = [
+        (relative_path, repo_root / relative_path)
+        for relative_path in _DEPS_SNAPSHOT_INPUTS
+        if (repo_root / relative_path).exists()
+    ]
+    # The stamp name is part of the key so unstamped snapshots are rebuilt.
+    variant = f"deps:{platform}:{codec}:{level}:{DEPS_PLATFORM_STAMP}"
+    stat_key = _payload_stat_key(inputs, variant)
+
+    def build(handle: IO[bytes]) -> None:
+        with tempfile.TemporaryDirectory(dir=cache_dir, prefix=".deps-") as build_dir:
+            node_modules = build_deps_snapshot(repo_root, Path(build_dir), platform)
+            files = iter_payload_files(node_modules.parent, ["node_modules"])
+            _write_archive_files(handle, files, codec, level, threads)
+
+    return _get_or_build_archive(
+        cache_dir,
+        stat_key,
+        suffix,
+        lambda: payload_content_digest(inputs, variant),
+        build,
+    )
+
+
+def _link_or_copy(source: Path, dest: Path) -> None:
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
+
+def stage_payload_bundle(
+    files: Mapping[str, Path], cache_dir: Path | None = None
+) -> Path:
+    """Collect the files one setup uploads into a single shared directory.
+
+    ``files`` maps upload names to host paths. The directory is keyed by the
+    files' stat fingerprint, so concurrent agents share one bundle and each
+    sandbox receives it with a single ``upload_dir`` call. Files are hardlinked
+    from the archive cache (copied when that crosses filesystems). Each call
+    refreshes the directory's mtime while holding the staging lock, and
+    bundles unused for ``_STALE_ENTRY_AGE_SEC`` are removed under that lock.
+    """
+    staging_root = (cache_dir or PAYLOAD_CACHE_DIR) / "staging"
+    staging_root.mkdir(parents=True, exist_ok=True)
+    key = _payload_stat_key(sorted(files.items()), "staging")[:16]
+    bundle_dir = staging_root / key
+
+    with _cache_lock(staging_root):
+        # Touch and check under the lock eviction takes, so a bundle found
+        # here cannot be removed before this setup uploads it.
+        _touch(bundle_dir)
+        if bundle_dir.is_dir():
+            return bundle_dir
+        tmp_dir = Path(tempfile.mkdtemp(dir=staging_root, prefix=".stage-"))
+        try:
+            for name, source in files.items():
+                _link_or_copy(source, tmp_dir / name)
+            os.replace(tmp_dir, bundle_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        now = time.time()
+        for entry in staging_root.iterdir():
+            if entry.is_dir() and entry != bundle_dir and _is_stale(entry, now):
+                shutil.rmtree(entry, ignore_errors=True)
+    return bundle_dir
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Report what the Terminal-Bench mux payload would contain"
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        help="Payload manifest JSON (default: the full MuxAgent include list)",
+    )
+    parser.add_argument(
+        "--repo-root",
+        type=Path,
+        default=Path(__file__).resolve().parents[2],
+        help="mux repo root (default: this checkout)",
+    )
+    parser.add_argument(
+        "--top", type=int, default=15, help="Number of largest paths to list"
+    )
+    args = parser.parse_args()
+
+    manifest = (
+        PayloadManifest.load(args.manifest)
+        if args.manifest
+        else PayloadManifest(include=DEFAULT_INCLUDE_PATHS)
+    )
+    # Build outputs like dist/ may not exist in a fresh checkout; report the rest.
+    include = tuple(p for p in manifest.include if (args.repo_root / p).exists())
+    if missing := sorted(set(manifest.include) - set(include)):
+        print(f"Skipping missing paths: {', '.join(missing)}", file=sys.stderr)
+    manifest = PayloadManifest(
+        include=include, exclude=manifest.exclude, entrypoints=manifest.entrypoints
+    )
+    files = resolve_payload_files(args.repo_root, manifest)
+    print(format_payload_report(files, top=args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
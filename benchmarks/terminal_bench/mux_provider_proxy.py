@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Record/replay HTTP proxy between the mux CLI and its model providers.
+
+mux-run.sh starts this on localhost when MUX_PROVIDER_PROXY is set and points
+``ANTHROPIC_BASE_URL``, ``OPENAI_BASE_URL`` and ``GOOGLE_BASE_URL`` at it
+(``http://127.0.0.1:<port>/<provider>``).
+
+``record`` forwards each request to the real provider and streams the reply
+back unchanged while appending the exchange (status, content type and every
+response chunk with its offset from the request) to a JSONL cassette.
+``replay`` never touches the network: the Nth request to a provider path gets
+the Nth recorded reply for that path, either with the original chunk timing
+or with no delay at all. Request bodies are only hashed, so a replay that
+diverges from the recording is counted rather than refused.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import IO, Any
+
+PROVIDER_CASSETTE_FILE = "provider-cassette.jsonl"
+PROVIDER_PROXY_STATS_FILE = "provider-proxy.json"
+PROXY_MODES = ("record", "replay")
+REPLAY_LATENCIES = ("original", "zero")
+
+# Upstream base URLs when the caller did not override them. mux appends /v1
+# to the Anthropic base URL itself, so requests arrive as /anthropic/v1/...
+# and the Anthropic upstream is the API root (see _upstream_base).
+DEFAULT_UPSTREAMS = {
+    "anthropic": ("ANTHROPIC_BASE_URL", "https://api.anthropic.com"),
+    "openai": ("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    "google": ("GOOGLE_BASE_URL", "https://generativelanguage.googleapis.com/v1beta"),
+}
+
+# Hop-by-hop and framing headers the proxy sets itself.
+_SKIPPED_REQUEST_HEADERS = {
+    "host",
+    "content-length",
+    "connection",
+    "accept-encoding",
+    "transfer-encoding",
+}
+_CHUNK_BYTES = 16 << 10
+
+
+def _encode_chunk(data: bytes) -> dict[str, str]:
+    try:
+        return {"text": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(data).decode("ascii")}
+
+
+def _decode_chunk(chunk: dict[str, str]) -> bytes:
+    if "b64" in chunk:
+        return base64.b64decode(chunk["b64"])
+    return chunk.get("text", "").encode("utf-8")
+
+
+def load_cassette(lines: Iterable[str]) -> dict[tuple[str, str], deque[dict[str, Any]]]:
+    """Recorded exchanges queued per (method, path), in recording order."""
+    exchanges: dict[tuple[str, str], deque[dict[str, Any]]] = defaultdict(deque)
+    for line in lines:
+        try:
+            exchange = json.loads(line)
+        except ValueError:
+            continue  # Truncated last line from a killed recording
+        exchanges[(exchange["method"], exchange["path"])].append(exchange)
+    return exchanges
+
+
+class ProviderProxy(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        mode: str,
+        cassette: Path,
+        latency: str = "original",
+        upstreams: dict[str, str] | None = None,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), _ProxyHandler)
+        self.mode = mode
+        self.latency = latency
+        self.upstreams = upstreams or {}
+        self._lock = threading.Lock()
+        self._recorder: IO[str] | None = None
+        self._replay: dict[tuple[str, str], deque[dict[str, Any]]] = {}
+        if mode == "record":
+            self._recorder = cassette.open("a", encoding="utf-8")
+        else:
+            self._replay = load_cassette(cassette.read_text().splitlines())
+        self.stats = {
+            "mode": mode,
+            "latency": latency if mode == "replay" else None,
+            "n_requests": 0,
+            "n_recorded": 0,
+            "n_replayed": 0,
+            "n_misses": 0,
+            "n_body_mismatches": 0,
+            "n_upstream_errors": 0,
+        }
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def record(self, exchange: dict[str, Any]) -> None:
+        assert self._recorder is not None
+        with self._lock:
+            self._recorder.write(json.dumps(exchange) + "\n")
+            self._recorder.flush()
+            self.stats["n_recorded"] += 1
+
+    def next_replay(self, method: str, path: str) -> dict[str, Any] | None:
+        with self._lock:
+            queue = self._replay.get((method, path))
+            return queue.popleft() if queue else None
+
+    def close(self) -> None:
+        if self._recorder is not None:
+            self._recorder.close()
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    server: ProviderProxy
+
+    def do_GET(self) -> None:
+        self._handle()
+
+    def do_POST(self) -> None:
+        self._handle()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # The stats file summarizes traffic
+
+    def _handle(self) -> None:
+        self.server.count("n_requests")
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if self.server.mode == "record":
+            self._record(body)
+        else:
+            self._replay(body)
+
+    def _record(self, body: bytes) -> None:
+        provider, _, rest = self.path.lstrip("/").partition("/")
+        upstream = self.server.upstreams.get(provider)
+        if upstream is None:
+            self.send_error(404, f"unknown provider {provider!r}")
+            return
+        headers = {
+            key: value
+            for key, value in self.headers.items()
+            if key.lower() not in _SKIPPED_REQUEST_HEADERS
+        }
+        request = urllib.request.Request(
+            f"{upstream.rstrip('/')}/{rest}",
+            data=body if self.command != "GET" else None,
+            headers=headers,
+            method=self.command,
+        )
+        started = time.monotonic()
+        try:
+            response = urllib.request.urlopen(request, timeout=600)
+        except urllib.error.HTTPError as exc:
+            response = exc  # Provider errors are part of the recording
+        except OSError as exc:
+            self.server.count("n_upstream_errors")
+            self.send_error(502, f"upstream error: {exc}")
+            return
+
+        content_type = response.headers.get("Content-Type", "application/json")
+        self.send_response(response.status)
+        self.send_header("Content-Type", content_type)
+        self.end_headers()
+        chunks = []
+        # read1 returns whatever arrived, so streamed events keep their timing.
+        read = getattr(response, "read1", response.read)
+        with response:
+            while data := read(_CHUNK_BYTES):
+                chunks.append(
+                    {"t": round(time.monotonic() - started, 4), **_encode_chunk(data)}
+                )
+                self.wfile.write(data)
+                self.wfile.flush()
+        self.server.record(
+            {
+                "method": self.command,
+                "path": self.path,
+                "request_sha256": hashlib.sha256(body).hexdigest(),
+                "status": response.status,
+                "content_type": content_type,
+                "chunks": chunks,
+            }
+        )
+
+    def _replay(self, body: bytes) -> None:
+        exchange = self.server.next_replay(self.command, self.path)
+        if exchange is None:
+            self.server.count("n_misses")
+            # 4xx so the SDKs fail fast instead of retrying a missing reply.
+            self.send_error(404, f"no recorded response for {self.command} {self.path}")
+            return
+        if exchange.get("request_sha256") != hashlib.sha256(body).hexdigest():
+            self.server.count("n_body_mismatches")
+        self.send_response(exchange["status"])
+        self.send_header("Content-Type", exchange["content_type"])
+        self.end_headers()
+        started = time.monotonic()
+        for chunk in exchange["chunks"]:
+            if self.server.latency == "original":
+                delay = chunk["t"] - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            self.wfile.write(_decode_chunk(chunk))
+            self.wfile.flush()
+        self.server.count("n_replayed")
+
+
+def _upstream_base(provider: str, url: str) -> str:
+    """Base URL the proxied request path is appended to.
+
+    An Anthropic base URL may be given with or without /v1 (mux accepts
+    both), but the path mux sends already starts with /v1, so drop it here.
+    """
+    url = url.rstrip("/")
+    if provider == "anthropic":
+        url = url.removesuffix("/v1")
+    return url
+
+
+def add_local_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """``--port-file`` and ``--stats`` for a server mux-run.sh starts locally."""
+    parser.add_argument(
+        "--port-file", type=Path, required=True, help="Written once listening"
+    )
+    parser.add_argument("--stats", type=Path, help="Traffic summary written on exit")
+
+
+def serve_until_signalled(
+    server: ThreadingHTTPServer,
+    port_file: Path,
+    stats_file: Path | None,
+    stats_fn: Callable[[], dict[str, Any]],
+) -> None:
+    """Serve until SIGTERM/SIGHUP, then write ``stats_fn()`` to ``stats_file``.
+
+    The port goes to ``port_file`` atomically once the server is listening,
+    which is what mux-run.sh's start_local_server waits for.
+    """
+
+    def on_signal(_signum: int, _frame: object) -> None:
+        # shutdown() blocks until serve_forever returns, so run it elsewhere.
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGHUP, on_signal)
+
+    tmp_port_file = port_file.with_name(f".{port_file.name}.tmp")
+    tmp_port_file.write_text(str(server.server_address[1]))
+    os.replace(tmp_port_file, port_file)
+    try:
+        server.serve_forever()
+    finally:
+        if stats_file is not None:
+            stats_file.write_text(json.dumps(stats_fn(), indent=2) + "\n")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--mode", choices=PROXY_MODES, required=True)
+    parser.add_argument("--cassette", type=Path, required=True)
+    parser.add_argument("--latency", choices=REPLAY_LATENCIES, default="original")
+    add_local_server_arguments(parser)
+    args = parser.parse_args(argv)
+
+    upstreams = {
+        provider: _upstream_base(provider, os.environ.get(env_key) or default)
+        for provider, (env_key, default) in DEFAULT_UPSTREAMS.items()
+    }
+    proxy = ProviderProxy(args.mode, args.cassette, args.latency, upstreams)
+    try:
+        serve_until_signalled(proxy, args.port_file, args.stats, lambda: proxy.stats)
+    finally:
+        proxy.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Resource sampling and exit classification for mux sessions in the sandbox.
+
+``sample`` appends one JSON line every ``--interval`` seconds with the RSS and
+CPU use of a process tree (the agent command and everything it spawned, not
+the log capture, token tap or sampler beside it) and the cgroup's
+memory.current / memory.max, until the root process exits or the sampler is
+terminated. ``summarize`` reduces that series to peak RSS and peak cgroup
+memory and classifies the session's exit: ``timeout`` (exit 124 from
+``timeout``), ``oom`` (cgroup OOM kills during the run), ``killed`` (137 without
+an OOM event), ``error`` or ``ok``. ``tune`` prints Bun/JavaScriptCore
+settings sized to the cgroup's memory limit and CPU quota as shell exports.
+
+The host imports ``summarize_samples`` to summarize a series whose run was
+cancelled before mux-run.sh could.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import signal
+import sys
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+RESOURCE_SAMPLES_FILE = "resources.jsonl"
+RESOURCE_SUMMARY_FILE = "resources.json"
+
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+# cgroup v1 reports "no limit" as a huge page-aligned number.
+_CGROUP_V1_UNLIMITED = 1 << 62
+
+
+def _read_int(path: Path) -> int | None:
+    try:
+        raw = path.read_text().strip()
+    except OSError:
+        return None
+    if raw == "max":
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        return None
+
+
+def _read_keyed(path: Path, key: str) -> int | None:
+    try:
+        for line in path.read_text().splitlines():
+            name, _, value = line.partition(" ")
+            if name == key:
+                return int(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_cgroup_memory() -> dict[str, int | None]:
+    """Current usage, limit, peak and OOM-kill count of this cgroup (v2 or v1)."""
+    if (_CGROUP_ROOT / "memory.current").exists():
+        return {
+            "current": _read_int(_CGROUP_ROOT / "memory.current"),
+            "max": _read_int(_CGROUP_ROOT / "memory.max"),
+            "peak": _read_int(_CGROUP_ROOT / "memory.peak"),
+            "oom_kill": _read_keyed(_CGROUP_ROOT / "memory.events", "oom_kill"),
+        }
+    v1 = _CGROUP_ROOT / "memory"
+    limit = _read_int(v1 / "memory.limit_in_bytes")
+    return {
+        "current": _read_int(v1 / "memory.usage_in_bytes"),
+        "max": None if limit is None or limit >= _CGROUP_V1_UNLIMITED else limit,
+        "peak": _read_int(v1 / "memory.max_usage_in_bytes"),
+        "oom_kill": _read_keyed(v1 / "memory.oom_control", "oom_kill"),
+    }
+
+
+def read_cgroup_cpus() -> float | None:
+    """CPUs allowed by this cgroup's CFS quota (v2 or v1), or None if unlimited."""
+    try:
+        quota, _, period = (_CGROUP_ROOT / "cpu.max").read_text().partition(" ")
+        if quota.strip() == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    v1 = _CGROUP_ROOT / "cpu"
+    quota_us = _read_int(v1 / "cpu.cfs_quota_us")
+    period_us = _read_int(v1 / "cpu.cfs_period_us")
+    if quota_us is None or quota_us <= 0 or not period_us:
+        return None
+    return quota_us / period_us
+
+
+# Share of the cgroup limit the JS heap heuristics may assume; the rest is
+# left to the tools and processes the agent spawns in the same cgroup.
+_HEAP_SHARE = 0.6
+# Below this limit, Bun's --smol mode (more frequent GC) is enabled.
+_SMOL_BELOW_BYTES = 2 << 30
+
+
+def runtime_tuning(memory_max: int | None, cpus: float | None) -> dict[str, str]:
+    """Bun/JavaScriptCore settings sized to a memory limit and CPU budget.
+
+    JSC derives its GC thresholds from the host's RAM, not the container's,
+    so ``forceRAMSize`` makes it collect before the cgroup OOM-kills the
+    session. GC marker and JIT compiler threads follow the CPU quota rather
+    than the host's core count.
+    """
+    settings: dict[str, str] = {}
+    if memory_max is not None:
+        settings["BUN_JSC_forceRAMSize"] = str(int(memory_max * _HEAP_SHARE))
+        if memory_max < _SMOL_BELOW_BYTES:
+            settings["MUX_BUN_SMOL"] = "1"
+    available = len(os.sched_getaffinity(0))
+    if cpus is not None:
+        available = min(available, max(math.ceil(cpus), 1))
+    settings["BUN_JSC_numberOfGCMarkers"] = str(available)
+    settings["BUN_JSC_numberOfDFGCompilerThreads"] = str(max(available // 2, 1))
+    settings["BUN_JSC_numberOfFTLCompilerThreads"] = str(max(available // 2, 1))
+    return settings
+
+
+def _process_table() -> dict[int, tuple[int, int, int]]:
+    """pid -> (ppid, rss_pages, cpu_ticks) for every visible process."""
+    table: dict[int, tuple[int, int, int]] = {}
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat") as handle:
+                stat = handle.read()
+        except OSError:
+            continue  # Exited between scandir and open
+        # comm (field 2) may contain spaces; the rest follows the last ')'.
+        fields = stat[stat.rfind(")") + 2 :].split()
+        ppid, rss_pages = int(fields[1]), int(fields[21])
+        table[int(entry.name)] = (ppid, rss_pages, int(fields[11]) + int(fields[12]))
+    return table
+
+
+def sample_tree(root_pid: int, exclude: int) -> tuple[int, int, int]:
+    """(rss_bytes, cpu_ticks, n_procs) summed over ``root_pid`` and descendants."""
+    table = _process_table()
+    children: dict[int, list[int]] = {}
+    for pid, (ppid, _, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    rss_pages = cpu_ticks = n_procs = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        if pid == exclude or pid not in table:
+            continue
+        _, rss, ticks = table[pid]
+        rss_pages += rss
+        cpu_ticks += ticks
+        n_procs += 1
+        pending.extend(children.get(pid, ()))
+    return rss_pages * os.sysconf("SC_PAGE_SIZE"), cpu_ticks, n_procs
+
+
+def wait_for_pid_file(pid_file: Path, poll_sec: float = 0.05) -> int:
+    """Block until ``pid_file`` holds a pid written by the process to sample."""
+    while True:
+        try:
+            return int(pid_file.read_text().strip())
+        except (OSError, ValueError):
+            time.sleep(poll_sec)
+
+
+def run_sampler(root_pid: int, out: Path, interval: float) -> None:
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    started = time.monotonic()
+    stopping = False
+
+    def on_signal(_signum: int, _frame: object) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGHUP, on_signal)
+
+    with out.open("a", buffering=1) as handle:
+        cgroup = read_cgroup_memory()
+        start = {
+            "type": "start",
+            "cpu_count": os.cpu_count(),
+            "cgroup_memory_max": cgroup["max"],
+            "cgroup_oom_kill": cgroup["oom_kill"],
+        }
+        handle.write(json.dumps(start) + "\n")
+        last_ticks: int | None = None
+        last_time = started
+        while not stopping:
+            now = time.monotonic()
+            rss, ticks, n_procs = sample_tree(root_pid, exclude=os.getpid())
+            if n_procs == 0:
+                break  # Root process is gone
+            cpu_pct = None
+            if last_ticks is not None and now > last_time:
+                # Exited children drop out of the sum; clamp instead of going
+                # negative.
+                cpu_sec = max(ticks - last_ticks, 0) / clock_ticks
+                cpu_pct = cpu_sec / (now - last_time) * 100
+            last_ticks, last_time = ticks, now
+            cgroup = read_cgroup_memory()
+            record = {
+                "type": "sample",
+                "t": round(now - started, 3),
+                "rss": rss,
+                "cpu_pct": None if cpu_pct is None else round(cpu_pct, 1),
+                "n_procs": n_procs,
+                "cgroup_memory": cgroup["current"],
+                "cgroup_memory_max": cgroup["max"],
+            }
+            handle.write(json.dumps(record) + "\n")
+            deadline = now + interval
+            while not stopping and time.monotonic() < deadline:
+                time.sleep(min(0.25, interval))
+
+
+def classify_exit(exit_code: int | None, oom_kills: int) -> str:
+    if oom_kills > 0:
+        return "oom"
+    if exit_code is None:
+        return "unknown"
+    if exit_code == 124:
+        return "timeout"
+    if exit_code == 137:
+        return "killed"
+    return "ok" if exit_code == 0 else "error"
+
+
+def summarize_samples(
+    lines: Iterable[str],
+    exit_code: int | None = None,
+    cgroup: dict[str, int | None] | None = None,
+) -> dict[str, Any]:
+    """Reduce a sample series to peaks and an exit classification.
+
+    ``cgroup`` is a final :func:`read_cgroup_memory` reading; without it (on
+    the host) OOM kills are unknown and only the sampled series is used.
+    """
+    start: dict[str, Any] = {}
+    peak_rss = peak_cgroup = n_samples = 0
+    peak_cpu = 0.0
+    duration = 0.0
+    memory_max = None
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue  # Truncated last line from a killed sampler
+        if record.get("type") == "start":
+            start = record
+            memory_max = record.get("cgroup_memory_max")
+        elif record.get("type") == "sample":
+            n_samples += 1
+            peak_rss = max(peak_rss, record.get("rss") or 0)
+            peak_cgroup = max(peak_cgroup, record.get("cgroup_memory") or 0)
+            peak_cpu = max(peak_cpu, record.get("cpu_pct") or 0.0)
+            duration = max(duration, record.get("t") or 0.0)
+            memory_max = record.get("cgroup_memory_max", memory_max)
+
+    oom_kills = 0
+    if cgroup is not None:
+        if cgroup.get("peak"):
+            peak_cgroup = max(peak_cgroup, cgroup["peak"] or 0)
+        before = start.get("cgroup_oom_kill")
+        after = cgroup.get("oom_kill")
+        if before is not None and after is not None:
+            oom_kills = max(after - before, 0)
+
+    return {
+        "exit_code": exit_code,
+        "exit_classification": classify_exit(exit_code, oom_kills),
+        "oom_kills": oom_kills if cgroup is not None else None,
+        "peak_rss_bytes": peak_rss or None,
+        "peak_cgroup_memory_bytes": peak_cgroup or None,
+        "cgroup_memory_max_bytes": memory_max,
+        "peak_cpu_pct": peak_cpu or None,
+        "cpu_count": start.get("cpu_count"),
+        "n_samples": n_samples,
+        "sampled_sec": duration,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sample = subparsers.add_parser("sample", help="Sample a process tree until exit")
+    sample.add_argument("out", type=Path)
+    root = sample.add_mutually_exclusive_group(required=True)
+    root.add_argument("--root-pid", type=int)
+    root.add_argument(
+        "--root-pid-file",
+        type=Path,
+        help="Wait for the root process to write its pid here, then sample it",
+    )
+    sample.add_argument("--interval", type=float, default=2.0)
+
+    summarize = subparsers.add_parser("summarize", help="Summarize a sample series")
+    summarize.add_argument("samples", type=Path)
+    summarize.add_argument("summary", type=Path)
+    summarize.add_argument("--exit-code", type=int, required=True)
+
+    subparsers.add_parser("tune", help="Print runtime settings as shell exports")
+
+    args = parser.parse_args(argv)
+    if args.command == "tune":
+        tuning = runtime_tuning(read_cgroup_memory()["max"], read_cgroup_cpus())
+        for key, value in tuning.items():
+            # Settings the caller already exported win.
+            if key not in os.environ:
+                print(f"export {key}={value}")
+        return 0
+    if args.command == "sample":
+        root_pid = args.root_pid
+        if root_pid is None:
+            root_pid = wait_for_pid_file(args.root_pid_file)
+        run_sampler(root_pid, args.out, args.interval)
+        return 0
+
+    try:
+        lines = args.samples.read_text().splitlines()
+    except OSError:
+        lines = []
+    summary = summarize_samples(lines, args.exit_code, read_cgroup_memory())
+    args.summary.write_text(json.dumps(summary, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Cold/warm start-up probe for the headless mux CLI inside the sandbox.
+
+mux-run.sh calls this before the real session when MUX_STARTUP_PROBE_RUNS is
+set. Each run starts the CLI (``bun <entry> --json``) on a throwaway project
+with a no-op prompt against a stub Ollama server on localhost, so no real
+provider is contacted, and records:
+
+- ``first_request_sec``: until the CLI's first request reaches the stub
+  (runtime start, module loading and session set-up)
+- ``first_event_sec``: until the first JSONL event on stdout
+- ``exit_sec``: until the process exits
+
+The first run is cold (fresh transpile cache and module graph), the rest are
+warm. With ``--runs 1`` it doubles as the warmup stage (MUX_WARMUP) that fills
+those caches before the timed run. Runs inside the sandbox with whatever
+python3 the task image ships, so it sticks to the standard library.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+STARTUP_PROBE_FILE = "startup-probe.json"
+PROBE_MODEL = "ollama:mux-startup-probe"
+PROBE_PROMPT = "Reply with the single word: ok"
+_PROBE_METRICS = ("first_request_sec", "first_event_sec", "exit_sec")
+
+
+class _StubOllamaHandler(BaseHTTPRequestHandler):
+    """Answers every /api/chat call with a one-word, single-turn reply."""
+
+    server: StubOllamaServer
+
+    def do_POST(self) -> None:
+        self.server.note_request()
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+        if not self.path.rstrip("/").endswith("/chat"):
+            self.send_error(404)
+            return
+        model = body.get("model", "mux-startup-probe")
+        created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        done = {
+            "model": model,
+            "created_at": created_at,
+            "message": {"role": "assistant", "content": "ok"},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": 1,
+            "eval_count": 1,
+        }
+        if body.get("stream") is False:
+            payload = json.dumps(done).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        chunks = [
+            {**done, "done": False, "done_reason": None},
+            {**done, "message": {"role": "assistant", "content": ""}},
+        ]
+        payload = "".join(f"{json.dumps(chunk)}\n" for chunk in chunks).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # Keep the probe quiet; mux-run.sh logs the summary
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _StubOllamaHandler)
+        self._lock = threading.Lock()
+        self.first_request_at: float | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api"
+
+    def note_request(self) -> None:
+        with self._lock:
+            if self.first_request_at is None:
+                self.first_request_at = time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.first_request_at = None
+
+
+def probe_once(
+    cli: Sequence[str],
+    server: StubOllamaServer,
+    mux_root: Path,
+    project_dir: Path,
+    timeout: float,
+) -> dict[str, Any]:
+    """Time one CLI start against the stub server."""
+    server.reset()
+    env = {**os.environ, "MUX_ROOT": str(mux_root)}
+    command = [*cli, "--dir", str(project_dir), "--model", PROBE_MODEL, "--json"]
+    started = time.monotonic()
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+    killer = threading.Timer(timeout, process.kill)
+    killer.start()
+    first_event_at = None
+    try:
+        assert process.stdin is not None and process.stdout is not None
+        process.stdin.write(PROBE_PROMPT.encode())
+        process.stdin.close()
+        for line in process.stdout:
+            if first_event_at is None and line.strip():
+                first_event_at = time.monotonic()
+        return_code = process.wait()
+    finally:
+        killer.cancel()
+    exited_at = time.monotonic()
+
+    def since_start(at: float | None) -> float | None:
+        return None if at is None else round(at - started, 3)
+
+    return {
+        "first_request_sec": since_start(server.first_request_at),
+        "first_event_sec": since_start(first_event_at),
+        "exit_sec": since_start(exited_at),
+        "exit_code": return_code,
+        "timed_out": exited_at - started >= timeout,
+    }
+
+
+def summarize_probe(runs: Sequence[dict[str, Any]]) -> dict[str, Any]:
+    """Cold numbers from the first run and warm medians over the rest."""
+    summary: dict[str, Any] = {"n_runs": len(runs)}
+    for metric in _PROBE_METRICS:
+        summary[f"cold_{metric}"] = runs[0].get(metric) if runs else None
+        warm = [run[metric] for run in runs[1:] if run.get(metric) is not None]
+        summary[f"warm_{metric}"] = round(statistics.median(warm), 3) if warm else None
+    summary["n_failed"] = sum(1 for run in runs if run.get("exit_code") != 0)
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("out", type=Path)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--timeout", type=float, default=60.0, help="Seconds allowed per run"
+    )
+    parser.add_argument("cli", nargs=argparse.REMAINDER, help="-- bun <entry>")
+    args = parser.parse_args(argv)
+    cli = args.cli[1:] if args.cli[:1] == ["--"] else args.cli
+    if not cli:
+        parser.error("the CLI command is required after --")
+
+    server = StubOllamaServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    runs = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="mux-startup-probe-") as tmp:
+            mux_root = Path(tmp) / "mux"
+            project_dir = Path(tmp) / "project"
+            mux_root.mkdir()
+            project_dir.mkdir()
+            (mux_root / "providers.jsonc").write_text(
+                json.dumps({"ollama": {"baseUrl": server.base_url}})
+            )
+            for _ in range(max(args.runs, 1)):
+                runs.append(
+                    probe_once(cli, server, mux_root, project_dir, args.timeout)
+                )
+    finally:
+        server.shutdown()
+
+    result = {**summarize_probe(runs), "runs": runs}
+    args.out.write_text(json.dumps(result, indent=2) + "\n")
+    print(
+        "[mux-startup-probe] "
+        + " ".join(f"{key}={value}" for key, value in result.items() if key != "runs")
+    )
+    return 1 if result["n_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
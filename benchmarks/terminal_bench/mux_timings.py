@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+SETUP_TIMINGS_FILE = "setup-timings.json"
+
+
+class SetupTimer:
+    """Collects per-phase setup timings from the host and the sandbox.
+
+    Host phases use ``time.monotonic()`` offsets from when the timer was
+    created. Sandbox phases come from the install template, which records
+    ``/proc/uptime`` readings; only their durations are comparable with host
+    phases, since the two clocks share no origin.
+    """
+
+    def __init__(self) -> None:
+        self._origin = time.monotonic()
+        self.phases: list[dict[str, Any]] = []
+
+    @contextmanager
+    def phase(self, name: str, **extra: Any) -> Iterator[dict[str, Any]]:
+        """Time the enclosed block; callers may add fields to the yielded record."""
+        record: dict[str, Any] = {
+            "phase": name,
+            "where": "host",
+            "start": round(time.monotonic() - self._origin, 3),
+            **extra,
+        }
+        started = time.monotonic()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.monotonic() - started, 3)
+            self.phases.append(record)
+
+    def add_sandbox_phases(self, jsonl: str) -> None:
+        """Merge ``{"phase", "start", "end"}`` lines written by mux_setup.sh.j2."""
+        for line in jsonl.splitlines():
+            try:
+                entry = json.loads(line)
+                start = float(entry["start"])
+                end = float(entry["end"])
+            except (ValueError, KeyError, TypeError):
+                continue  # A phase interrupted mid-write; keep the rest
+            self.phases.append(
+                {
+                    "phase": str(entry.get("phase", "unknown")),
+                    "where": "sandbox",
+                    "start": round(start, 3),
+                    "seconds": round(max(end - start, 0.0), 3),
+                }
+            )
+
+    def to_dict(self, **summary: Any) -> dict[str, Any]:
+        return {
+            "total_seconds": round(time.monotonic() - self._origin, 3),
+            "upload_bytes": sum(
+                phase.get("bytes", 0)
+                for phase in self.phases
+                if phase["where"] == "host"
+            ),
+            **summary,
+            "phases": self.phases,
+        }
+
+    def write(self, logs_dir: Path, **summary: Any) -> Path:
+        path = logs_dir / SETUP_TIMINGS_FILE
+        path.write_text(json.dumps(self.to_dict(**summary), indent=2) + "\n")
+        return path
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Streaming token/cost accumulator for ``mux run --json`` output.
+
+mux-run.sh pipes the agent's stdout through this script. Lines pass through
+unchanged while running usage totals and a performance summary are kept, and
+the token file is atomically rewritten every ``--interval`` seconds (from a
+timer thread, so quiet stretches such as a long tool call are covered too) and
+once more at EOF or on SIGTERM/SIGHUP. A trial killed by ``timeout`` or cancelled by
+Harbor therefore still leaves current numbers behind, without a second pass
+over the JSONL.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+
+def parse_event(line: str | bytes) -> dict[str, Any] | None:
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+class UsageAccumulator:
+    """Running usage totals over mux JSONL events.
+
+    Prefer the run-complete event (emitted at end of --json run) which has
+    aggregated totals. Until then, sum the latest usage-delta per message plus
+    all session-usage-delta events (sub-agents).
+    """
+
+    def __init__(self) -> None:
+        # Each usage-delta contains cumulative totals for its message, so we
+        # keep the latest per message and sum across messages.
+        self._usage_by_message: dict[str, dict[str, Any]] = {}
+        # session-usage-delta events carry per-model byModelDelta dicts with
+        # {input: {tokens, cost_usd}, output: {tokens, cost_usd}, ...}. Each
+        # event is an incremental delta, so we sum them all.
+        self._subagent_input = 0
+        self._subagent_output = 0
+        self._run_complete: dict[str, Any] | None = None
+
+    def feed(self, line: str | bytes) -> None:
+        if (obj := parse_event(line)) is not None:
+            self.feed_event(obj)
+
+    def feed_event(self, obj: dict[str, Any]) -> None:
+        if obj.get("type") == "run-complete":
+            usage = obj.get("usage") or {}
+            self._run_complete = {
+                "input": usage.get("inputTokens", 0) or 0,
+                "output": usage.get("outputTokens", 0) or 0,
+                "cost_usd": obj.get("cost_usd"),
+            }
+            return
+        # Nested event wrapper: {"type":"event","payload":{"type":"usage-delta",...}}
+        payload = obj.get("payload") or obj
+        if not isinstance(payload, dict):
+            return
+        if payload.get("type") == "usage-delta":
+            # Prefer cumulativeUsage (running total across all steps in a
+            # message) over usage (per-step delta).
+            usage = payload.get("cumulativeUsage") or payload.get("usage") or {}
+            self._usage_by_message[payload.get("messageId", "")] = usage
+        elif payload.get("type") == "session-usage-delta":
+            for model_usage in (payload.get("byModelDelta") or {}).values():
+                self._subagent_input += (model_usage.get("input") or {}).get(
+                    "tokens", 0
+                )
+                self._subagent_output += (model_usage.get("output") or {}).get(
+                    "tokens", 0
+                )
+
+    def totals(self) -> dict[str, Any]:
+        if self._run_complete is not None:
+            return dict(self._run_complete)
+        result: dict[str, Any] = {
+            "input": self._subagent_input,
+            "output": self._subagent_output,
+            "cost_usd": None,
+        }
+        for usage in self._usage_by_message.values():
+            result["input"] += usage.get("inputTokens", 0) or 0
+            result["output"] += usage.get("outputTokens", 0) or 0
+        return result
+
+
+# Events that carry model output; the first one after a wait starts a turn.
+_MODEL_OUTPUT_EVENTS = ("stream-delta", "reasoning-delta", "tool-call-start")
+
+
+class PerfAccumulator:
+    """Where a run's time went: waiting on the model vs executing tools.
+
+    A model turn starts with the first output after a stream starts or after
+    every pending tool call has finished. Tool time is the union of
+    tool-call-start/end intervals (parallel calls are not double counted) and
+    model-wait time is the remaining stream time. Timestamps are the
+    backend's ``Date.now()`` values carried by the events.
+    """
+
+    def __init__(self, n_slowest_tools: int = 5) -> None:
+        self._started = time.monotonic()
+        self._n_slowest_tools = n_slowest_tools
+        self._first_stream_ms: float | None = None
+        self._ttft_ms: float | None = None
+        self._awaiting_output = False
+        self._stream_starts: dict[str, float] = {}
+        self._stream_ms = 0.0
+        self._last_ms: float | None = None
+        self._open_tools: dict[str, tuple[str, float]] = {}
+        self._tool_intervals: list[tuple[float, float]] = []
+        self._tool_calls: list[tuple[float, str]] = []
+        self.n_turns = 0
+
+    def feed_event(self, obj: dict[str, Any]) -> None:
+        payload = obj.get("payload")
+        if obj.get("type") != "event" or not isinstance(payload, dict):
+            return
+        # Replayed history and nested PTC calls happen inside other intervals.
+        if payload.get("replay") or payload.get("parentToolCallId"):
+            return
+        event_type = payload.get("type")
+        timestamp = payload.get("timestamp")
+        if isinstance(timestamp, (int, float)):
+            self._last_ms = float(timestamp)
+
+        if event_type == "stream-start":
+            start = float(payload.get("startTime") or self._last_ms or 0.0)
+            self._stream_starts[payload.get("messageId", "")] = start
+            if self._first_stream_ms is None:
+                self._first_stream_ms = start
+            self._last_ms = start
+            self._awaiting_output = True
+        elif event_type in _MODEL_OUTPUT_EVENTS and self._awaiting_output:
+            self._awaiting_output = False
+            self.n_turns += 1
+            if self._ttft_ms is None and self._first_stream_ms is not None:
+                first_output = self._last_ms or self._first_stream_ms
+                self._ttft_ms = first_output - self._first_stream_ms
+
+        if event_type == "tool-call-start":
+            self._open_tools[payload.get("toolCallId", "")] = (
+                payload.get("toolName", "unknown"),
+                self._last_ms or 0.0,
+            )
+        elif event_type == "tool-call-end":
+            opened = self._open_tools.pop(payload.get("toolCallId", ""), None)
+            if opened is not None and self._last_ms is not None:
+                tool_name, start = opened
+                self._tool_intervals.append((start, self._last_ms))
+                self._tool_calls.append((self._last_ms - start, tool_name))
+            if not self._open_tools:
+                self._awaiting_output = True
+        elif event_type == "stream-end":
+            start = self._stream_starts.pop(payload.get("messageId", ""), None)
+            if start is not None:
+                duration = (payload.get("metadata") or {}).get("duration")
+                if not isinstance(duration, (int, float)):
+                    duration = (self._last_ms or start) - start
+                self._stream_ms += max(float(duration), 0.0)
+            self._awaiting_output = False
+
+    def _tool_ms(self) -> float:
+        # Tool calls still running (killed or cancelled run) count up to the
+        # last event, like open streams below.
+        intervals = self._tool_intervals + [
+            (start, max(self._last_ms or start, start))
+            for _, start in self._open_tools.values()
+        ]
+        total = 0.0
+        merged_end = float("-inf")
+        for start, end in sorted(intervals):
+            if start > merged_end:
+                total += end - start
+                merged_end = end
+            elif end > merged_end:
+                total += end - merged_end
+                merged_end = end
+        return total
+
+    def summary(self) -> dict[str, Any]:
+        # Streams still open (killed or cancelled run) count up to the last event.
+        stream_ms = self._stream_ms + sum(
+            max((self._last_ms or start) - start, 0.0)
+            for start in self._stream_starts.values()
+        )
+        tool_ms = self._tool_ms()
+        return {
+            "wall_clock_sec": round(time.monotonic() - self._started, 3),
+            "ttft_sec": None
+            if self._ttft_ms is None
+            else round(self._ttft_ms / 1000, 3),
+            "n_model_turns": self.n_turns,
+            "n_tool_calls": len(self._tool_calls),
+            "model_wait_sec": round(max(stream_ms - tool_ms, 0.0) / 1000, 3),
+            "tool_sec": round(tool_ms / 1000, 3),
+            "slowest_tools": [
+                {"tool": tool_name, "seconds": round(duration / 1000, 3)}
+                for duration, tool_name in heapq.nlargest(
+                    self._n_slowest_tools, self._tool_calls
+                )
+            ],
+        }
+
+
+def write_token_file(path: Path, totals: dict[str, Any]) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(totals))
+    os.replace(tmp_path, path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("token_file", type=Path)
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5.0,
+        help="Seconds between token file checkpoints (default: 5)",
+    )
+    args = parser.parse_args(argv)
+
+    usage = UsageAccumulator()
+    perf = PerfAccumulator()
+    # Guards the accumulators and the token file between the reader and the
+    # checkpoint thread. Re-entrant because the signal handler runs on the
+    # main thread, possibly while it holds the lock.
+    lock = threading.RLock()
+    stopped = threading.Event()
+
+    def checkpoint() -> None:
+        with lock:
+            try:
+                write_token_file(
+                    args.token_file, {**usage.totals(), "perf": perf.summary()}
+                )
+            except OSError:
+                pass  # Token capture is best-effort; never break the agent pipe
+
+    def checkpoint_loop() -> None:
+        while not stopped.wait(args.interval):
+            checkpoint()
+
+    def on_signal(signum: int, _frame: object) -> None:
+        checkpoint()
+        sys.exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGHUP, on_signal)
+
+    checkpoint()
+    threading.Thread(target=checkpoint_loop, daemon=True).start()
+    stdout = sys.stdout.buffer
+    for raw in sys.stdin.buffer:
+        try:
+            stdout.write(raw)
+            stdout.flush()
+        except BrokenPipeError:
+            # Keep accumulating even if nobody reads the passthrough anymore.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), stdout.fileno())
+        if (event := parse_event(raw)) is not None:
+            with lock:
+                usage.feed_event(event)
+                perf.feed_event(event)
+    stopped.set()
+    checkpoint()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
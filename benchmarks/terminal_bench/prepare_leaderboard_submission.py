@@ -56,13 +56,15 @@ from pathlib import Path
 
 try:
     from .tbench_utils import (
-        download_run_artifacts,
+        ARTIFACT_DOWNLOAD_WORKERS,
+        download_artifacts,
         list_artifacts_for_run,
         list_nightly_runs,
     )
 except ImportError:
     from tbench_utils import (  # type: ignore[import-not-found,no-redef]
-        download_run_artifacts,
+        ARTIFACT_DOWNLOAD_WORKERS,
+        download_artifacts,
         list_artifacts_for_run,
         list_nightly_runs,
     )
@@ -135,10 +137,10 @@ MODEL_METADATA = {
 }
 
 
-def get_latest_successful_nightly_run() -> dict | None:
+def get_latest_successful_nightly_run(refresh: bool = False) -> dict | None:
     """Get the latest successful nightly Terminal-Bench run."""
     print("Fetching latest successful nightly run...")
-    runs = list_nightly_runs(limit=1, status="success", verbose=True)
+    runs = list_nightly_runs(limit=1, status="success", verbose=True, refresh=refresh)
     if not runs:
         print("No successful nightly runs found")
         return None
@@ -344,7 +346,9 @@ def prepare_submission(
                     trial_src,
                     dest_trial_dir,
                     ignore=shutil.ignore_patterns(
-                        "mux-app.tar.gz",  # Large agent binary (~5MB each)
+                        # Agent payload archive; current runs only record its
+                        # digest (mux-payload.json), older runs copied it here
+                        "mux-app.tar.gz",
                         "mux-tokens.json",  # Token usage (not needed for leaderboard)
                         "*.log",  # Log files trigger HF LFS and cause upload timeouts
                     ),
@@ -357,44 +361,49 @@ def prepare_submission(
     return submissions
 
 
-def download_run_to_dir(
-    run_id: int,
+def download_runs_to_dirs(
+    run_ids: list[int],
     models_filter: list[str] | None,
+    max_workers: int = ARTIFACT_DOWNLOAD_WORKERS,
     verbose: bool = True,
-) -> tuple[Path, str]:
-    """Download artifacts for a single GH Actions run.
+    refresh: bool = False,
+) -> list[Path]:
+    """Download artifacts for GH Actions runs through one shared worker pool.
 
-    Returns (artifacts_dir, run_date).
+    Returns one artifacts dir per run, in the order given.
     """
-    run_info = {"databaseId": run_id, "createdAt": datetime.now().isoformat()}
+    downloads: list[tuple[dict, Path]] = []
+    artifacts_dirs: list[Path] = []
+    for run_id in run_ids:
+        print(f"Using run {run_id}")
+        artifacts = list_artifacts_for_run(run_id, verbose=verbose, refresh=refresh)
+        if not artifacts:
+            print(f"No terminal-bench artifacts found for run {run_id}")
+            sys.exit(1)
 
-    run_date = run_info["createdAt"][:10]
-    print(f"Using run {run_id} from {run_date}")
+        print(f"Found {len(artifacts)} artifact(s)")
 
-    artifacts = list_artifacts_for_run(run_id, verbose=verbose)
-    if not artifacts:
-        print(f"No terminal-bench artifacts found for run {run_id}")
-        sys.exit(1)
+        if models_filter:
+            artifacts = [
+                a
+                for a in artifacts
+                if any(m.replace("/", "-") in a["name"] for m in models_filter)
+            ]
+            print(f"Filtered to {len(artifacts)} artifact(s) for specified models")
 
-    print(f"Found {len(artifacts)} artifact(s)")
+        artifacts_dir = Path(tempfile.mkdtemp(prefix="tbench-"))
+        artifacts_dirs.append(artifacts_dir)
+        downloads.extend((artifact, artifacts_dir) for artifact in artifacts)
 
-    if models_filter:
-        artifacts = [
-            a
-            for a in artifacts
-            if any(m.replace("/", "-") in a["name"] for m in models_filter)
-        ]
-        print(f"Filtered to {len(artifacts)} artifact(s) for specified models")
-
-    artifacts_dir = Path(tempfile.mkdtemp(prefix="tbench-"))
-    artifact_names = [a["name"] for a in artifacts]
-    if not download_run_artifacts(
-        run_id, artifacts_dir, artifact_names, verbose=verbose
-    ):
-        print(f"Failed to download artifacts for run {run_id}")
+    print(
+        f"Downloading {len(downloads)} artifact(s) from {len(run_ids)} run(s) "
+        f"({max_workers} at a time)..."
+    )
+    if not download_artifacts(downloads, max_workers=max_workers, verbose=verbose):
+        print("Failed to download artifacts")
         sys.exit(1)
 
-    return artifacts_dir, run_date
+    return artifacts_dirs
 
 
 def main():
@@ -430,6 +439,17 @@ def main():
         nargs="+",
         help="Only process specific models (e.g., anthropic/claude-opus-4-5)",
     )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=ARTIFACT_DOWNLOAD_WORKERS,
+        help=f"Artifacts downloaded in parallel (default: {ARTIFACT_DOWNLOAD_WORKERS})",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached GitHub run/artifact listings",
+    )
     args = parser.parse_args()
 
     # Collect all artifact directories to merge into one submission.
@@ -448,17 +468,19 @@ def main():
             artifacts_dirs.append(d)
 
     if args.run_id:
-        for rid in args.run_id:
-            ad, rd = download_run_to_dir(rid, args.models)
-            artifacts_dirs.append(ad)
-            temp_dirs.append(ad)
-            run_date = rd
+        run_dirs = download_runs_to_dirs(
+            args.run_id, args.models, args.download_workers, refresh=args.refresh
+        )
+        artifacts_dirs.extend(run_dirs)
+        temp_dirs.extend(run_dirs)
 
     if args.n_runs is not None:
         # Auto-discover latest N successful nightly runs
         n = args.n_runs
         print(f"Fetching latest {n} successful nightly run(s)...")
-        runs = list_nightly_runs(limit=n, status="success", verbose=True)
+        runs = list_nightly_runs(
+            limit=n, status="success", verbose=True, refresh=args.refresh
+        )
         if len(runs) < n:
             print(
                 f"Warning: only found {len(runs)} successful nightly run(s) "
@@ -468,22 +490,30 @@ def main():
             print("No successful nightly runs found")
             sys.exit(1)
         run_date = runs[0]["createdAt"][:10]
-        for run_info in runs:
-            rid = run_info["databaseId"]
-            ad, _ = download_run_to_dir(rid, args.models)
-            artifacts_dirs.append(ad)
-            temp_dirs.append(ad)
+        # All runs share one download pool instead of fetching run by run.
+        run_dirs = download_runs_to_dirs(
+            [run_info["databaseId"] for run_info in runs],
+            args.models,
+            args.download_workers,
+            refresh=args.refresh,
+        )
+        artifacts_dirs.extend(run_dirs)
+        temp_dirs.extend(run_dirs)
 
     # Default: latest single nightly run
     if not artifacts_dirs:
-        run_info = get_latest_successful_nightly_run()
+        run_info = get_latest_successful_nightly_run(refresh=args.refresh)
         if not run_info:
             print("Could not find a successful nightly run")
             sys.exit(1)
-        rid = run_info["databaseId"]
-        ad, run_date = download_run_to_dir(rid, args.models)
-        artifacts_dirs.append(ad)
-        temp_dirs.append(ad)
+        run_dirs = download_runs_to_dirs(
+            [run_info["databaseId"]],
+            args.models,
+            args.download_workers,
+            refresh=args.refresh,
+        )
+        artifacts_dirs.extend(run_dirs)
+        temp_dirs.extend(run_dirs)
 
     # Merge all artifact sources into a combined staging directory.  Each
     # source may have its own jobs/ subdirectory tree — we link them all under
@@ -9,17 +9,66 @@ This module consolidates common functionality used by:
 
 from __future__ import annotations
 
+import functools
+import hashlib
+import http.client
 import json
+import os
+import shutil
 import subprocess
 import sys
+import threading
+import time
+import zipfile
+import zlib
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
+from typing import Any
+from urllib.parse import urlencode, urljoin, urlsplit
 
 # GitHub repository for fetching artifacts
 GITHUB_REPO = "coder/mux"
+NIGHTLY_WORKFLOW = "nightly-terminal-bench.yml"
+ARTIFACT_PREFIX = "terminal-bench-results"
+
+# How scripts reach the GitHub API: "http" keeps a pool of keep-alive
+# connections, "gh" runs the gh CLI once per call, and "auto" (the default)
+# uses http when a token is available (GH_TOKEN, GITHUB_TOKEN or
+# `gh auth token`) and gh otherwise. TBENCH_GITHUB_API_URL points the http
+# backend at another API root, e.g. a local stub server.
+GITHUB_BACKEND_ENV = "TBENCH_GITHUB_BACKEND"
+GITHUB_API_URL_ENV = "TBENCH_GITHUB_API_URL"
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_PAGE_SIZE = 100
+GITHUB_HTTP_CONNECTIONS = 8
 
 # Smoke test model - excluded from submissions by default
 SMOKE_TEST_MODEL = "anthropic/claude-sonnet-4-5"
 
+# Artifacts downloaded at once, per run and across runs
+ARTIFACT_DOWNLOAD_WORKERS = 4
+
+# Written atomically once an artifact (or a whole run) is fully extracted;
+# anything without a marker is treated as a partial download. An artifact
+# kept as its zip (keep_zip) gets ``<name>.artifact-complete.json`` beside
+# ``<name>.zip`` instead of a marker inside ``<name>/``.
+ARTIFACT_COMPLETE_MARKER = ".artifact-complete.json"
+RUN_COMPLETE_MARKER = ".run-complete.json"
+
+# GitHub run/artifact listings cached between invocations. Listings of
+# completed runs never change and are kept forever; anything that can still
+# change (run lists, in-progress runs) expires after the TTL.
+METADATA_CACHE_PATH = Path(__file__).parent / ".gh_metadata_cache.json"
+METADATA_TTL_SEC = 300
+# The HTTP backend's ETags and response bodies, one file per URL beside the
+# metadata cache so that file stays small. They only let a request come back
+# as a 304, so they outlive listings, but are pruned after ETAG_TTL_SEC unused.
+ETAG_CACHE_DIR_NAME = ".gh_etag_cache"
+ETAG_TTL_SEC = 7 * 24 * 3600
+
 
 def run_command(
     cmd: list[str], check: bool = True, verbose: bool = False
@@ -36,6 +85,542 @@ def run_command(
     return subprocess.run(cmd, capture_output=True, text=True, check=check)
 
 
+class MetadataCache:
+    """Small JSON cache of ``gh`` responses keyed by request.
+
+    Entries are ``{"fetched_at", "immutable", "value"}``. ``get`` returns
+    None for missing or expired entries, and always when ``refresh`` is set,
+    so callers fetch again and ``put`` the fresh value. Writes replace the
+    file atomically and drop expired entries; inside ``batch()`` they are
+    held back and written once at the end.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        ttl_sec: float | None = None,
+        refresh: bool = False,
+    ) -> None:
+        self.path = path or METADATA_CACHE_PATH
+        self.ttl_sec = METADATA_TTL_SEC if ttl_sec is None else ttl_sec
+        self.refresh = refresh
+        self._entries = self._load()
+        self._pending: dict[str, dict] | None = None
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            return json.loads(self.path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if self.refresh or entry is None:
+            return None
+        if self._expired(entry, time.time()):
+            return None
+        return entry["value"]
+
+    def is_immutable(self, key: str) -> bool:
+        """True if ``key`` is stored as immutable (``refresh`` is ignored)."""
+        entry = self._entries.get(key)
+        return entry is not None and bool(entry.get("immutable"))
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        expired = now - entry["fetched_at"] > self.ttl_sec
+        return expired and not entry.get("immutable")
+
+    def put(self, key: str, value: Any, immutable: bool = False) -> None:
+        self.put_many({key: value}, immutable)
+
+    def put_many(self, values: dict[str, Any], immutable: bool = False) -> None:
+        """Store several entries with one read-modify-write of the file."""
+        if not values:
+            return
+        entry = {"fetched_at": time.time(), "immutable": immutable}
+        entries = {key: {**entry, "value": value} for key, value in values.items()}
+        if self._pending is not None:
+            self._pending.update(entries)
+            self._entries.update(entries)
+            return
+        self._write(entries)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Collect the puts made inside the block into a single file write."""
+        self._pending = {}
+        try:
+            yield
+        finally:
+            pending, self._pending = self._pending, None
+            if pending:
+                self._write(pending)
+
+    def _write(self, entries: dict[str, dict]) -> None:
+        now = time.time()
+        with _METADATA_CACHE_LOCK:
+            # Re-read first so entries written by other instances survive.
+            merged = {**self._load(), **entries}
+            self._entries = {
+                key: kept
+                for key, kept in merged.items()
+                if not self._expired(kept, now)
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            _write_json_atomic(self.path, self._entries)
+
+
+_METADATA_CACHE_LOCK = threading.Lock()
+
+
+class EtagCache:
+    """ETag and body of each revalidated GET, in one small file per URL.
+
+    Kept out of MetadataCache because the bodies are whole listing pages.
+    ``get`` ignores files unused for ``ttl_sec``, and ``prune`` deletes them.
+    """
+
+    def __init__(
+        self, cache_dir: Path | None = None, ttl_sec: float = ETAG_TTL_SEC
+    ) -> None:
+        self.cache_dir = cache_dir or METADATA_CACHE_PATH.with_name(ETAG_CACHE_DIR_NAME)
+        self.ttl_sec = ttl_sec
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.json"
+
+    def get(self, url: str) -> dict | None:
+        """``{"etag", "body"}`` for ``url``, or None."""
+        path = self._path(url)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_sec:
+                return None
+            return json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def touch(self, url: str) -> None:
+        """Mark ``url``'s entry as used (it was just revalidated)."""
+        try:
+            os.utime(self._path(url))
+        except OSError:
+            pass
+
+    def put(self, url: str, etag: str, body: Any) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_json_atomic(self._path(url), {"url": url, "etag": etag, "body": body})
+
+    def prune(self) -> None:
+        now = time.time()
+        try:
+            paths = list(self.cache_dir.glob("*.json"))
+        except OSError:
+            return
+        for path in paths:
+            try:
+                if now - path.stat().st_mtime > self.ttl_sec:
+                    path.unlink()
+            except OSError:
+                pass
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP(S) connections per origin, shared across threads."""
+
+    def __init__(self, max_idle: int, timeout_sec: float = 60.0) -> None:
+        self._max_idle = max_idle
+        self._timeout_sec = timeout_sec
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.n_opened = 0
+
+    def _acquire(self, origin: tuple[str, str]) -> http.client.HTTPConnection:
+        with self._lock:
+            if idle := self._idle.get(origin):
+                return idle.pop()
+            self.n_opened += 1
+        scheme, netloc = origin
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self._timeout_sec)
+        return http.client.HTTPConnection(netloc, timeout=self._timeout_sec)
+
+    def _release(
+        self, origin: tuple[str, str], connection: http.client.HTTPConnection
+    ) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self._max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+    @contextmanager
+    def request(
+        self, method: str, url: str, headers: dict[str, str]
+    ) -> Iterator[http.client.HTTPResponse]:
+        """Send a request on a pooled connection and yield the response.
+
+        The body is drained on exit so the connection can be reused. A
+        request that fails because the server closed an idle connection is
+        retried once on a fresh one.
+        """
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.netloc)
+        target = f"{parts.path}?{parts.query}" if parts.query else parts.path
+        for attempt in range(2):
+            connection = self._acquire(origin)
+            try:
+                connection.request(method, target, headers=headers)
+                response = connection.getresponse()
+                break
+            except ConnectionError:
+                connection.close()
+                if attempt:
+                    raise
+            except BaseException:
+                connection.close()
+                raise
+        try:
+            yield response
+            response.read()
+        except BaseException:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(origin, connection)
+
+
+class GhCliBackend:
+    """GitHub API access through one ``gh`` subprocess per call.
+
+    Backend methods raise RuntimeError (or OSError) when a call fails.
+    """
+
+    name = "gh"
+
+    def list_runs(
+        self, limit: int, status: str | None = None, verbose: bool = False
+    ) -> list[dict]:
+        cmd = [
+            "gh",
+            "run",
+            "list",
+            f"--repo={GITHUB_REPO}",
+            f"--workflow={NIGHTLY_WORKFLOW}",
+            f"--limit={limit}",
+            "--json=databaseId,status,conclusion,createdAt,displayTitle",
+        ]
+        if status:
+            cmd.append(f"--status={status}")
+        return json.loads(self._gh(cmd, verbose))
+
+    def run_status(self, run_id: int, verbose: bool = False) -> str:
+        return self._gh(
+            [
+                "gh",
+                "api",
+                f"repos/{GITHUB_REPO}/actions/runs/{run_id}",
+                "--jq",
+                ".status",
+            ],
+            verbose,
+        ).strip()
+
+    def list_artifacts(self, run_id: int, verbose: bool = False) -> list[dict]:
+        stdout = self._gh(
+            [
+                "gh",
+                "api",
+                f"repos/{GITHUB_REPO}/actions/runs/{run_id}/artifacts",
+                "--jq",
+                f'.artifacts[] | select(.name | startswith("{ARTIFACT_PREFIX}")) '
+                "| {name, id, size_in_bytes, digest}",
+            ],
+            verbose,
+        )
+        return [json.loads(line) for line in stdout.strip().split("\n") if line]
+
+    def fetch_artifact_zip(self, artifact: dict, zip_path: Path) -> None:
+        with zip_path.open("wb") as handle:
+            result = subprocess.run(
+                [
+                    "gh",
+                    "api",
+                    f"repos/{GITHUB_REPO}/actions/artifacts/{artifact['id']}/zip",
+                ],
+                stdout=handle,
+                stderr=subprocess.PIPE,
+                text=False,
+            )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors="replace").strip())
+
+    @staticmethod
+    def _gh(cmd: list[str], verbose: bool) -> str:
+        result = run_command(cmd, check=False, verbose=verbose)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip())
+        return result.stdout
+
+
+class HttpBackend:
+    """GitHub REST API access over pooled keep-alive connections.
+
+    Saves the process start-up and TLS handshake ``gh`` pays per call. Paged
+    listings fetch the first page, then the remaining pages concurrently.
+    Responses are revalidated with their ETag (kept in an EtagCache), so an
+    unchanged listing comes back as a 304, which GitHub does not count against
+    the rate limit.
+    """
+
+    name = "http"
+
+    def __init__(
+        self,
+        token: str | None,
+        base_url: str | None = None,
+        max_connections: int = GITHUB_HTTP_CONNECTIONS,
+    ) -> None:
+        self.base_url = (base_url or GITHUB_API_URL).rstrip("/")
+        self._token = token
+        self._max_connections = max_connections
+        self.pool = _ConnectionPool(max_connections)
+        self._etags_pruned = False
+
+    def _headers(self, url: str) -> dict[str, str]:
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "User-Agent": "mux-terminal-bench",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+        # Artifact zips redirect to signed storage URLs that reject auth.
+        if self._token and url.startswith(self.base_url):
+            headers["Authorization"] = f"Bearer {self._token}"
+        return headers
+
+    def _get_json(
+        self, path: str, params: dict[str, Any] | None = None, verbose: bool = False
+    ) -> Any:
+        url = f"{self.base_url}{path}"
+        if params:
+            url += f"?{urlencode(params)}"
+        if verbose:
+            print(f"  GET {url}")
+        etags = EtagCache()
+        cached = etags.get(url)
+        headers = self._headers(url)
+        if cached:
+            headers["If-None-Match"] = cached["etag"]
+        with self.pool.request("GET", url, headers) as response:
+            body = response.read()
+            etag = response.getheader("ETag")
+        if response.status == 304 and cached:
+            etags.touch(url)
+            return cached["body"]
+        if response.status != 200:
+            detail = body[:200].decode(errors="replace")
+            raise RuntimeError(f"GET {path}: HTTP {response.status} {detail}")
+        value = json.loads(body)
+        if etag:
+            if not self._etags_pruned:
+                self._etags_pruned = True
+                etags.prune()
+            etags.put(url, etag, value)
+        return value
+
+    def _get_paginated(
+        self,
+        path: str,
+        key: str,
+        params: dict[str, Any],
+        limit: int | None = None,
+        verbose: bool = False,
+    ) -> list[dict]:
+        params = {"per_page": GITHUB_PAGE_SIZE, **params}
+        first = self._get_json(path, {**params, "page": 1}, verbose)
+        items = list(first[key])
+        total = first.get("total_count", len(items))
+        if limit is not None:
+            total = min(total, limit)
+        n_pages = -(-total // params["per_page"])
+        if n_pages > 1:
+            with ThreadPoolExecutor(max_workers=self._max_connections) as pool:
+                pages = pool.map(
+                    lambda page: self._get_json(
+                        path, {**params, "page": page}, verbose
+                    )[key],
+                    range(2, n_pages + 1),
+                )
+                for page_items in pages:
+                    items.extend(page_items)
+        return items[:limit] if limit is not None else items
+
+    def list_runs(
+        self, limit: int, status: str | None = None, verbose: bool = False
+    ) -> list[dict]:
+        params: dict[str, Any] = {"per_page": min(limit, GITHUB_PAGE_SIZE)}
+        if status:
+            params["status"] = status
+        runs = self._get_paginated(
+            f"/repos/{GITHUB_REPO}/actions/workflows/{NIGHTLY_WORKFLOW}/runs",
+            "workflow_runs",
+            params,
+            limit=limit,
+            verbose=verbose,
+        )
+        # Same shape as `gh run list --json`
+        return [
+            {
+                "databaseId": run["id"],
+                "status": run["status"],
+                "conclusion": run["conclusion"],
+                "createdAt": run["created_at"],
+                "displayTitle": run["display_title"],
+            }
+            for run in runs
+        ]
+
+    def run_status(self, run_id: int, verbose: bool = False) -> str:
+        return self._get_json(
+            f"/repos/{GITHUB_REPO}/actions/runs/{run_id}", verbose=verbose
+        )["status"]
+
+    def list_artifacts(self, run_id: int, verbose: bool = False) -> list[dict]:
+        artifacts = self._get_paginated(
+            f"/repos/{GITHUB_REPO}/actions/runs/{run_id}/artifacts",
+            "artifacts",
+            {},
+            verbose=verbose,
+        )
+        return [
+            {
+                key: artifact.get(key)
+                for key in ("name", "id", "size_in_bytes", "digest")
+            }
+            for artifact in artifacts
+            if artifact["name"].startswith(ARTIFACT_PREFIX)
+        ]
+
+    def fetch_artifact_zip(self, artifact: dict, zip_path: Path) -> None:
+        url = (
+            f"{self.base_url}/repos/{GITHUB_REPO}/actions/artifacts/"
+            f"{artifact['id']}/zip"
+        )
+        # The API answers with a redirect to the archive in blob storage.
+        for _ in range(3):
+            with self.pool.request("GET", url, self._headers(url)) as response:
+                if response.status in (301, 302, 303, 307, 308):
+                    url = urljoin(url, response.getheader("Location", ""))
+                    continue
+                if response.status != 200:
+                    raise RuntimeError(f"HTTP {response.status}")
+                with zip_path.open("wb") as handle:
+                    shutil.copyfileobj(response, handle, 1 << 20)
+                return
+        raise RuntimeError("too many redirects")
+
+
+def _github_token() -> str | None:
+    if token := os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN"):
+        return token
+    if not shutil.which("gh"):
+        return None
+    result = run_command(["gh", "auth", "token"], check=False)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+@functools.cache
+def github_backend() -> GhCliBackend | HttpBackend:
+    """The GitHub API backend for this process (see GITHUB_BACKEND_ENV)."""
+    choice = os.environ.get(GITHUB_BACKEND_ENV, "auto").strip().lower()
+    if choice not in ("auto", "http", "gh"):
+        raise ValueError(
+            f"{GITHUB_BACKEND_ENV} must be auto, http or gh, got {choice!r}"
+        )
+    if choice == "gh":
+        return GhCliBackend()
+    token = _github_token()
+    if token is None and choice == "auto":
+        return GhCliBackend()
+    return HttpBackend(token, base_url=os.environ.get(GITHUB_API_URL_ENV))
+
+
+# Suffixes mux-run.sh gives captured agent logs (MUX_LOG_CODEC), plain first
+AGENT_LOG_SUFFIXES = ("", ".gz", ".zst")
+
+
+def read_agent_log(command_dir: Path, name: str) -> str | None:
+    """Read a captured agent log (e.g. ``stdout.txt``), decompressing as needed.
+
+    ``command_dir`` may also be a ``zipfile.Path`` inside a kept artifact zip.
+    Newer runs store ``stdout.txt.gz`` / ``.zst``; the codec is detected from
+    the file's magic bytes. zstd needs the ``zstandard`` package or a ``zstd``
+    binary. A stream left unfinished by a killed or timed-out agent yields the
+    prefix mux_log_capture flushed. Returns None when no variant of the log
+    exists.
+    """
+    for suffix in AGENT_LOG_SUFFIXES:
+        path = command_dir / f"{name}{suffix}"
+        if not path.is_file():
+            continue
+        data = path.read_bytes()
+        if data[:2] == b"\x1f\x8b":
+            data = _gzip_decompress(data)
+        elif data[:4] == b"\x28\xb5\x2f\xfd":
+            data = _zstd_decompress(data)
+        return data.decode("utf-8", errors="replace")
+    return None
+
+
+def _gzip_decompress(data: bytes) -> bytes:
+    # gzip.decompress raises EOFError on a sync-flushed stream that was never
+    # finished; decompress member by member and keep the readable prefix.
+    chunks = []
+    while data:
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            chunks.append(decompressor.decompress(data))
+        except zlib.error:
+            break
+        if not decompressor.eof:
+            break
+        data = decompressor.unused_data
+    return b"".join(chunks)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    try:
+        import zstandard
+    except ImportError:
+        if not shutil.which("zstd"):
+            raise RuntimeError(
+                "Reading .zst logs requires `pip install zstandard` or the zstd CLI"
+            ) from None
+        # zstd exits non-zero on a truncated frame but still writes what it
+        # decoded.
+        return subprocess.run(
+            ["zstd", "-dcq"], input=data, capture_output=True, check=False
+        ).stdout
+    # Frame by frame like _gzip_decompress: the capture's frames carry no
+    # content size and the last one may be unfinished.
+    chunks = []
+    dctx = zstandard.ZstdDecompressor()
+    while data:
+        decompressor = dctx.decompressobj()
+        try:
+            chunks.append(decompressor.decompress(data))
+        except zstandard.ZstdError:
+            break
+        if not decompressor.eof:
+            break
+        data = decompressor.unused_data
+    return b"".join(chunks)
+
+
 def get_passed(data: dict) -> bool | None:
     """Extract pass/fail status from Terminal-Bench result data.
 
@@ -70,120 +655,341 @@ def extract_task_id(folder_name: str) -> str:
     return folder_name.rsplit("__", 1)[0] if "__" in folder_name else folder_name
 
 
+def parse_iso_time(value: object) -> datetime | None:
+    """Parse an ISO 8601 timestamp from result JSON; None if absent or invalid."""
+    if not isinstance(value, str):
+        return None
+    try:
+        # Python < 3.11 rejects a trailing 'Z'
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
 def list_nightly_runs(
-    limit: int = 10, status: str | None = None, verbose: bool = False
+    limit: int = 10,
+    status: str | None = None,
+    verbose: bool = False,
+    refresh: bool = False,
 ) -> list[dict]:
     """List recent nightly Terminal-Bench runs.
 
+    The listing is cached for METADATA_TTL_SEC, and each completed run's
+    state is cached for good (see list_artifacts_for_run).
+
     Args:
         limit: Maximum number of runs to return
         status: Filter by status (e.g., "success", "failure")
         verbose: If True, print commands being run
+        refresh: If True, ignore cached listings
     """
-    cmd = [
-        "gh",
-        "run",
-        "list",
-        f"--repo={GITHUB_REPO}",
-        "--workflow=nightly-terminal-bench.yml",
-        f"--limit={limit}",
-        "--json=databaseId,status,conclusion,createdAt,displayTitle",
-    ]
-    if status:
-        cmd.append(f"--status={status}")
-
-    result = run_command(cmd, check=False, verbose=verbose)
-    if result.returncode != 0:
-        print(f"Error listing runs: {result.stderr}", file=sys.stderr)
+    cache = MetadataCache(refresh=refresh)
+    cache_key = f"runs:{limit}:{status or ''}"
+    if (cached := cache.get(cache_key)) is not None:
+        return cached
+
+    try:
+        runs = github_backend().list_runs(limit, status, verbose)
+    except (OSError, RuntimeError) as exc:
+        print(f"Error listing runs: {exc}", file=sys.stderr)
         return []
-    return json.loads(result.stdout)
+    with cache.batch():
+        cache.put(cache_key, runs)
+        cache.put_many(
+            {
+                f"run-status:{run['databaseId']}": "completed"
+                for run in runs
+                if run.get("status") == "completed"
+            },
+            immutable=True,
+        )
+    return runs
+
+
+def _run_status(run_id: int, cache: MetadataCache, verbose: bool = False) -> str | None:
+    """A run's status ("completed", "in_progress", ...), cached once completed."""
+    if (cached := cache.get(f"run-status:{run_id}")) is not None:
+        return cached
+    try:
+        status = github_backend().run_status(run_id, verbose)
+    except (OSError, RuntimeError):
+        return None
+    cache.put(f"run-status:{run_id}", status, immutable=status == "completed")
+    return status
 
 
 def list_artifacts_for_run(
-    run_id: int, include_smoke_test: bool = False, verbose: bool = False
+    run_id: int,
+    include_smoke_test: bool = False,
+    verbose: bool = False,
+    refresh: bool = False,
 ) -> list[dict]:
     """List all terminal-bench artifacts for a given run.
 
+    A completed run's artifacts never change, so a listing taken after the
+    run completed is cached permanently; any other listing expires after
+    METADATA_TTL_SEC.
+
     Args:
         run_id: GitHub Actions run ID
         include_smoke_test: If False, exclude smoke test artifact (claude-sonnet-4-5)
         verbose: If True, print commands being run
+        refresh: If True, ignore cached listings
     """
-    result = run_command(
-        [
-            "gh",
-            "api",
-            f"repos/{GITHUB_REPO}/actions/runs/{run_id}/artifacts",
-            "--jq",
-            '.artifacts[] | select(.name | startswith("terminal-bench-results")) '
-            "| {name, id, size_in_bytes}",
-        ],
-        check=False,
-        verbose=verbose,
-    )
-    if result.returncode != 0:
-        print(f"Error listing artifacts: {result.stderr}", file=sys.stderr)
-        return []
+    cache = MetadataCache(refresh=refresh)
+    cache_key = f"artifacts:{run_id}"
+    listed = cache.get(cache_key)
+    if listed is None:
+        # Status first: only a run that had completed before it was listed
+        # has a final listing. The other order could cache a listing missing
+        # the artifacts uploaded as the run finished.
+        completed = _run_status(run_id, cache, verbose) == "completed"
+        listed = _fetch_artifact_listing(run_id, verbose)
+        if listed is None:
+            return []
+        cache.put(cache_key, listed, immutable=completed)
 
     artifacts = []
-    for line in result.stdout.strip().split("\n"):
-        if line:
-            artifact = json.loads(line)
-            # Filter out smoke test artifact unless explicitly included
-            if not include_smoke_test:
-                smoke_test_pattern = SMOKE_TEST_MODEL.replace("/", "-")
-                if smoke_test_pattern in artifact["name"]:
-                    continue
-            artifacts.append(artifact)
+    for artifact in listed:
+        # Filter out smoke test artifact unless explicitly included
+        if not include_smoke_test:
+            smoke_test_pattern = SMOKE_TEST_MODEL.replace("/", "-")
+            if smoke_test_pattern in artifact["name"]:
+                continue
+        artifacts.append(artifact)
     return artifacts
 
 
+def _fetch_artifact_listing(run_id: int, verbose: bool = False) -> list[dict] | None:
+    try:
+        return github_backend().list_artifacts(run_id, verbose)
+    except (OSError, RuntimeError) as exc:
+        print(f"Error listing artifacts: {exc}", file=sys.stderr)
+        return None
+
+
+def _write_json_atomic(path: Path, record: dict) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(record, indent=2) + "\n")
+    os.replace(tmp_path, path)
+
+
+def _artifact_markers(output_dir: Path, name: str) -> tuple[Path, Path]:
+    """Completion markers of an extracted artifact and of a kept zip."""
+    return (
+        output_dir / name / ARTIFACT_COMPLETE_MARKER,
+        output_dir / f"{name}{ARTIFACT_COMPLETE_MARKER}",
+    )
+
+
+def artifact_is_complete(output_dir: Path, artifact: dict) -> bool:
+    """True if ``artifact`` was fully downloaded into ``output_dir``.
+
+    Either form counts: extracted into ``<name>/`` or kept as ``<name>.zip``.
+    """
+    for marker in _artifact_markers(output_dir, artifact["name"]):
+        try:
+            record = json.loads(marker.read_text())
+        except (OSError, json.JSONDecodeError):
+            continue
+        if record.get("id") == artifact.get("id"):
+            return True
+    return False
+
+
+def run_is_complete(run_dir: Path) -> bool:
+    """True if every artifact of the run in ``run_dir`` finished downloading."""
+    return (run_dir / RUN_COMPLETE_MARKER).is_file()
+
+
+def _fetch_artifact_zip(artifact: dict, zip_path: Path) -> None:
+    """Stream an artifact's zip archive from the GitHub API to ``zip_path``."""
+    github_backend().fetch_artifact_zip(artifact, zip_path)
+
+
+def _verify_artifact_zip(artifact: dict, zip_path: Path) -> None:
+    """Check the archive against the size and digest GitHub reports for it.
+
+    A matching digest proves the bytes are GitHub's; without one, every
+    member's CRC is checked instead.
+    """
+    size = zip_path.stat().st_size
+    expected_size = artifact.get("size_in_bytes")
+    if expected_size is not None and size != expected_size:
+        raise RuntimeError(f"size {size} != expected {expected_size}")
+    # Newer artifacts carry "sha256:<hex>"; older ones only have the size.
+    if digest := artifact.get("digest"):
+        algorithm, _, expected = digest.partition(":")
+        hasher = hashlib.new(algorithm)
+        with zip_path.open("rb") as handle:
+            while chunk := handle.read(1 << 20):
+                hasher.update(chunk)
+        if hasher.hexdigest() != expected:
+            raise RuntimeError(f"{algorithm} mismatch (expected {expected})")
+        return
+    with zipfile.ZipFile(zip_path) as archive:
+        if bad := archive.testzip():
+            raise RuntimeError(f"corrupt member {bad}")
+
+
+def download_artifact(
+    artifact: dict, output_dir: Path, verbose: bool = False, keep_zip: bool = False
+) -> bool:
+    """Download, verify and extract one artifact into ``output_dir/<name>``.
+
+    Work happens in ``.<name>.partial`` siblings that are only renamed into
+    place once complete, followed by the completion marker, so an
+    interrupted download never looks finished. Completed artifacts are
+    skipped. With ``keep_zip`` the verified archive is renamed to
+    ``<name>.zip`` and not extracted; readers open its members lazily.
+    """
+    name = artifact["name"]
+    if artifact_is_complete(output_dir, artifact):
+        if verbose:
+            print(f"  Skipping {name} (already downloaded)")
+        return True
+
+    target_dir = output_dir / name
+    partial_dir = output_dir / f".{name}.partial"
+    zip_path = output_dir / f".{name}.zip.partial"
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    started = time.monotonic()
+    try:
+        _fetch_artifact_zip(artifact, zip_path)
+        _verify_artifact_zip(artifact, zip_path)
+        record = {
+            "id": artifact.get("id"),
+            "size_in_bytes": zip_path.stat().st_size,
+            "digest": artifact.get("digest"),
+        }
+        extracted_marker, zip_marker = _artifact_markers(output_dir, name)
+        if keep_zip:
+            os.replace(zip_path, output_dir / f"{name}.zip")
+            _write_json_atomic(zip_marker, record)
+        else:
+            with zipfile.ZipFile(zip_path) as archive:
+                archive.extractall(partial_dir)
+            shutil.rmtree(target_dir, ignore_errors=True)
+            os.replace(partial_dir, target_dir)
+            _write_json_atomic(extracted_marker, record)
+    except Exception as exc:
+        print(f"Error downloading {name}: {exc}", file=sys.stderr)
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        return False
+    finally:
+        zip_path.unlink(missing_ok=True)
+
+    if verbose:
+        size_mb = (artifact.get("size_in_bytes") or 0) / 1e6
+        print(
+            f"  Downloaded {name} ({size_mb:.1f} MB, {time.monotonic() - started:.1f}s)"
+        )
+    return True
+
+
+def download_artifacts(
+    downloads: Sequence[tuple[dict, Path]],
+    max_workers: int = ARTIFACT_DOWNLOAD_WORKERS,
+    verbose: bool = False,
+    keep_zip: bool = False,
+) -> bool:
+    """Download ``(artifact, output_dir)`` pairs through one bounded worker pool.
+
+    Pairs may come from several runs, so a multi-run fetch keeps every
+    worker busy instead of finishing one run before starting the next.
+
+    Returns:
+        True if every artifact is complete, False if any failed
+    """
+    for _, output_dir in downloads:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        results = list(
+            pool.map(
+                lambda download: download_artifact(
+                    *download, verbose=verbose, keep_zip=keep_zip
+                ),
+                downloads,
+            )
+        )
+    return all(results)
+
+
 def download_run_artifacts(
     run_id: int,
     output_dir: Path,
     artifact_names: list[str] | None = None,
     include_smoke_test: bool = False,
     verbose: bool = False,
+    max_workers: int = ARTIFACT_DOWNLOAD_WORKERS,
+    refresh: bool = False,
+    keep_zip: bool = False,
 ) -> bool:
     """Download terminal-bench artifacts for a run.
 
+    Artifacts are fetched in parallel and verified against their listed size
+    (and digest when GitHub provides one). Re-running after a failure only
+    fetches the artifacts that did not complete. When downloading all of a
+    run's artifacts, a run marker is written once every one has, provided
+    the run itself has completed (an in-progress run may still upload more)
+    and the listing was taken after it did; an older listing is refreshed
+    first.
+
     Args:
         run_id: GitHub Actions run ID
         output_dir: Directory to download artifacts to
         artifact_names: Specific artifact names to download, or None for all
         include_smoke_test: If True, include smoke test artifact (for log inspection)
         verbose: If True, print commands being run
+        max_workers: Artifacts downloaded at once
+        refresh: If True, ignore the cached artifact listing
+        keep_zip: If True, keep each artifact as ``<name>.zip`` unextracted
 
     Returns:
         True if download succeeded, False otherwise
     """
-    if artifact_names is None:
-        artifacts = list_artifacts_for_run(
-            run_id, include_smoke_test=include_smoke_test, verbose=verbose
-        )
-        if not artifacts:
-            print(f"No artifacts found for run {run_id}", file=sys.stderr)
-            return False
-        artifact_names = [a["name"] for a in artifacts]
+    artifacts = list_artifacts_for_run(
+        run_id,
+        include_smoke_test=include_smoke_test or artifact_names is not None,
+        verbose=verbose,
+        refresh=refresh,
+    )
+    if artifact_names is not None:
+        artifacts = [a for a in artifacts if a["name"] in artifact_names]
+    if not artifacts:
+        print(f"No artifacts found for run {run_id}", file=sys.stderr)
+        return False
 
     if verbose:
-        print(f"Downloading {len(artifact_names)} artifact(s) to {output_dir}...")
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    cmd = [
-        "gh",
-        "run",
-        "download",
-        str(run_id),
-        f"--repo={GITHUB_REPO}",
-        f"--dir={output_dir}",
-    ]
-    for name in artifact_names:
-        cmd.extend(["--name", name])
-
-    result = run_command(cmd, check=False, verbose=verbose)
-    if result.returncode != 0:
-        print(f"Error downloading: {result.stderr}", file=sys.stderr)
+        print(f"Downloading {len(artifacts)} artifact(s) to {output_dir}...")
+    downloads = [(artifact, output_dir) for artifact in artifacts]
+    if not download_artifacts(
+        downloads, max_workers=max_workers, verbose=verbose, keep_zip=keep_zip
+    ):
         return False
+    if artifact_names is not None:
+        return True
+    if _run_status(run_id, MetadataCache(refresh=refresh), verbose) != "completed":
+        return True
 
+    listing_key = f"artifacts:{run_id}"
+    if not MetadataCache().is_immutable(listing_key):
+        # The listing predates completion and may miss the artifacts uploaded
+        # as the run finished: list again and fetch whatever it adds.
+        artifacts = list_artifacts_for_run(
+            run_id,
+            include_smoke_test=include_smoke_test,
+            verbose=verbose,
+            refresh=True,
+        )
+        downloads = [(artifact, output_dir) for artifact in artifacts]
+        if not download_artifacts(
+            downloads, max_workers=max_workers, verbose=verbose, keep_zip=keep_zip
+        ):
+            return False
+    if MetadataCache().is_immutable(listing_key):
+        _write_json_atomic(
+            output_dir / RUN_COMPLETE_MARKER,
+            {"run_id": run_id, "artifacts": sorted(a["name"] for a in artifacts)},
+        )
     return True
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import subprocess
+import threading
+import time
+import zipfile
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from . import tbench_utils
+from .tbench_utils import download_artifacts
+
+
+def test_artifact_downloads_verify_size_and_resume(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def zipped(name: str) -> bytes:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("jobs/result.json", json.dumps({"artifact": name}))
+        return buffer.getvalue()
+
+    payloads = {1: zipped("a"), 2: zipped("b")}
+    fetched: list[int] = []
+
+    def fake_fetch(artifact: dict, zip_path: Path) -> None:
+        fetched.append(artifact["id"])
+        zip_path.write_bytes(payloads[artifact["id"]])
+
+    monkeypatch.setattr(tbench_utils, "_fetch_artifact_zip", fake_fetch)
+    good = {"name": "results-a", "id": 1, "size_in_bytes": len(payloads[1])}
+    # Reported size disagrees with what arrives: a truncated download.
+    bad = {"name": "results-b", "id": 2, "size_in_bytes": len(payloads[2]) + 1}
+    out = tmp_path / "run"
+
+    assert not download_artifacts([(good, out), (bad, out)], max_workers=2)
+    assert tbench_utils.artifact_is_complete(out, good)
+    assert not tbench_utils.artifact_is_complete(out, bad)
+    assert not (out / "results-b").exists()
+    assert sorted(path.name for path in out.iterdir()) == ["results-a"]
+
+    bad["size_in_bytes"] = len(payloads[2])
+    fetched.clear()
+    assert download_artifacts([(good, out), (bad, out)], max_workers=2)
+    assert fetched == [2]  # The completed artifact is not fetched again
+    assert json.loads((out / "results-b" / "jobs" / "result.json").read_text()) == {
+        "artifact": "b"
+    }
+
+
+def test_metadata_cache_keeps_completed_runs_and_expires_the_rest(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    status = {"7": "completed", "8": "in_progress"}
+    calls: list[str] = []
+
+    def fake_gh(cmd: list[str], **_: object) -> subprocess.CompletedProcess:
+        endpoint = cmd[2]
+        calls.append(endpoint)
+        run_id = endpoint.split("/")[5]
+        if endpoint.endswith("/artifacts"):
+            stdout = json.dumps({"name": f"terminal-bench-results-{run_id}", "id": 1})
+        else:
+            stdout = status[run_id]
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout + "\n", stderr="")
+
+    monkeypatch.setattr(tbench_utils, "run_command", fake_gh)
+    monkeypatch.setattr(tbench_utils, "METADATA_CACHE_PATH", tmp_path / "cache.json")
+    monkeypatch.setattr(tbench_utils, "github_backend", tbench_utils.GhCliBackend)
+    list_artifacts = tbench_utils.list_artifacts_for_run
+
+    for _ in range(2):
+        assert list_artifacts(7)[0]["name"] == "terminal-bench-results-7"
+        assert list_artifacts(8)[0]["name"] == "terminal-bench-results-8"
+    assert len(calls) == 4  # Second round served from the cache
+
+    # Past the TTL only the in-progress run is listed again.
+    monkeypatch.setattr(tbench_utils, "METADATA_TTL_SEC", -1)
+    calls.clear()
+    list_artifacts(7)
+    list_artifacts(8)
+    assert calls == [
+        f"repos/{tbench_utils.GITHUB_REPO}/actions/runs/8",
+        f"repos/{tbench_utils.GITHUB_REPO}/actions/runs/8/artifacts",
+    ]
+
+    calls.clear()
+    list_artifacts(7, refresh=True)
+    assert calls == [
+        f"repos/{tbench_utils.GITHUB_REPO}/actions/runs/7",
+        f"repos/{tbench_utils.GITHUB_REPO}/actions/runs/7/artifacts",
+    ]
+
+    # Run 8 finishes between its status check and its listing: that listing
+    # may miss the last artifacts, so it must not be cached for good.
+    monkeypatch.setattr(tbench_utils, "METADATA_TTL_SEC", 3600)
+    run_command = fake_gh
+
+    def finishing_gh(cmd: list[str], **kwargs: object) -> subprocess.CompletedProcess:
+        if cmd[2].endswith("/artifacts"):
+            status["8"] = "completed"
+        return run_command(cmd, **kwargs)
+
+    monkeypatch.setattr(tbench_utils, "run_command", finishing_gh)
+    status["8"] = "in_progress"
+    list_artifacts(8, refresh=True)
+    entries = json.loads((tmp_path / "cache.json").read_text())
+    assert not entries["artifacts:8"]["immutable"]
+    assert entries["artifacts:7"]["immutable"]
+
+
+def test_run_listing_is_cached_with_one_write(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    runs = [
+        {"databaseId": 100 + index, "status": status}
+        for index, status in enumerate(["completed"] * 5 + ["in_progress"])
+    ]
+    backend = SimpleNamespace(list_runs=lambda limit, status, verbose: runs)
+    cache_path = tmp_path / "cache.json"
+    writes: list[Path] = []
+    write_json_atomic = tbench_utils._write_json_atomic
+
+    def counting_write(path: Path, record: dict) -> None:
+        writes.append(path)
+        write_json_atomic(path, record)
+
+    monkeypatch.setattr(tbench_utils, "METADATA_CACHE_PATH", cache_path)
+    monkeypatch.setattr(tbench_utils, "github_backend", lambda: backend)
+    monkeypatch.setattr(tbench_utils, "_write_json_atomic", counting_write)
+
+    assert tbench_utils.list_nightly_runs(limit=6) == runs
+    assert writes == [cache_path]
+    entries = json.loads(cache_path.read_text())
+    assert not entries["runs:6:"]["immutable"]
+    assert entries["run-status:100"] == {
+        "fetched_at": entries["run-status:100"]["fetched_at"],
+        "immutable": True,
+        "value": "completed",
+    }
+    assert "run-status:105" not in entries
+
+
+def test_run_marker_is_only_written_for_completed_runs(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    status = "in_progress"
+    artifacts = [{"name": "terminal-bench-results-a", "id": 1}]
+    backend = SimpleNamespace(
+        run_status=lambda run_id, verbose=False: status,
+        list_artifacts=lambda run_id, verbose=False: list(artifacts),
+    )
+    downloaded: list[str] = []
+
+    def fake_download(downloads: list, **_: object) -> bool:
+        downloaded.extend(artifact["name"] for artifact, _ in downloads)
+        return True
+
+    monkeypatch.setattr(tbench_utils, "METADATA_CACHE_PATH", tmp_path / "cache.json")
+    monkeypatch.setattr(tbench_utils, "github_backend", lambda: backend)
+    monkeypatch.setattr(tbench_utils, "download_artifacts", fake_download)
+    out = tmp_path / "run"
+    out.mkdir()
+
+    assert tbench_utils.download_run_artifacts(7, out)
+    assert not tbench_utils.run_is_complete(out)
+
+    # The run completes and uploads one more artifact while the listing
+    # above is still within its TTL. Listing runs records the completion;
+    # the stale artifact listing is re-listed before the marker is written.
+    status = "completed"
+    artifacts.append({"name": "terminal-bench-results-b", "id": 2})
+    tbench_utils.MetadataCache().put("run-status:7", status, immutable=True)
+    downloaded.clear()
+    assert tbench_utils.download_run_artifacts(7, out)
+    assert tbench_utils.run_is_complete(out)
+    assert "terminal-bench-results-b" in downloaded
+    marker = json.loads((out / tbench_utils.RUN_COMPLETE_MARKER).read_text())
+    assert marker["artifacts"] == [
+        "terminal-bench-results-a",
+        "terminal-bench-results-b",
+    ]
+
+
+def test_agent_log_truncated_mid_stream_reads_the_flushed_prefix(
+    tmp_path: Path,
+) -> None:
+    # What mux_log_capture leaves behind when the agent is killed: a gzip
+    # stream sync-flushed after the first line and cut off mid-way through
+    # the second.
+    compressor = zlib.compressobj(wbits=31)
+    data = compressor.compress(b'{"type": "start"}\n')
+    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+    flushed = len(data)
+    data += compressor.compress(b'{"type": "tool-call"}\n' * 1000)
+    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+    (tmp_path / "stdout.txt.gz").write_bytes(data[: flushed + 10])
+
+    log = tbench_utils.read_agent_log(tmp_path, "stdout.txt")
+
+    assert log is not None
+    assert log.startswith('{"type": "start"}\n')
+
+
+def test_http_github_backend_pages_revalidates_and_reuses_connections(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("jobs/result.json", "{}")
+    archive_bytes = buffer.getvalue()
+    runs = [
+        {
+            "id": 100 + index,
+            "status": "completed",
+            "conclusion": "success",
+            "created_at": "2026-01-01T00:00:00Z",
+            "display_title": f"nightly {index}",
+        }
+        for index in range(5)
+    ]
+    artifacts = [
+        {"name": f"terminal-bench-results-{n}", "id": n, "size_in_bytes": size}
+        for n, size in enumerate([len(archive_bytes)] * 3)
+    ] + [{"name": "other", "id": 9, "size_in_bytes": 1}]
+    requests: list[str] = []
+    not_modified: list[str] = []
+
+    class FakeGitHub(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+        def _send(self, status: int, body: bytes = b"", **headers: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            requests.append(self.path)
+            path, _, query = self.path.partition("?")
+            params = dict(part.split("=") for part in query.split("&") if part)
+            if path.endswith("/zip"):
+                self._send(302, Location="/storage/archive.zip")
+                return
+            if path == "/storage/archive.zip":
+                self._send(200, archive_bytes)
+                return
+            if path.endswith("/runs/100"):
+                self._send(200, json.dumps(runs[0]).encode())
+                return
+            assert self.headers["Authorization"] == "Bearer t0ken"
+            items, key = (
+                (runs, "workflow_runs")
+                if "/workflows/" in path
+                else (artifacts, "artifacts")
+            )
+            per_page, page = int(params["per_page"]), int(params["page"])
+            body = json.dumps(
+                {
+                    "total_count": len(items),
+                    key: items[(page - 1) * per_page :][:per_page],
+                }
+            ).encode()
+            etag = f'"{len(body)}-{page}"'
+            if self.headers.get("If-None-Match") == etag:
+                not_modified.append(self.path)
+                self._send(304, ETag=etag)
+            else:
+                self._send(200, body, ETag=etag)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGitHub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = tbench_utils.HttpBackend(
+        "t0ken", base_url=f"http://127.0.0.1:{server.server_address[1]}"
+    )
+    monkeypatch.setattr(tbench_utils, "GITHUB_PAGE_SIZE", 2)
+    monkeypatch.setattr(tbench_utils, "METADATA_CACHE_PATH", tmp_path / "cache.json")
+    monkeypatch.setattr(tbench_utils, "github_backend", lambda: backend)
+    try:
+        listed = tbench_utils.list_nightly_runs(limit=5)
+        assert [run["databaseId"] for run in listed] == [100, 101, 102, 103, 104]
+        assert listed[0]["displayTitle"] == "nightly 0"
+        assert len(requests) == 3  # Three pages of two
+
+        names = [a["name"] for a in tbench_utils.list_artifacts_for_run(100)]
+        assert names == [f"terminal-bench-results-{n}" for n in range(3)]
+        assert len(requests) == 5  # Run status came from the run listing
+
+        # A refresh revalidates with the ETag and reuses the stored body.
+        assert tbench_utils.list_artifacts_for_run(100, refresh=True) == [
+            {**a, "digest": None} for a in artifacts[:3]
+        ]
+        assert len(not_modified) == 2
+        # Bodies live in one file per URL, not in the metadata JSON.
+        metadata = json.loads((tmp_path / "cache.json").read_text())
+        assert not any(key.startswith("etag:") for key in metadata)
+        etag_dir = tmp_path / tbench_utils.ETAG_CACHE_DIR_NAME
+        etag_files = list(etag_dir.glob("*.json"))
+        assert etag_files
+        # Entries unused for ETAG_TTL_SEC are pruned instead of piling up.
+        long_ago = time.time() - 2 * tbench_utils.ETAG_TTL_SEC
+        for path in etag_files:
+            os.utime(path, (long_ago, long_ago))
+        tbench_utils.EtagCache().prune()
+        assert not list(etag_dir.iterdir())
+
+        out = tmp_path / "run"
+        assert tbench_utils.download_run_artifacts(100, out, max_workers=3)
+        assert tbench_utils.run_is_complete(out)
+        assert (out / "terminal-bench-results-2" / "jobs" / "result.json").exists()
+        assert sum(path.endswith("/zip") for path in requests) == 3
+        # 3 downloads + listings over at most one connection per worker.
+        assert backend.pool.n_opened <= 3
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -21,6 +21,7 @@ Environment variables (from GitHub Actions):
 
 import json
 import os
+import statistics
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
@@ -145,6 +146,87 @@ def extract_task_timestamps(trial_result: dict) -> tuple[str | None, str | None]
     return started, finished
 
 
+def extract_setup_timings(trial_folder: Path) -> dict:
+    """Extract the agent's per-phase setup timings (setup-timings.json).
+
+    MuxAgent writes host and sandbox phase durations into its logs dir, which
+    Harbor places under <trial>/agent/. Returns flat BQ columns plus the raw
+    JSON; all values are None when the file is missing (older runs).
+    """
+    timings = load_json(trial_folder / "agent" / "setup-timings.json")
+    if not timings:
+        return {
+            "setup_seconds": None,
+            "setup_upload_bytes": None,
+            "setup_timings_json": None,
+        }
+
+    return {
+        "setup_seconds": timings.get("total_seconds"),
+        "setup_upload_bytes": timings.get("upload_bytes"),
+        "setup_timings_json": json.dumps(timings),
+    }
+
+
+def extract_perf_summary(trial_result: dict) -> dict:
+    """Extract the agent's performance summary from agent_result.metadata.perf.
+
+    MuxAgent records TTFT, model turns, model-wait vs tool time and the slowest
+    tool calls there; all values are None for runs without it.
+    """
+    agent_result = trial_result.get("agent_result") or {}
+    perf = (agent_result.get("metadata") or {}).get("perf") or {}
+    return {
+        "ttft_sec": perf.get("ttft_sec"),
+        "n_model_turns": perf.get("n_model_turns"),
+        "n_tool_calls": perf.get("n_tool_calls"),
+        "model_wait_sec": perf.get("model_wait_sec"),
+        "tool_sec": perf.get("tool_sec"),
+        "agent_wall_clock_sec": perf.get("wall_clock_sec"),
+    }
+
+
+def extract_resource_summary(trial_result: dict) -> dict:
+    """Extract peak memory and exit classification from agent_result.metadata.
+
+    MuxAgent samples the agent's process tree and cgroup memory in the sandbox
+    and classifies its exit (ok/error/timeout/oom/killed).
+    """
+    agent_result = trial_result.get("agent_result") or {}
+    resources = (agent_result.get("metadata") or {}).get("resources") or {}
+    return {
+        "peak_rss_bytes": resources.get("peak_rss_bytes"),
+        "peak_cgroup_memory_bytes": resources.get("peak_cgroup_memory_bytes"),
+        "cgroup_memory_max_bytes": resources.get("cgroup_memory_max_bytes"),
+        "agent_exit_classification": resources.get("exit_classification"),
+    }
+
+
+def extract_startup_probe(trial_result: dict) -> dict:
+    """Extract cold/warm CLI start-up times from agent_result.metadata.startup.
+
+    Only present when the run set MUX_STARTUP_PROBE_RUNS (or MUX_WARMUP, for
+    warmup_sec); the first probe run is cold and the warm values are medians
+    over the rest.
+    """
+    agent_result = trial_result.get("agent_result") or {}
+    startup = (agent_result.get("metadata") or {}).get("startup") or {}
+    warmup = (agent_result.get("metadata") or {}).get("warmup") or {}
+    return {
+        "startup_cold_first_event_sec": startup.get("cold_first_event_sec"),
+        "startup_warm_first_event_sec": startup.get("warm_first_event_sec"),
+        "startup_cold_first_request_sec": startup.get("cold_first_request_sec"),
+        "startup_warm_first_request_sec": startup.get("warm_first_request_sec"),
+        # Wall clock of the separate warmup exec (MUX_WARMUP), not in agent time
+        "warmup_sec": warmup.get("wall_clock_sec"),
+    }
+
+
+def _median(values: list) -> float | None:
+    present = [value for value in values if value is not None]
+    return statistics.median(present) if present else None
+
+
 def build_rows(job_folder: Path) -> list[dict]:
     """Build BigQuery rows for all trials in a job folder."""
     rows = []
@@ -262,6 +344,10 @@ def build_rows(job_folder: Path) -> list[dict]:
             "cost_usd": cost_usd,
             "task_started_at": task_started_at,
             "task_completed_at": task_completed_at,
+            **extract_setup_timings(trial_folder),
+            **extract_perf_summary(trial_result),
+            **extract_resource_summary(trial_result),
+            **extract_startup_probe(trial_result),
             "run_result_json": run_result_json,
             "run_metadata_json": run_metadata_json,
             "task_result_json": json.dumps(trial_result),
@@ -269,10 +355,18 @@ def build_rows(job_folder: Path) -> list[dict]:
         }
         rows.append(row)
 
+    # Run-level start-up medians, so a nightly's start-up regression shows up
+    # without aggregating trial rows
+    run_startup = {
+        f"run_{key}": _median([row[key] for row in rows])
+        for key in ("startup_cold_first_event_sec", "startup_warm_first_event_sec")
+    }
+
     # Update n_resolved/n_unresolved on all rows
     for row in rows:
         row["n_resolved"] = n_resolved
         row["n_unresolved"] = n_unresolved
+        row.update(run_startup)
 
     return rows
 